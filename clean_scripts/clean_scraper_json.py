@@ -1,18 +1,21 @@
 import polars as pl
 import os
-import json
+import sys
+from pathlib import Path
+
+# Add root to sys.path to find core
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from scout_app.core.dna import extract_dna
 
 # --- CONFIG ---
 INPUT_FILE = "dataset_amazon-product-details-scraper_2026-01-28_09-03-46-099.json"
 OUTPUT_FILE = "staging_data/Scraper_Data_Cleaned.jsonl"
 
-DNA_MAP = {
-    "Material": "Material", "Fabric Type": "Material", "Material Composition": "Material",
-    "Style": "Design Type", "Pattern": "Design Type", "Theme": "Design Type",
-    "Target Audience": "Target Audience", "Department": "Target Audience",
-    "Size": "Size/Capacity", "Capacity": "Size/Capacity",
-    "Number of Pieces": "Number of Pieces", "Included Components": "Details of Pieces",
-    "Brand": "Brand"
+# Shared DNA fields (scout_app/core/dna.py) -> Excel-style output columns
+DNA_COLUMNS = {
+    "material": "Material", "design_type": "Design Type", "target_audience": "Target Audience",
+    "gender": "Gender", "size_capacity": "Size/Capacity", "num_pieces": "Number of Pieces",
+    "pack": "Details of Pieces", "brand": "Brand",
 }
 
 def clean():
@@ -34,40 +37,8 @@ def clean():
     if "productDetails" not in df.columns:
         print("⚠️ productDetails column not found. Skipping deep clean.")
     else:
-        # We need to process productDetails. 
-        # If it's a List of Structs (name, value), we can explode.
-        # But for simplicity, we use row iteration like the Excel script.
-        # However, Polars Struct handling is strict. Let's convert to dicts.
-        rows = df.to_dicts()
-        schema_cols = list(set(DNA_MAP.values()))
-        extracted_rows = {col: [] for col in schema_cols}
-        
-        for row in rows:
-            row_dna = {col: None for col in schema_cols}
-            details = row.get("productDetails")
-            
-            # details should be a list of dicts: [{'name': '...', 'value': '...'}, ...]
-            if isinstance(details, list):
-                for item in details:
-                    if not isinstance(item, dict): continue
-                    key = item.get("name")
-                    val = item.get("value")
-                    
-                    if key and val:
-                        key = str(key).strip()
-                        for map_k, map_v in DNA_MAP.items():
-                            if map_k.lower() in key.lower():
-                                if row_dna[map_v] is None:
-                                    row_dna[map_v] = str(val)
-                                else:
-                                    row_dna[map_v] += f" | {val}"
-            
-            for col in schema_cols:
-                extracted_rows[col].append(row_dna[col])
-        
-        # Add new columns
-        for col, values in extracted_rows.items():
-            df = df.with_columns(pl.Series(name=col, values=values))
+        # Vectorized: explode productDetails, map names, pivot into DNA columns
+        df = extract_dna(df, breadcrumbs_col=None).rename(DNA_COLUMNS)
 
     # 4. Map Standard Columns
     # Rename map
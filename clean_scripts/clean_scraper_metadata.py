@@ -2,20 +2,19 @@ import polars as pl
 import os
 import re
 import json
+import sys
+from pathlib import Path
+
+# Add root to sys.path to find core
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from scout_app.core.dna import extract_dna
 
 # --- CONFIG ---
 # Update this path to your target file
 INPUT_FILE = "staging_data_local/20260129_data/new_product_metadata/39_asin.jsonl"
 OUTPUT_FILE = "staging_data_local/Cleaned_39_Asin_Metadata.jsonl"
 
-DNA_MAP = {
-    "Material": "material", "Fabric Type": "material", "Material Composition": "material",
-    "Style": "design_type", "Pattern": "design_type", "Theme": "design_type",
-    "Target Audience": "target_audience", "Department": "target_audience",
-    "Size": "size_capacity", "Capacity": "size_capacity",
-    "Number of Pieces": "num_pieces", "Included Components": "pack",
-    "Brand": "brand", "Publisher": "brand", "Manufacturer": "brand"
-}
+DETAILS_TYPE = pl.List(pl.Struct({"name": pl.Utf8, "value": pl.Utf8}))
 
 def clean():
     print(f"🔍 Reading {INPUT_FILE}...")
@@ -41,8 +40,7 @@ def clean():
 
     print(f"📊 Loaded {len(data)} valid rows (excluding 404s/empty).")
     
-    # 2. Extract DNA and Standardize ASINs
-    schema_cols = list(set(DNA_MAP.values()))
+    # 2. Standardize ASINs (DNA is extracted vectorized below)
     clean_rows = []
 
     for row in data:
@@ -78,27 +76,7 @@ def clean():
             # Both missing -> Skip
             continue
 
-        # --- B. DNA Extraction ---
-        row_dna = {col: None for col in schema_cols}
-        details = row.get("productDetails")
-        
-        if isinstance(details, list):
-            for item in details:
-                if not isinstance(item, dict): continue
-                k = item.get("name", "")
-                v = item.get("value", "")
-                
-                if k and v:
-                    k = str(k).replace(" ‏ : ‎", "").replace("‏", "").replace("‎", "").strip()
-                    v = str(v).strip()
-                    
-                    # Map
-                    for map_k, map_v in DNA_MAP.items():
-                        if map_k.lower() in k.lower():
-                            if row_dna[map_v] is None: row_dna[map_v] = v
-                            else: row_dna[map_v] += f" | {v}"
-
-        # --- C. Assemble Clean Row ---
+        # --- B. Assemble Clean Row ---
         clean_row = {
             "asin": final_child,
             "parent_asin": final_parent,
@@ -106,14 +84,20 @@ def clean():
             "image_url": row.get("imageUrlList", [None])[0] if row.get("imageUrlList") else None,
             "brand": row.get("manufacturer"), # Default brand source
             "real_average_rating": row.get("productRating"),
-            "real_total_ratings": row.get("countReview")
+            "real_total_ratings": row.get("countReview"),
+            "productDetails": [
+                {"name": str(d.get("name", "")), "value": None if d.get("value") is None else str(d["value"])}
+                for d in row.get("productDetails") or []
+                if isinstance(d, dict)
+            ],
         }
-        # Merge DNA
-        clean_row.update(row_dna)
         clean_rows.append(clean_row)
 
-    # 3. Create Final DataFrame
-    df_final = pl.DataFrame(clean_rows, infer_schema_length=None, strict=False)
+    # 3. Create Final DataFrame + shared DNA extraction (scout_app/core/dna.py)
+    df_final = pl.DataFrame(
+        clean_rows, schema_overrides={"productDetails": DETAILS_TYPE}, infer_schema_length=None, strict=False
+    )
+    df_final = extract_dna(df_final, breadcrumbs_col=None).drop("productDetails")
 
     # 4. Type Cleaning
     if "real_average_rating" in df_final.columns:
@@ -50,16 +50,17 @@ def run_live_flow(asins: list, skip_ai: bool = False):
     """Scrape -> Ingest -> Live AI Processing."""
     # 1. Scrape
     scraper = AmazonScraper()
-    raw_file = scraper.run_deep_scrape(asins)
-    if not raw_file: return
+    raw_files = scraper.run_deep_scrape(asins)
+    if not raw_files: return
 
-    # 2. Ingest
+    # 2. Ingest (one file per Apify run)
     ingester = DataIngester()
-    stats = ingester.ingest_file(raw_file)
-    if stats.get("error"): return
+    for raw_file in raw_files:
+        stats = ingester.ingest_file(raw_file)
+        if stats.get("error"): return
 
-    # 3. Update CSV
-    update_tracking_csv(stats.get("asins_found", []))
+        # 3. Update CSV
+        update_tracking_csv(stats.get("asins_found", []))
 
     # 4. Live AI
     if not skip_ai:
@@ -71,8 +72,9 @@ def run_live_flow(asins: list, skip_ai: bool = False):
         janitor.run_live()
 
     # 5. Cleanup
-    archive_path = Settings.ARCHIVE_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{raw_file.name}"
-    shutil.move(raw_file, archive_path)
+    for raw_file in raw_files:
+        archive_path = Settings.ARCHIVE_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{raw_file.name}"
+        shutil.move(raw_file, archive_path)
     print(f"📦 [Gatekeeper] Flow completed. Data archived.")
 
 def run_batch_submit_miner(limit: int = 10000):
@@ -15,8 +15,10 @@ from scout_app.ui.common import (
     query_df,
     request_new_asin,
     get_precalc_stats,
-    get_active_asin_list,
-    get_all_product_metadata,
+    get_explorer_categories,
+    get_explorer_niches,
+    search_products,
+    EXPLORER_RESULT_LIMIT,
 )
 from scout_app.ui.tabs.overview import render_overview_tab
 from scout_app.ui.tabs.xray import render_xray_tab
@@ -134,56 +136,37 @@ def main():
         st.markdown("---")
         # --- SMART SIDEBAR 2.0 ---
         cache_key = st.session_state.get("last_db_update", 0)
-        df_meta = get_all_product_metadata(cache_key=cache_key)
+        all_cats = get_explorer_categories(cache_key=cache_key)
 
-        if df_meta.empty:
+        if not all_cats:
             st.error("No product data found in DB.")
             return
 
         st.subheader("🎯 Product Explorer")
 
         # 1. Category Filter
-        all_cats = sorted([c for c in df_meta["category"].dropna().unique() if c])
         sel_cat = st.sidebar.selectbox("Category:", ["All"] + all_cats, key="sidebar_category")
+        cat_filter = None if sel_cat == "All" else sel_cat
 
-        # 2. Niche Filter (Filtered by Category)
-        df_filtered = df_meta.copy()
-        if sel_cat != "All":
-            df_filtered = df_filtered[df_filtered["category"] == sel_cat]
-
-        # FIX: Unnest aggregated niche strings to get clean individual niches
-        raw_niches = df_filtered["niche"].dropna().unique()
-        split_niches = set()
-        for rn in raw_niches:
-            for part in str(rn).split(","):
-                clean_part = part.strip()
-                if clean_part and clean_part not in ["Non-defined", "unknown", "null"]:
-                    split_niches.add(clean_part)
-
-        all_niches = sorted(list(split_niches))
+        # 2. Niche Filter (Filtered by Category, from parent_niches)
+        all_niches = get_explorer_niches(cat_filter, cache_key=cache_key)
         sel_niche = st.sidebar.selectbox("Niche:", ["All"] + all_niches, key="sidebar_niche")
+        niche_filter = None if sel_niche == "All" else sel_niche
 
-        if sel_niche != "All":
-            # Use partial matching for aggregated niche strings
-            df_filtered = df_filtered[df_filtered["niche"].str.contains(sel_niche, na=False, regex=False)]
-
-        # 3. Search Box
+        # 3. Search Box (resolved server-side against the search index)
         search_term = st.sidebar.text_input("🔍 Search Brand/Title/ASIN:", placeholder="e.g. B0...")
-        if search_term:
-            search_term = search_term.lower()
-            df_filtered = df_filtered[
-                df_filtered["parent_asin"].str.lower().str.contains(search_term, na=False)
-                | df_filtered["variation_pool"].str.lower().str.contains(search_term, na=False)
-                | df_filtered["title"].str.lower().str.contains(search_term, na=False)
-                | df_filtered["brand"].str.lower().str.contains(search_term, na=False)
-            ]
+        df_filtered = search_products(
+            cat_filter, niche_filter, search_term.strip() or None, limit=EXPLORER_RESULT_LIMIT + 1, cache_key=cache_key
+        )
+        is_truncated = len(df_filtered) > EXPLORER_RESULT_LIMIT
+        df_filtered = df_filtered.head(EXPLORER_RESULT_LIMIT)
 
         # 4. Result Selection (Interactive Table)
         if df_filtered.empty:
             st.sidebar.warning("No matches found.")
             selected_asin = st.session_state.get("main_asin_selector")
         else:
-            st.sidebar.markdown(f"**Matches ({len(df_filtered)}):**")
+            st.sidebar.markdown(f"**Matches ({len(df_filtered)}{'+' if is_truncated else ''}):**")
 
             # Prepare display DF
             display_df = df_filtered[["brand", "parent_asin", "title"]].copy()
@@ -0,0 +1,163 @@
+import hashlib
+import duckdb
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Optional
+from .config import Settings
+from .logger import log_event
+from .prompts import DETECTIVE_SYS_PROMPT
+
+
+def data_version(asin: str) -> Optional[str]:
+    """
+    Version of the data behind one ASIN's answers: the Blue-Green swap (pointer file write,
+    i.e. every ingest / dedup) + product_stats.last_updated of the ASIN (recalc).
+    Unrelated writes (scrape queue, mining status, aspect mappings) leave it unchanged.
+    None if the active DB cannot be read right now (skip the cache for this answer).
+    """
+    try:
+        swapped = Settings.CURRENT_DB_PTR.stat().st_mtime_ns
+    except OSError:
+        swapped = 0
+    db_path = Settings.get_active_db_path()
+    try:
+        with duckdb.connect(str(db_path), read_only=True) as conn:
+            res = conn.execute("SELECT last_updated FROM product_stats WHERE asin = ?", [asin]).fetchone()
+    except Exception as e:
+        print(f"⚠️ [AnswerCache] data version unavailable: {e}")
+        return None
+    return f"{db_path.name}:{swapped}:{res[0] if res else 'no-stats'}"
+
+
+def answer_version(asin: str, prompt: str, model: str) -> Optional[str]:
+    """
+    data_version(asin) + a short hash of what produces the answer: the final prompt text,
+    the Detective system prompt and the model name. Editing a quick-action prompt or
+    switching GEMINI_MODEL is a new key instead of serving old answers until the TTL.
+    """
+    version = data_version(asin)
+    if version is None:
+        return None
+    digest = hashlib.sha256("\n".join([model, DETECTIVE_SYS_PROMPT, prompt]).encode()).hexdigest()[:12]
+    return f"{version}:{digest}"
+
+
+class AnswerCache:
+    """
+    Strategy Hub quick-action answers, keyed by (template_id, asin, db_version), where
+    db_version is answer_version(asin, prompt, model). A swap or recalc of that ASIN, or a
+    prompt / model change, is a new key, so stale answers are never served; the TTL only
+    bounds how long a valid answer is reused.
+    Persisted in SYSTEM_DB so every session / user shares it.
+    """
+
+    def __init__(self, ttl_hours: Optional[float] = None):
+        self.db_path = str(Settings.SYSTEM_DB)
+        self.ttl = timedelta(hours=Settings.ANSWER_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours)
+
+    def _ensure_schema(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                template_id VARCHAR,
+                asin VARCHAR,
+                db_version VARCHAR,
+                response VARCHAR,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                hits INTEGER DEFAULT 0,
+                PRIMARY KEY (template_id, asin, db_version)
+            );
+            CREATE TABLE IF NOT EXISTS answer_cache_stats (
+                template_id VARCHAR PRIMARY KEY,
+                hits BIGINT DEFAULT 0,
+                misses BIGINT DEFAULT 0,
+                bypasses BIGINT DEFAULT 0
+            );
+        """)
+
+    def _count(self, conn, template_id: str, column: str):
+        conn.execute(
+            f"""
+            INSERT INTO answer_cache_stats (template_id, {column}) VALUES (?, 1)
+            ON CONFLICT (template_id) DO UPDATE SET {column} = answer_cache_stats.{column} + 1
+        """,
+            [template_id],
+        )
+
+    def get(self, template_id: str, asin: str, db_version: str) -> Optional[str]:
+        """Cached answer or None (a miss is counted)."""
+        try:
+            with duckdb.connect(self.db_path) as conn:
+                self._ensure_schema(conn)
+                res = conn.execute(
+                    """
+                    SELECT response FROM answer_cache
+                    WHERE template_id = ? AND asin = ? AND db_version = ? AND created_at >= ?
+                """,
+                    [template_id, asin, db_version, datetime.now() - self.ttl],
+                ).fetchone()
+                if res:
+                    conn.execute(
+                        "UPDATE answer_cache SET hits = hits + 1 WHERE template_id = ? AND asin = ? AND db_version = ?",
+                        [template_id, asin, db_version],
+                    )
+                self._count(conn, template_id, "hits" if res else "misses")
+            log_event("answer_cache", {"template_id": template_id, "asin": asin, "hit": bool(res)})
+            return res[0] if res else None
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] get failed: {e}")
+            return None
+
+    def put(self, template_id: str, asin: str, db_version: str, response: str):
+        """Store an answer; older versions of the same (template, asin) are dropped."""
+        try:
+            with duckdb.connect(self.db_path) as conn:
+                self._ensure_schema(conn)
+                conn.execute(
+                    "DELETE FROM answer_cache WHERE template_id = ? AND asin = ? AND db_version != ?",
+                    [template_id, asin, db_version],
+                )
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO answer_cache (template_id, asin, db_version, response, created_at, hits)
+                    VALUES (?, ?, ?, ?, ?, 0)
+                """,
+                    [template_id, asin, db_version, response, datetime.now()],
+                )
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] put failed: {e}")
+
+    def record_bypass(self, template_id: str):
+        """User asked to regenerate a cached answer."""
+        try:
+            with duckdb.connect(self.db_path) as conn:
+                self._ensure_schema(conn)
+                self._count(conn, template_id, "bypasses")
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] stats failed: {e}")
+
+    def purge_expired(self) -> int:
+        try:
+            with duckdb.connect(self.db_path) as conn:
+                self._ensure_schema(conn)
+                before = conn.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+                conn.execute("DELETE FROM answer_cache WHERE created_at < ?", [datetime.now() - self.ttl])
+                return before - conn.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] purge failed: {e}")
+            return 0
+
+    def get_stats(self) -> pd.DataFrame:
+        """Per-template hits / misses / bypasses and hit rate (%)."""
+        try:
+            with duckdb.connect(self.db_path) as conn:
+                self._ensure_schema(conn)
+                return conn.execute("""
+                    SELECT s.template_id, s.hits, s.misses, s.bypasses,
+                           ROUND(s.hits * 100.0 / NULLIF(s.hits + s.misses, 0), 1) as hit_rate,
+                           (SELECT COUNT(*) FROM answer_cache c WHERE c.template_id = s.template_id) as entries
+                    FROM answer_cache_stats s
+                    ORDER BY s.hits + s.misses DESC
+                """).df()
+        except Exception as e:
+            print(f"⚠️ [AnswerCache] stats failed: {e}")
+            return pd.DataFrame()
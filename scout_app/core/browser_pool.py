@@ -0,0 +1,146 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
+)
+POOL_SIZE = int(os.getenv("BROWSER_POOL_CONTEXTS", "3"))
+BLOCKED_RESOURCES = {"image", "font", "media"}
+CONTEXT_COOLDOWN = (15, 30)  # Seconds a context rests between two pages (same pace as the old serial nap)
+DOMAIN_INTERVAL = (2.0, 5.0)  # Min gap + jitter between two requests to the same domain, across contexts
+PAGE_TIMEOUT_MS = 30000
+
+
+class DomainRateLimiter:
+    """Spaces requests to one domain by min gap + random jitter (asyncio, single loop)."""
+
+    def __init__(self, interval: Tuple[float, float] = DOMAIN_INTERVAL):
+        self.interval = interval
+        self._next_slot = {}
+
+    async def wait(self, url: str):
+        domain = urlsplit(url).netloc
+        now = time.monotonic()
+        start = max(now, self._next_slot.get(domain, 0.0))
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        self._next_slot[domain] = start + random.uniform(*self.interval)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class BrowserPool:
+    """
+    One Chromium with `size` reusable contexts for page fetches.
+    Images / fonts / media are aborted at the route level, each context rests
+    CONTEXT_COOLDOWN between pages and every request goes through a per-domain
+    limiter, so N contexts give ~N x throughput without a faster per-context pace.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        headless: bool = True,
+        user_agent: str = USER_AGENT,
+        blocked: set = BLOCKED_RESOURCES,
+        cooldown: Tuple[float, float] = CONTEXT_COOLDOWN,
+        limiter: Optional[DomainRateLimiter] = None,
+    ):
+        self.size = max(1, size)
+        self.headless = headless
+        self.user_agent = user_agent
+        self.blocked = set(blocked)
+        self.cooldown = cooldown
+        self.limiter = limiter or DomainRateLimiter()
+        self.stats = {"pages": 0, "blocked_requests": 0, "errors": 0}
+        self._playwright = None
+        self._browser = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        """Launch (or relaunch after a crash) the browser and its contexts."""
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            # Refill the same queue: callers already waiting in get() are woken by the new contexts
+            if self._idle is None:
+                self._idle = asyncio.Queue()
+            while not self._idle.empty():
+                self._idle.get_nowait()  # Idle contexts of the crashed browser
+            for _ in range(self.size):
+                self._idle.put_nowait((await self._new_context(), 0.0))
+            print(f"🌐 [BrowserPool] Browser launched with {self.size} contexts.")
+
+    async def _new_context(self):
+        context = await self._browser.new_context(user_agent=self.user_agent)
+        if self.blocked:
+            await context.route("**/*", self._route)
+        return context
+
+    def _alive(self, context) -> bool:
+        return context.browser is self._browser and self._browser.is_connected()
+
+    async def _route(self, route):
+        if route.request.resource_type in self.blocked:
+            self.stats["blocked_requests"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def context(self):
+        """Borrow an idle context (waits for its cooldown); returned to the pool afterwards."""
+        while True:
+            await self.start()
+            context, ready_at = await self._idle.get()
+            if self._alive(context):
+                break
+            # Context of a crashed browser: drop it, the next start() relaunches and refills
+        try:
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield context
+        finally:
+            if self._alive(context):
+                self._idle.put_nowait((context, time.monotonic() + random.uniform(*self.cooldown)))
+            else:
+                # Contexts of a crashed browser are dropped; relaunch now so callers
+                # already waiting for a context get the fresh ones
+                try:
+                    await self.start()
+                except Exception as e:
+                    print(f"⚠️ [BrowserPool] Relaunch failed: {e}")
+
+    async def fetch(self, url: str, timeout_ms: int = PAGE_TIMEOUT_MS) -> str:
+        """Page HTML after DOMContentLoaded (blocked resources never load)."""
+        async with self.context() as context:
+            await self.limiter.wait(url)
+            page = await context.new_page()
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+                self.stats["pages"] += 1
+                return await page.content()
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                await page.close()
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()  # Closes every context
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
@@ -0,0 +1,150 @@
+import json
+from typing import List
+from google.genai import types
+
+# History budget for the Detective chat (rough tokens = chars / 4)
+HISTORY_TOKEN_BUDGET = 8000
+COMPACT_TARGET_TOKENS = 4000  # Size after compaction: several turns fit before the next one
+KEEP_RECENT_TURNS = 3  # At most this many recent user turns kept (tool calls included)
+TOOL_RESULT_MAX_CHARS = 1500  # Tool payloads in kept turns are cut to this on compaction
+SUMMARY_MAX_CHARS = 3000
+TRANSCRIPT_MAX_CHARS = 1500  # Per message, when feeding old turns to the summarizer
+SUMMARY_MARKER = "[Summary of our conversation so far]"
+
+SUMMARY_PROMPT = """You maintain the running memory of a market-research chat between a user and an e-commerce analyst bot.
+Merge the previous summary and the new exchanges below into ONE concise summary (max 200 words).
+Keep: ASINs discussed, the user's goals, key numbers / findings / competitors, decisions and open questions.
+Drop greetings, formatting and anything repeated.
+
+PREVIOUS SUMMARY:
+{summary}
+
+NEW EXCHANGES:
+{transcript}
+"""
+
+
+def _part_chars(part) -> int:
+    if getattr(part, "text", None):
+        return len(part.text)
+    if getattr(part, "function_call", None):
+        return len(json.dumps(dict(part.function_call.args or {}), default=str)) + 50
+    if getattr(part, "function_response", None):
+        return len(json.dumps(part.function_response.response or {}, default=str)) + 50
+    return 0
+
+
+def estimate_tokens(history) -> int:
+    return sum(_part_chars(p) for c in history for p in (c.parts or [])) // 4
+
+
+def _is_user_text(content) -> bool:
+    return content.role == "user" and any(getattr(p, "text", None) for p in (content.parts or []))
+
+
+def split_turns(history) -> List[list]:
+    """Group contents into turns: a user text message + every tool round-trip / reply after it."""
+    turns = []
+    for content in history:
+        if _is_user_text(content) or not turns:
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _trim_part(part):
+    response = getattr(part, "function_response", None)
+    if not response:
+        return part
+    raw = json.dumps(response.response or {}, default=str)
+    if len(raw) <= TOOL_RESULT_MAX_CHARS:
+        return part
+    return types.Part(
+        function_response=types.FunctionResponse(
+            id=getattr(response, "id", None),
+            name=response.name,
+            response={"result": raw[:TOOL_RESULT_MAX_CHARS] + " ...[truncated]"},
+        )
+    )
+
+
+def trim_tool_payloads(history) -> list:
+    """Same contents with every oversized tool result cut to TOOL_RESULT_MAX_CHARS."""
+    return [types.Content(role=c.role, parts=[_trim_part(p) for p in (c.parts or [])]) for c in history]
+
+
+def render_transcript(turns) -> str:
+    """Plain-text view of old turns for the summarizer (tool payloads reduced to their names)."""
+    lines = []
+    for turn in turns:
+        for content in turn:
+            for part in content.parts or []:
+                if getattr(part, "text", None):
+                    who = "USER" if content.role == "user" else "ANALYST"
+                    lines.append(f"{who}: {part.text[:TRANSCRIPT_MAX_CHARS]}")
+                elif getattr(part, "function_call", None):
+                    lines.append(f"[tool call: {part.function_call.name}]")
+    return "\n".join(lines)
+
+
+class ChatContext:
+    """
+    Keeps the Detective chat history under HISTORY_TOKEN_BUDGET: once over budget, tool
+    payloads are trimmed and older turns are folded into a rolling summary (replayed as
+    the first exchange of the rebuilt session) until the history is back under
+    COMPACT_TARGET_TOKENS, so compaction runs once per budget crossing, not every turn.
+    """
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+        self.summary = ""
+
+    def needs_compaction(self, history) -> bool:
+        return estimate_tokens(history) > HISTORY_TOKEN_BUDGET
+
+    def _summarize(self, turns) -> str:
+        transcript = render_transcript(turns)
+        try:
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=SUMMARY_PROMPT.format(summary=self.summary or "(none)", transcript=transcript),
+            )
+            summary = (response.text or "").strip()
+            if summary:
+                return summary[:SUMMARY_MAX_CHARS]
+        except Exception as e:
+            print(f"⚠️ [ChatContext] Summarization failed, keeping tail of transcript: {e}")
+        # Fallback: keep the most recent part of the raw transcript
+        return f"{self.summary}\n{transcript}".strip()[-SUMMARY_MAX_CHARS:]
+
+    def _summary_turn(self) -> list:
+        return [
+            types.Content(role="user", parts=[types.Part(text=f"{SUMMARY_MARKER}\n{self.summary}")]),
+            types.Content(role="model", parts=[types.Part(text="Noted. I will use this context.")]),
+        ]
+
+    def compact(self, history) -> list:
+        """History for a (re)built session: summary exchange + the recent turns verbatim."""
+        history = list(history or [])
+        if history and _is_user_text(history[0]) and (history[0].parts[0].text or "").startswith(SUMMARY_MARKER):
+            history = history[2:]  # Old summary exchange, re-added below from self.summary
+
+        if self.needs_compaction(history):
+            turns = split_turns(trim_tool_payloads(history))
+            keep = min(KEEP_RECENT_TURNS, len(turns))
+            while keep > 1 and estimate_tokens([c for turn in turns[-keep:] for c in turn]) > COMPACT_TARGET_TOKENS:
+                keep -= 1
+            old, recent = turns[:-keep], turns[-keep:]
+            if old:
+                self.summary = self._summarize(old)
+            history = [c for turn in recent for c in turn]
+            print(
+                f"🧠 [ChatContext] Trimmed tool payloads, folded {len(old)} turns into summary "
+                f"({estimate_tokens(history)} tokens kept)"
+            )
+
+        return (self._summary_turn() if self.summary else []) + history
+
+    def reset(self):
+        self.summary = ""
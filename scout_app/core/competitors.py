@@ -0,0 +1,155 @@
+import duckdb
+import pandas as pd
+from typing import List, Optional
+from .config import Settings
+
+# Ratings-volume bands (candidate ratings / my ratings)
+STRICT_BAND = (0.6, 1.4)  # band 1: +/- 40%
+WIDE_BAND = (0.4, 1.6)  # band 2: +/- 60% (fallback when band 1 is too thin)
+STRICT_MIN = 5  # Fewer strict candidates than this -> include band 2
+MAX_PER_BAND = 100
+
+# Affinity weights
+NICHE_WEIGHT = 10
+LINE_WEIGHT = 1
+
+
+def ensure_competitor_candidates(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS competitor_candidates (
+            asin VARCHAR,
+            candidate_asin VARCHAR,
+            score INTEGER,
+            niche_match BOOLEAN,
+            line_match BOOLEAN,
+            band INTEGER,
+            ratings_gap DOUBLE,
+            PRIMARY KEY (asin, candidate_asin)
+        );
+        CREATE INDEX IF NOT EXISTS idx_competitor_candidates_candidate ON competitor_candidates (candidate_asin);
+    """)
+
+
+def has_competitor_candidates(conn) -> bool:
+    res = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'competitor_candidates'"
+    ).fetchone()
+    return bool(res and res[0])
+
+
+def rebuild_competitor_candidates(conn, parent_asins: Optional[List[str]] = None) -> int:
+    """
+    Precompute Showdown matchmaking: same category (strict arena), ratings volume
+    within WIDE_BAND, ranked by niche/line affinity then ratings gap.
+
+    Incremental: a changed parent can enter/leave any list in its category, so the
+    scope is every parent sharing a category with `parent_asins` (old or new) plus
+    the changed parents themselves. `None` rebuilds everything.
+    """
+    if parent_asins is not None and not has_competitor_candidates(conn):
+        parent_asins = None
+    ensure_competitor_candidates(conn)
+
+    if parent_asins is None:
+        conn.execute("DELETE FROM competitor_candidates")
+        conn.execute("CREATE OR REPLACE TEMP TABLE temp_comp_scope AS SELECT parent_asin FROM product_parents")
+    else:
+        parent_asins = [a for a in dict.fromkeys(parent_asins) if a]
+        if not parent_asins:
+            return 0
+        conn.register("temp_comp_changed", pd.DataFrame({"parent_asin": parent_asins}))
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE temp_comp_scope AS
+            SELECT parent_asin FROM temp_comp_changed
+            UNION
+            SELECT parent_asin FROM product_parents
+            WHERE category IN (SELECT category FROM product_parents WHERE parent_asin IN (SELECT parent_asin FROM temp_comp_changed))
+            UNION
+            SELECT asin FROM competitor_candidates WHERE candidate_asin IN (SELECT parent_asin FROM temp_comp_changed)
+        """)
+        conn.unregister("temp_comp_changed")
+        conn.execute("DELETE FROM competitor_candidates WHERE asin IN (SELECT parent_asin FROM temp_comp_scope)")
+
+    conn.execute(f"""
+        INSERT INTO competitor_candidates (asin, candidate_asin, score, niche_match, line_match, band, ratings_gap)
+        WITH base AS (
+            SELECT pp.parent_asin as asin, pp.category, p.product_line,
+                   COALESCE(p.real_total_ratings, 0) as ratings
+            FROM product_parents pp
+            JOIN products p ON p.asin = pp.parent_asin
+            WHERE pp.category IS NOT NULL AND pp.category != ''
+        ),
+        prim AS (
+            -- Primary niche = most common niche among the family's variations
+            SELECT parent_asin, niche FROM (
+                SELECT pn.parent_asin, pn.niche,
+                       row_number() OVER (PARTITION BY pn.parent_asin ORDER BY COUNT(p.asin) DESC, pn.niche) as rn
+                FROM parent_niches pn
+                LEFT JOIN products p ON p.parent_asin = pn.parent_asin AND trim(p.main_niche) = pn.niche
+                GROUP BY pn.parent_asin, pn.niche
+            ) WHERE rn = 1
+        ),
+        pairs AS (
+            SELECT
+                me.asin, c.asin as candidate_asin,
+                (cn.niche IS NOT NULL) as niche_match,
+                COALESCE(c.product_line = me.product_line, FALSE) as line_match,
+                CASE WHEN c.ratings BETWEEN me.ratings * {STRICT_BAND[0]} AND me.ratings * {STRICT_BAND[1]}
+                     THEN 1 ELSE 2 END as band,
+                ABS(c.ratings - me.ratings) as ratings_gap
+            FROM base me
+            JOIN base c
+              ON c.category = me.category
+             AND c.asin != me.asin
+             AND c.ratings BETWEEN me.ratings * {WIDE_BAND[0]} AND me.ratings * {WIDE_BAND[1]}
+            LEFT JOIN prim mp ON mp.parent_asin = me.asin
+            LEFT JOIN parent_niches cn ON cn.parent_asin = c.asin AND cn.niche = mp.niche
+            WHERE me.asin IN (SELECT parent_asin FROM temp_comp_scope)
+        )
+        SELECT asin, candidate_asin, score, niche_match, line_match, band, ratings_gap FROM (
+            SELECT *,
+                   (CASE WHEN niche_match THEN {NICHE_WEIGHT} ELSE 0 END) + (CASE WHEN line_match THEN {LINE_WEIGHT} ELSE 0 END) as score,
+                   row_number() OVER (
+                       PARTITION BY asin, band
+                       ORDER BY (CASE WHEN niche_match THEN {NICHE_WEIGHT} ELSE 0 END) + (CASE WHEN line_match THEN {LINE_WEIGHT} ELSE 0 END) DESC,
+                                ratings_gap ASC, candidate_asin
+                   ) as rn
+            FROM pairs
+        ) WHERE rn <= {MAX_PER_BAND}
+    """)
+
+    total = conn.execute("SELECT COUNT(*) FROM temp_comp_scope").fetchone()[0]
+    conn.execute("DROP TABLE IF EXISTS temp_comp_scope")
+    return total
+
+
+# Ranked shortlist for one parent: strict band, widened to band 2 when too thin.
+# Params: [asin, STRICT_MIN, limit]
+SHORTLIST_SQL = """
+    WITH c AS (SELECT * FROM competitor_candidates WHERE asin = ?),
+    use_band AS (SELECT CASE WHEN COUNT(*) FILTER (WHERE band = 1) >= ? THEN 1 ELSE 2 END as b FROM c)
+    SELECT c.candidate_asin, c.score, c.niche_match, c.line_match, c.band, c.ratings_gap
+    FROM c, use_band
+    WHERE c.band <= use_band.b
+    ORDER BY c.score DESC, c.ratings_gap ASC, c.candidate_asin
+    LIMIT ?
+"""
+
+
+def get_shortlist(conn, asin: str, limit: int = MAX_PER_BAND) -> pd.DataFrame:
+    if not has_competitor_candidates(conn):
+        return pd.DataFrame()
+    return conn.execute(SHORTLIST_SQL, [asin, STRICT_MIN, int(limit)]).df()
+
+
+def rebuild_all(db_path=None):
+    """Full rebuild against a DB file (CLI entry point)."""
+    db_path = db_path or str(Settings.get_active_db_path())
+    with duckdb.connect(db_path) as conn:
+        total = rebuild_competitor_candidates(conn)
+    print(f"⚔️ [Competitors] Rebuilt shortlists for {total} parents on {db_path}")
+    return total
+
+
+if __name__ == "__main__":
+    rebuild_all()
@@ -40,6 +40,7 @@ class Settings:
     # Static Databases (Auth & Audit)
     SYSTEM_DB = DB_DIR / "system.duckdb"
     LOGS_DB = DB_DIR / "logs.duckdb"
+    JOBS_DB = DB_DIR / "jobs.duckdb"  # Worker job registry (core/jobs.py)
 
     # Blue-Green DB Paths (Social Scout - ISOLATED)
     DB_SOCIAL_A = DB_DIR / "social_a.duckdb"
@@ -60,7 +61,11 @@ class Settings:
     GEMINI_JANITOR_KEY = os.getenv("GEMINI_JANITOR_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # Strategy Hub quick-action answer cache (see core/answer_cache.py)
+    ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", "24"))
+
     APIFY_ACTOR_ID = "axesso_data/amazon-reviews-scraper"
+    APIFY_API_URL = os.getenv("APIFY_API_URL")  # None = api.apify.com (set to a local stub for tests)
     GEMINI_MODEL = "models/gemini-3-flash-preview"
 
     @classmethod
@@ -82,6 +87,21 @@ class Settings:
         active = cls.get_active_db_path()
         return cls.DB_PATH_B if active == cls.DB_PATH_A else cls.DB_PATH_A
 
+    @classmethod
+    def get_db_version(cls, db_path=None) -> str:
+        """
+        Cheap version stamp of a DB file (default: ACTIVE DB): name + last write time, WAL included.
+        Changes on swap and on any committed write -> safe cache key for UI data.
+        """
+        active = Path(db_path) if db_path else cls.get_active_db_path()
+        mtimes = [0]
+        for p in (active, active.with_name(active.name + ".wal")):
+            try:
+                mtimes.append(p.stat().st_mtime_ns)
+            except OSError:
+                pass
+        return f"{active.name}:{max(mtimes)}"
+
     @classmethod
     def swap_db(cls):
         """Switch Active <-> Standby."""
@@ -0,0 +1,249 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Union
+
+import duckdb
+from .config import Settings
+
+try:
+    import fcntl
+except ImportError:  # Windows dev box: in-process serialization only
+    fcntl = None
+
+GROUP_COMMIT_WINDOW = 0.05  # seconds to wait for more commands after the first one
+MAX_BATCH = 200  # commands per transaction
+WRITE_TIMEOUT = 120  # seconds a caller waits for its command
+
+_STOP = object()  # Queue sentinel: writer thread exits
+
+
+class WriteTimeout(TimeoutError):
+    """Command still queued after the caller's timeout (active DB locked by ingest / dedup); it was cancelled."""
+
+# A command is a callable run with the write connection, or a (kind, sql, params) tuple
+# with kind "execute" (params = one parameter list) or "executemany" (params = rows)
+WriteCommand = Union[Callable[[Any], Any], tuple]
+
+
+@contextmanager
+def write_lock(db_path):
+    """
+    Cross-process write lock for one DB file (<db>.writelock).
+    Bulk writers in other processes (ingest, recalc, scripts) take it around their
+    write connection so they wait for each other instead of failing on DuckDB's file lock.
+    """
+    if fcntl is None:
+        yield db_path
+        return
+    with open(f"{db_path}.writelock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield db_path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def active_write_lock():
+    """
+    write_lock of the ACTIVE DB, Blue-Green safe: ingest / dedup hold the lock from copy
+    to swap, so a waiter re-checks the pointer once it gets the lock and retries on the
+    new active DB instead of writing to (or copying) the old one. Yields the DB path.
+    """
+    while True:
+        db_path = Settings.get_active_db_path()
+        with write_lock(db_path):
+            if Settings.get_active_db_path() != db_path:
+                continue
+            yield db_path
+            return
+
+
+@contextmanager
+def write_connection(db_path=None):
+    """Locked read-write connection (default: active DB) for bulk jobs that cannot go through the DBWriter queue."""
+    lock = write_lock(db_path) if db_path else active_write_lock()
+    with lock as locked_path:
+        with duckdb.connect(str(db_path or locked_path)) as conn:
+            yield conn
+
+
+def _wait(future: Future, timeout: float):
+    """
+    Result of a submitted command. A command still queued at the timeout is cancelled, so
+    it can never commit after the caller gave up (no duplicate on retry); one the writer
+    already started is waited for, since it is about to commit.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        if future.cancel():
+            raise WriteTimeout(f"DB writer busy for {timeout}s (active DB locked by another job), write cancelled") from None
+        return future.result()
+
+
+def _run_command(conn, command: WriteCommand):
+    if callable(command):
+        return command(conn)
+    kind, sql, params = command
+    if kind == "executemany":
+        conn.executemany(sql, params)
+    elif kind == "execute":
+        conn.execute(sql, params)
+    else:
+        raise ValueError(f"Unknown write command kind: {kind!r}")
+    return None
+
+
+def _commit_checked(conn):
+    """
+    COMMIT that cannot silently roll back: a command that caught its own DuckDB error
+    leaves the transaction aborted, and COMMIT on an aborted transaction "succeeds"
+    while discarding every write in it. Probe first; the probe raises once aborted.
+    """
+    conn.execute("SELECT 1")
+    conn.execute("COMMIT")
+
+
+def _rollback(conn):
+    try:
+        conn.execute("ROLLBACK")
+    except duckdb.Error:
+        pass  # Transaction already aborted by a failed COMMIT
+
+
+class DBWriter:
+    """
+    Single writer of the active DB for this process: one thread owns the write
+    connection and applies queued commands, group-committing up to MAX_BATCH of them
+    per transaction. The connection is closed whenever the queue is idle, so readers
+    in other processes can still open the file read-only between batches.
+    Keep commands short (one ASIN's recalc, not a whole set): a batch blocks every
+    command queued behind it.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path  # None = active DB (Blue-Green aware, resolved per batch)
+        self._queue = queue.Queue()
+        self._stats = {"commands": 0, "batches": 0, "failed": 0, "retried_batches": 0, "cancelled": 0}
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    # --- Producer API ---
+    def submit(self, command: WriteCommand) -> Future:
+        future = Future()
+        self._queue.put((command, future))
+        return future
+
+    def run(self, fn: Callable[[Any], Any], timeout: float = WRITE_TIMEOUT):
+        """Run fn(conn) on the writer thread and wait for its result (WriteTimeout if never started)."""
+        return _wait(self.submit(fn), timeout)
+
+    def execute(self, sql: str, params=None, timeout: float = WRITE_TIMEOUT):
+        return _wait(self.submit(("execute", sql, params)), timeout)
+
+    def executemany(self, sql: str, rows: list, timeout: float = WRITE_TIMEOUT):
+        if rows:
+            _wait(self.submit(("executemany", sql, [tuple(r) for r in rows])), timeout)
+
+    def stats(self) -> dict:
+        return {**self._stats, "queued": self._queue.qsize()}
+
+    def close(self, timeout: float = WRITE_TIMEOUT):
+        """Apply what is already queued, then stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put((_STOP, None))
+            self._thread.join(timeout=timeout)
+
+    # --- Writer thread ---
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + GROUP_COMMIT_WINDOW
+        while len(batch) < MAX_BATCH and batch[-1][0] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(0, remaining)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            items = self._next_batch()
+            stop = items[-1][0] is _STOP
+            batch = [(cmd, fut) for cmd, fut in items if cmd is not _STOP]
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            self._apply(batch)
+        except Exception as e:  # Could not even open the DB
+            print(f"❌ [DBWriter] Batch of {len(batch)} failed: {e}")
+            for _, fut in batch:
+                try:
+                    fut.set_exception(e)
+                    self._stats["failed"] += 1
+                except InvalidStateError:  # Cancelled by its caller or already resolved
+                    pass
+
+    def _apply(self, batch):
+        # active_write_lock: writes queued during an ingest / dedup land in the new active DB
+        lock = write_lock(self.db_path) if self.db_path else active_write_lock()
+        with lock as locked_path:
+            # Commands stay cancellable while we wait for the lock; callers that timed out are dropped
+            queued = len(batch)
+            batch = [(cmd, fut) for cmd, fut in batch if fut.set_running_or_notify_cancel()]
+            self._stats["cancelled"] += queued - len(batch)
+            if not batch:
+                return
+            with duckdb.connect(str(self.db_path or locked_path)) as conn:
+                self._commit(conn, batch)
+
+    def _commit(self, conn, batch):
+        """One transaction for the whole batch; if it fails, retry each command alone."""
+        self._stats["batches"] += 1
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            results = [_run_command(conn, cmd) for cmd, _ in batch]
+            _commit_checked(conn)
+        except Exception:
+            _rollback(conn)
+            if len(batch) > 1:
+                self._stats["retried_batches"] += 1
+            for cmd, fut in batch:
+                try:
+                    conn.execute("BEGIN TRANSACTION")
+                    result = _run_command(conn, cmd)
+                    _commit_checked(conn)  # A command that aborted its own transaction fails here
+                    fut.set_result(result)
+                    self._stats["commands"] += 1
+                except Exception as e:
+                    _rollback(conn)
+                    print(f"⚠️ [DBWriter] Write failed: {e}")
+                    fut.set_exception(e)
+                    self._stats["failed"] += 1
+            return
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
+        self._stats["commands"] += len(batch)
+
+
+_WRITER: Optional[DBWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_writer() -> DBWriter:
+    """Process-wide writer of the active DB (started on first use)."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = DBWriter()
+            atexit.register(_WRITER.close)  # Join the thread before DuckDB tears down
+        return _WRITER
@@ -2,23 +2,37 @@ import duckdb
 import os
 import json
 import re
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 from google.genai import types
 from .config import Settings
 from .logger import log_event
+from .chat_context import ChatContext
+from .competitors import SHORTLIST_SQL, STRICT_MIN, MAX_PER_BAND
+from .detective_payloads import PAYLOAD_SQL, PAYLOAD_VERSION, build_dna_payload, build_swot_payload
+from .niches import PRIMARY_NICHE_SQL
+from .segments import LEXICON_SQL, default_lexicon, lexicon_from_rows, segment_counts_sql, shape_segment_counts
+from .text_index import TOKEN_SOURCE_SQL, matching_reviews_sql
 from .prompts import DETECTIVE_SYS_PROMPT, get_user_context_prompt
 
 # --- Config ---
 MODEL_NAME = Settings.GEMINI_MODEL
+TOOL_CACHE_SIZE = 256
+TOOL_WORKERS = 4  # Max tool calls of one model turn running concurrently
+VOCAB_LIMIT = 40  # Standard aspects injected into the system prompt
 
 
 class DetectiveAgent:
-    def __init__(self, api_key=None):
-        # ... rest of init ...
+    def __init__(self, api_key=None, client=None, db_path=None):
+        # client / db_path overrides: offline replay (scripts/bench_detective.py)
         self.api_key = api_key or os.getenv("GEMINI_API_KEY") or Settings.GEMINI_MINER_KEY
+        self.db_path = db_path
 
-        if self.api_key:
+        if client is not None:
+            self.client = client
+        elif self.api_key:
             self.client = genai.Client(api_key=self.api_key)
         else:
             self.client = None
@@ -26,14 +40,51 @@ class DetectiveAgent:
 
         self.chat_session = None
         self.system_prompt = DETECTIVE_SYS_PROMPT
+        # Bounded history (rolling summary) + the ASIN the session's system prompt was built for
+        self._context = ChatContext(self.client, MODEL_NAME) if self.client else None
+        self._session_asin = None
+
+        # One read connection per answer() call (see _open_read_conn)
+        self._conn = None
+        # Per-thread cursor + query error count (parallel tool calls, see _run_tools)
+        self._local = threading.local()
+        # Tool memo: (tool, args, db_version) -> result, kept across turns
+        self._tool_cache = {}
+        self._tool_cache_lock = threading.Lock()
+
+        # Answers served from AnswerCache this session (the chat session never saw them)
+        self._cached_exchanges = []
+        # False when the last answer_stream ended in an error / loop guard (do not cache it)
+        self.last_answer_ok = False
 
     # --- DB Helper (Blue-Green Aware) ---
     def _get_db_path(self):
-        return str(Settings.get_active_db_path())
+        return str(self.db_path or Settings.get_active_db_path())
+
+    def _open_read_conn(self):
+        """Open the shared read-only connection used by every tool query of this turn."""
+        self._close_read_conn()
+        try:
+            self._conn = duckdb.connect(self._get_db_path(), read_only=True)
+        except Exception as e:
+            print(f"DB Error in Detective (connect): {e}")
+            self._conn = None
+
+    def _close_read_conn(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
 
     def _run_query(self, query, params=None, fetch_df=True):
-        """Execute query safely against ACTIVE DB."""
+        """Execute query safely against ACTIVE DB (thread cursor / shared turn connection if open)."""
         try:
+            conn = getattr(self._local, "cursor", None) or self._conn
+            if conn is not None:
+                cur = conn.execute(query, params)
+                return cur.df() if fetch_df else cur.fetchall()
             db_path = self._get_db_path()
             with duckdb.connect(db_path, read_only=True) as conn:
                 if fetch_df:
@@ -41,26 +92,81 @@ class DetectiveAgent:
                 else:
                     return conn.execute(query, params).fetchall()
         except Exception as e:
+            self._local.query_errors = getattr(self._local, "query_errors", 0) + 1
             print(f"DB Error in Detective: {e}")
             return pd.DataFrame() if fetch_df else []
 
-    def _get_vocabulary(self):
-        """Get vocab for system prompt"""
+    def _call_tool_cached(self, fname, func, fargs, db_version):
+        """Memoize tool results by (tool, args, DB version). Failed calls are never cached."""
+        key = (fname, json.dumps(fargs, sort_keys=True, default=str), db_version)
+        with self._tool_cache_lock:
+            if key in self._tool_cache:
+                return self._tool_cache[key]
+
+        errors_before = getattr(self._local, "query_errors", 0)
+        result = func(**fargs)
+        if getattr(self._local, "query_errors", 0) == errors_before:
+            with self._tool_cache_lock:
+                if len(self._tool_cache) >= TOOL_CACHE_SIZE:
+                    self._tool_cache.pop(next(iter(self._tool_cache)))
+                self._tool_cache[key] = result
+        return result
+
+    def _run_tool_job(self, fname, func, fargs, db_version):
+        """Run one tool on a worker thread with its own cursor on the turn connection."""
+        cursor = None
+        if self._conn is not None:
+            try:
+                cursor = self._conn.cursor()
+            except Exception as e:
+                print(f"DB Error in Detective (cursor): {e}")
+        self._local.cursor = cursor
         try:
-            db_path = self._get_db_path()
-            with duckdb.connect(db_path, read_only=True) as conn:
-                check = conn.execute(
-                    "SELECT count(*) FROM information_schema.tables WHERE table_name = 'aspect_mapping'"
-                ).fetchone()[0]
-                if check == 0:
-                    return []
-
-                res = conn.execute(
-                    "SELECT DISTINCT standard_aspect FROM aspect_mapping WHERE standard_aspect IS NOT NULL"
-                ).fetchall()
+            return self._call_tool_cached(fname, func, fargs, db_version)
+        except Exception as tool_err:
+            return f"Tool Execution Error: {tool_err}"
+        finally:
+            self._local.cursor = None
+            if cursor is not None:
+                cursor.close()
+
+    def _run_tools(self, jobs, db_version):
+        """
+        Execute the independent tool calls of one model turn concurrently (bounded pool).
+        jobs = [(fname, func, fargs)]; results are returned in the same order.
+        """
+        if len(jobs) == 1:
+            fname, func, fargs = jobs[0]
+            try:
+                return [self._call_tool_cached(fname, func, fargs, db_version)]
+            except Exception as tool_err:
+                return [f"Tool Execution Error: {tool_err}"]
+
+        with ThreadPoolExecutor(max_workers=min(TOOL_WORKERS, len(jobs)), thread_name_prefix="detective-tool") as pool:
+            futures = [pool.submit(self._run_tool_job, fname, func, fargs, db_version) for fname, func, fargs in jobs]
+            return [f.result() for f in futures]
+
+    def _get_vocabulary(self, parent_asin: str = None):
+        """Vocab for system prompt: the product's top aspects, else the most common standard aspects."""
+        if parent_asin and self._has_table("product_aspect_impact"):
+            res = self._run_query(
+                "SELECT aspect FROM product_aspect_impact WHERE asin = ? ORDER BY total_impact_vol DESC, aspect LIMIT ?",
+                [parent_asin, VOCAB_LIMIT],
+                fetch_df=False,
+            )
+            if res:
                 return [r[0] for r in res]
-        except Exception:
+        if not self._has_table("aspect_mapping"):
             return []
+        res = self._run_query(
+            """
+            SELECT standard_aspect FROM aspect_mapping WHERE standard_aspect IS NOT NULL
+            GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT ?
+        """,
+            [VOCAB_LIMIT],
+            fetch_df=False,
+        )
+        return [r[0] for r in res]
 
     def _normalize_asin(self, asin: str) -> str:
         """Always returns the Parent ASIN for a given Child or Parent."""
@@ -72,6 +178,53 @@ class DetectiveAgent:
             return res.iloc[0]["parent_asin"]
         return asin
 
+    def _get_primary_niche(self, parent_asin: str):
+        """Primary niche from the normalized parent_niches table (None if unknown)."""
+        res = self._run_query(PRIMARY_NICHE_SQL, [parent_asin])
+        return res.iloc[0]["niche"] if not res.empty else None
+
+    def _has_table(self, table_name: str) -> bool:
+        res = self._run_query(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table_name], fetch_df=False
+        )
+        return bool(res and res[0][0])
+
+    def _has_token_sources(self, *sources: str) -> bool:
+        """review_tokens holds a full build of every source (else postings would miss older reviews)."""
+        if not self._has_table("review_tokens"):
+            return False
+        for source in sources:
+            res = self._run_query(TOKEN_SOURCE_SQL, [source], fetch_df=False)
+            if not (res and res[0][0]):
+                return False
+        return True
+
+    def _get_shortlist(self, parent_asin: str):
+        """Precomputed competitor shortlist (competitor_candidates). Empty if not built."""
+        if not self._has_table("competitor_candidates"):
+            return []
+        res = self._run_query(SHORTLIST_SQL, [parent_asin, STRICT_MIN, MAX_PER_BAND])
+        return res["candidate_asin"].tolist() if not res.empty else []
+
+    def _get_payload(self, parent_asin: str, tool: str):
+        """Precomputed tool payload (detective_payloads, current version) or None."""
+        if not self._has_table("detective_payloads"):
+            return None
+        res = self._run_query(PAYLOAD_SQL, [parent_asin, tool, PAYLOAD_VERSION], fetch_df=False)
+        return json.loads(res[0][0]) if res and res[0][0] else None
+
+    def _build_live(self, builder, parent_asin: str):
+        """Compute a payload on the fly (StatsEngine has not produced it yet)."""
+        conn = getattr(self._local, "cursor", None) or self._conn
+        try:
+            if conn is not None:
+                return builder(conn, parent_asin)
+            with duckdb.connect(self._get_db_path(), read_only=True) as conn:
+                return builder(conn, parent_asin)
+        except Exception:
+            self._local.query_errors = getattr(self._local, "query_errors", 0) + 1
+            raise
+
     # --- TOOLS DEFINITION ---
 
     def get_product_dna(self, asin: str) -> str:
@@ -79,65 +232,10 @@ class DetectiveAgent:
         parent_asin = self._normalize_asin(asin)
 
         try:
-            # 1. Fetch metadata from product_parents (Source of Truth for categorization)
-            query_parent = """
-                SELECT category, niche, title, brand, image_url 
-                FROM product_parents WHERE parent_asin = ?
-            """
-            parent_df = self._run_query(query_parent, [parent_asin])
-
-            # 2. Fetch technical specs from products
-            query_tech = """
-                SELECT material, target_audience, size_capacity, product_line, variation_count, 
-                       real_average_rating, real_total_ratings, rating_breakdown
-                FROM products WHERE asin = ?
-            """
-            tech_df = self._run_query(query_tech, [parent_asin])
-
-            # 3. Fetch pre-calculated metrics
-            query_stats = "SELECT metrics_json FROM product_stats WHERE asin = ?"
-            stats_res = self._run_query(query_stats, [parent_asin], fetch_df=False)
-
-            result = {
-                "asin": asin,
-                "parent_asin": parent_asin,
-                "metadata": {},
-                "market_stats": {},
-                "top_aspects": {"strengths": [], "weaknesses": []},
-            }
-
-            if not parent_df.empty:
-                result["metadata"].update(parent_df.iloc[0].to_dict())
-
-            if not tech_df.empty:
-                tech_data = tech_df.iloc[0].to_dict()
-                # Clean up technical data
-                result["metadata"].update(
-                    {
-                        k: v
-                        for k, v in tech_data.items()
-                        if k not in ["real_average_rating", "real_total_ratings", "rating_breakdown"]
-                    }
-                )
-                result["market_stats"] = {
-                    "avg_rating": tech_data.get("real_average_rating"),
-                    "total_reviews": tech_data.get("real_total_ratings"),
-                }
-
-            if stats_res:
-                stats = json.loads(stats_res[0][0])
-                sw = stats.get("sentiment_weighted", [])
-                result["top_aspects"]["strengths"] = [a["aspect"] for a in sw if a.get("net_impact", 0) > 0][:5]
-                result["top_aspects"]["weaknesses"] = [a["aspect"] for a in sw if a.get("net_impact", 0) < 0][-5:]
-
-                # --- NEW: Preference for Pre-calculated stats over raw product metadata ---
-                kpis = stats.get("kpis", {})
-                if kpis:
-                    result["market_stats"] = {
-                        "avg_rating": kpis.get("avg_rating"),
-                        "total_reviews": kpis.get("total_reviews"),
-                    }
-
+            result = self._get_payload(parent_asin, "get_product_dna")
+            if result is None:
+                result = self._build_live(build_dna_payload, parent_asin)
+            result["asin"] = asin
             return json.dumps(result, ensure_ascii=False)
         except Exception as e:
             return json.dumps({"error": str(e), "asin": asin})
@@ -160,8 +258,13 @@ class DetectiveAgent:
             clauses.append("rt.sentiment = ?")
             params.append(sentiment)
 
-        if keyword:
-            k_list = [k.strip() for k in keyword.split(",")]
+        k_list = [k.strip() for k in keyword.split(",") if k.strip()] if keyword else []
+        token_sql = matching_reviews_sql(k_list) if k_list and self._has_token_sources("text", "quote") else None
+        if token_sql:
+            # Postings lookup (review text + tag quotes) instead of ILIKE scans
+            clauses.append(f"rt.review_id IN ({token_sql})")
+            params.append(parent_asin)
+        elif k_list:
             or_clauses = []
             for k in k_list:
                 or_clauses.append("(rt.quote ILIKE ? OR r.text ILIKE ?)")
@@ -209,22 +312,19 @@ class DetectiveAgent:
             if niche_df.empty or not niche_df.iloc[0]["category"]:
                 return "Cannot find alternatives: The current product has no defined Category."
 
-            niche = niche_df.iloc[0]["niche"]
+            niche = self._get_primary_niche(parent_asin)
             category = niche_df.iloc[0]["category"]
 
             aspect_filter = ""
             if aspect_criteria and aspect_criteria != "Overall":
                 aspect_filter = f"AND (am.category = '{aspect_criteria}' OR am.standard_aspect = '{aspect_criteria}')"
 
-            # Mandatory Category Match (BỨC TƯỜNG THÉP)
-            where_clauses = ["pp.category = ?"]
-            params = [category]
-
-            # Optional Niche matching (Priority within category)
-            niche_filter = ""
-            if niche and niche not in ["None", "Non-defined", "null"]:
-                niche_filter = f"OR pp.niche ILIKE '%{niche}%'"
-
+            # Mandatory Category Match (BỨC TƯỜNG THÉP), same niche ranked first (exact membership)
+            # Candidate pool = precomputed shortlist when available, else the whole category
+            shortlist = self._get_shortlist(parent_asin)
+            pool_filter = ""
+            if shortlist:
+                pool_filter = f"AND p.parent_asin IN ({', '.join(['?'] * len(shortlist))})"
             query = f"""
                 SELECT 
                     p.parent_asin,
@@ -238,16 +338,15 @@ class DetectiveAgent:
                 WHERE pp.category = ?
                 AND p.parent_asin != ?
                 {aspect_filter}
+                {pool_filter}
                 GROUP BY 1, 2
                 HAVING count(*) > 10
                 ORDER BY 
-                    (CASE WHEN pp.niche ILIKE ? THEN 10 ELSE 0 END) DESC,
+                    (CASE WHEN p.parent_asin IN (SELECT parent_asin FROM parent_niches WHERE niche = ?) THEN 10 ELSE 0 END) DESC,
                     positive_score DESC
                 LIMIT 3
             """
-            # Using primary niche for ILIKE matching
-            primary_niche = f"%{niche.split(',')[0].strip()}%" if niche else "%"
-            res = self._run_query(query, [category, current_asin, primary_niche])
+            res = self._run_query(query, [category, current_asin] + shortlist + [niche])
             if res.empty:
                 return f"No better alternatives found specifically for '{aspect_criteria}' in {category} arena."
             return res.to_json(orient="records")
@@ -257,70 +356,11 @@ class DetectiveAgent:
     def get_product_swot(self, asin: str) -> str:
         parent_asin = self._normalize_asin(asin)
         try:
-            query = """
-                SELECT 
-                    COALESCE(am.standard_aspect, rt.aspect) as aspect,
-                    COUNT(*) as mentions,
-                    SUM(CASE WHEN rt.sentiment = 'Positive' THEN 1 ELSE 0 END) as pos_count,
-                    SUM(CASE WHEN rt.sentiment = 'Negative' THEN 1 ELSE 0 END) as neg_count,
-                    ROUND(SUM(CASE WHEN rt.sentiment = 'Positive' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as pos_ratio
-                FROM review_tags rt
-                LEFT JOIN aspect_mapping am ON lower(trim(rt.aspect)) = lower(trim(am.raw_aspect))
-                WHERE rt.parent_asin = ?
-                GROUP BY 1
-                HAVING mentions >= 3
-                ORDER BY mentions DESC
-            """
-            df = self._run_query(query, [parent_asin])
-
-            if df.empty:
+            swot = self._get_payload(parent_asin, "get_product_swot")
+            if swot is None:
+                swot = self._build_live(build_swot_payload, parent_asin)
+            if swot is None:
                 return f"No sentiment data found for ASIN {parent_asin}."
-
-            swot = {"strengths": [], "weaknesses": [], "controversial": [], "summary": {}}
-
-            # --- FIX: Use REAL METADATA from product_stats if available ---
-            stats_res = self._run_query(
-                "SELECT metrics_json FROM product_stats WHERE asin = ?", [parent_asin], fetch_df=False
-            )
-
-            if stats_res:
-                stats = json.loads(stats_res[0][0])
-                swot["summary"] = {
-                    "avg_rating": round(stats.get("kpis", {}).get("avg_rating", 0), 2),
-                    "total_reviews": int(stats.get("kpis", {}).get("total_reviews", 0)),
-                }
-            else:
-                # Fallback to products table
-                meta_stats = self._run_query(
-                    """
-                    SELECT real_average_rating, real_total_ratings 
-                    FROM products WHERE asin = ? 
-                """,
-                    [parent_asin],
-                ).iloc[0]
-                swot["summary"] = {
-                    "avg_rating": round(float(meta_stats["real_average_rating"] or 0), 2),
-                    "total_reviews": int(meta_stats["real_total_ratings"] or 0),
-                }
-
-            for _, row in df.iterrows():
-                item = {"aspect": row["aspect"], "mentions": int(row["mentions"]), "pos_ratio": float(row["pos_ratio"])}
-                if row["pos_ratio"] >= 75:
-                    swot["strengths"].append(item)
-                elif row["pos_ratio"] <= 40:
-                    q_query = f"SELECT quote FROM review_tags WHERE parent_asin=? AND (aspect=? OR aspect ILIKE ?) AND sentiment='Negative' LIMIT 1"
-                    aspect_pattern = f"%{row['aspect']}%"
-                    # Need specific query execution for fetchone, reusing _run_query logic minimally or just execute
-                    # For simplicity, using df and iloc
-                    sample_df = self._run_query(q_query, [asin, row["aspect"], aspect_pattern])
-                    item["sample_complaint"] = sample_df.iloc[0]["quote"] if not sample_df.empty else None
-                    swot["weaknesses"].append(item)
-                elif 40 < row["pos_ratio"] < 75:
-                    swot["controversial"].append(item)
-
-            swot["strengths"] = swot["strengths"][:5]
-            swot["weaknesses"] = swot["weaknesses"][:5]
-            swot["controversial"] = swot["controversial"][:3]
             return json.dumps(swot, default=str)
         except Exception as e:
             return f"SWOT Error: {e}"
@@ -363,47 +403,35 @@ class DetectiveAgent:
 
     def analyze_customer_context(self, asin: str) -> str:
         parent_asin = self._normalize_asin(asin)
-        targets = {
-            "End-User: Kids/Teens": [
-                "daughter",
-                "son",
-                "kid",
-                "child",
-                "teen",
-                "girl",
-                "boy",
-                "granddaughter",
-                "grandson",
-            ],
-            "End-User: Adults/Self": ["master bedroom", "myself", "husband", "wife", "we"],
-            "End-User: Guest": ["guest room", "visitor", "airbnb", "spare room"],
-            "End-User: College Student": ["dorm", "college", "campus", "student"],
-        }
-        occasions = {
-            "Gift": ["gift", "birthday", "christmas", "present", "xmas"],
-            "Renovation": ["remodel", "new house", "moving", "makeover"],
-            "Replacement": ["replace", "old comforter", "worn out"],
-        }
-        results = {"target_audience": {}, "usage_occasion": {}}
-
         try:
-            for group, keywords in targets.items():
-                kw_str = " OR ".join([f"text ILIKE '%{k}%'" for k in keywords])
-                df = self._run_query(
-                    f"SELECT COUNT(*) as c FROM reviews WHERE parent_asin = ? AND ({kw_str})", [parent_asin]
-                )
-                count = df.iloc[0]["c"] if not df.empty else 0
-                if count > 0:
-                    results["target_audience"][group] = int(count)
-
-            for group, keywords in occasions.items():
-                kw_str = " OR ".join([f"text ILIKE '%{k}%'" for k in keywords])
-                df = self._run_query(
-                    f"SELECT COUNT(*) as c FROM reviews WHERE parent_asin = ? AND ({kw_str})", [parent_asin]
+            # 1. Precomputed by StatsEngine (customer_segments in product_stats)
+            segments = None
+            stats_res = self._run_query(
+                "SELECT metrics_json FROM product_stats WHERE asin = ?", [parent_asin], fetch_df=False
+            )
+            if stats_res and stats_res[0][0]:
+                segments = json.loads(stats_res[0][0]).get("customer_segments")
+
+            # 2. Live fallback (not recalculated yet)
+            if segments is None:
+                cat_res = self._run_query(
+                    "SELECT category FROM product_parents WHERE parent_asin = ?", [parent_asin], fetch_df=False
                 )
-                count = df.iloc[0]["c"] if not df.empty else 0
-                if count > 0:
-                    results["usage_occasion"][group] = int(count)
+                category = cat_res[0][0] if cat_res else None
+                if self._has_table("segment_lexicon"):
+                    lexicon = lexicon_from_rows(
+                        self._run_query(LEXICON_SQL, [category or "", category or ""], fetch_df=False)
+                    )
+                else:
+                    lexicon = default_lexicon(category)
+                sql, params, groups = segment_counts_sql(lexicon, use_tokens=self._has_token_sources("text"))
+                segments = shape_segment_counts(self._run_query(sql, params + [parent_asin]), groups)
+
+            results = {"target_audience": {}, "usage_occasion": {}, "star_breakdown": {}}
+            for seg_type in ("target_audience", "usage_occasion"):
+                for segment, vals in (segments.get(seg_type) or {}).items():
+                    results[seg_type][segment] = vals["total"]
+                    results["star_breakdown"][segment] = vals.get("by_star", {})
 
             return json.dumps(results)
         except Exception as e:
@@ -476,15 +504,17 @@ class DetectiveAgent:
             dna = dna_df.iloc[0]
             current_parent = dna["parent_asin"]
             category = dna["category"]
-            niche = dna["niche"]
+            niche = self._get_primary_niche(current_parent)
             line = dna["product_line"]
             mat = dna["material"]
 
-            # 2. Build Query with Strict Category Match
-            params = [current_parent, category]
-
-            # Use primary niche for ILIKE matching
-            primary_niche = niche.split(",")[0].strip() if niche else ""
+            # 2. Build Query with Strict Category Match (same niche = exact parent_niches membership)
+            # Candidate pool = precomputed shortlist when available, else the whole category
+            shortlist = self._get_shortlist(current_parent)
+            pool_filter = ""
+            if shortlist:
+                pool_filter = f"AND pp.parent_asin IN ({', '.join(['?'] * len(shortlist))})"
+            params = [current_parent, category] + shortlist + [niche]
 
             comp_query = f"""
                 SELECT 
@@ -497,10 +527,11 @@ class DetectiveAgent:
                 JOIN product_parents pp ON p.parent_asin = pp.parent_asin
                 WHERE pp.parent_asin != ? 
                 AND pp.category = ? -- BỨC TƯỜNG THÉP
+                {pool_filter}
                 GROUP BY pp.parent_asin, pp.title, pp.brand
                 HAVING reviews > 5
                 ORDER BY 
-                    (CASE WHEN pp.niche ILIKE '%{primary_niche}%' THEN 10 ELSE 0 END) DESC,
+                    (CASE WHEN pp.parent_asin IN (SELECT parent_asin FROM parent_niches WHERE niche = ?) THEN 10 ELSE 0 END) DESC,
                     rating DESC, reviews DESC
                 LIMIT 3
             """
@@ -520,29 +551,31 @@ class DetectiveAgent:
             my_weak_df = self._run_query(my_weak_query, [current_parent])
             my_weaknesses = my_weak_df["aspect"].tolist() if not my_weak_df.empty else []
 
-            # 4. Analyze Each Competitor
+            # 4. Competitor strengths on our weak points: one grouped query for all pairs
+            strength_map = {}
+            if my_weaknesses:
+                comp_asins = comps_df["parent_asin"].tolist()
+                s_query = f"""
+                    SELECT rt.parent_asin, w.aspect as weak_point, COUNT(*) as cnt
+                    FROM review_tags rt
+                    LEFT JOIN aspect_mapping am ON rt.aspect = am.raw_aspect
+                    JOIN (SELECT unnest(?::VARCHAR[]) as aspect) w
+                      ON (am.standard_aspect = w.aspect OR rt.aspect = w.aspect)
+                    WHERE rt.parent_asin IN ({", ".join(["?"] * len(comp_asins))})
+                    AND rt.sentiment = 'Positive'
+                    GROUP BY 1, 2
+                """
+                for comp, weak_point, cnt in self._run_query(s_query, [my_weaknesses] + comp_asins, fetch_df=False):
+                    strength_map[(comp, weak_point)] = cnt
+
             results = []
             for _, row in comps_df.iterrows():
                 comp_asin = row["parent_asin"]
                 strengths = []
-
-                if my_weaknesses:
-                    for weak_point in my_weaknesses:
-                        s_query = """
-                            SELECT COUNT(*) FROM review_tags rt 
-                            LEFT JOIN aspect_mapping am ON rt.aspect = am.raw_aspect
-                            WHERE rt.parent_asin = ? 
-                            AND (am.standard_aspect = ? OR rt.aspect = ?) 
-                            AND rt.sentiment = 'Positive'
-                        """
-                        try:
-                            res = self._run_query(s_query, [comp_asin, weak_point, weak_point], fetch_df=False)
-                            count = res[0][0] if res else 0
-                        except:
-                            count = 0
-
-                        if count > 0:
-                            strengths.append(f"Better at '{weak_point}' ({count} positive mentions)")
+                for weak_point in my_weaknesses:
+                    count = strength_map.get((comp_asin, weak_point), 0)
+                    if count > 0:
+                        strengths.append(f"Better at '{weak_point}' ({count} positive mentions)")
 
                 results.append(
                     {
@@ -565,9 +598,61 @@ class DetectiveAgent:
         except Exception as e:
             return f"Competitor Analysis Error: {e}"
 
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text parts of a (streamed) response, ignoring function-call parts."""
+        try:
+            parts = chunk.candidates[0].content.parts or []
+        except (AttributeError, IndexError, TypeError):
+            return ""
+        return "".join(p.text for p in parts if getattr(p, "text", None))
+
+    def _send_stream(self, message, streamed: list):
+        """
+        Send one message, yielding token events as text arrives (also appended to `streamed`).
+        Returns the function calls requested by the model (empty list = final answer).
+        """
+        send_stream = getattr(self.chat_session, "send_message_stream", None)
+        if send_stream is None:  # Older SDK: no streaming, emit the whole reply at once
+            response = self.chat_session.send_message(message)
+            if response.function_calls:
+                return list(response.function_calls)
+            chunks = [response]
+        else:
+            chunks = send_stream(message)
+
+        function_calls = []
+        for chunk in chunks:
+            if chunk.function_calls:
+                function_calls.extend(chunk.function_calls)
+            text = self._chunk_text(chunk)
+            if text:
+                streamed.append(text)
+                yield {"type": "token", "text": text}
+        return function_calls
+
+    def note_cached_answer(self, user_query: str, response: str):
+        """Remember a cached exchange so the next real turn keeps the conversation context."""
+        self._cached_exchanges.append((user_query, response[:2000]))
+
     def answer(self, user_query: str, default_asin: str = None, user_id: str = "guest"):
+        """Blocking variant of answer_stream: returns the full response text."""
+        return "".join(
+            event["text"]
+            for event in self.answer_stream(user_query, default_asin=default_asin, user_id=user_id)
+            if event["type"] == "token"
+        )
+
+    def answer_stream(self, user_query: str, default_asin: str = None, user_id: str = "guest"):
+        """
+        Streaming answer. Yields events:
+          {"type": "tool", "name": ..., "args": {...}}  -> a tool is about to run
+          {"type": "token", "text": ...}                -> a chunk of the final response
+        """
+        self.last_answer_ok = False
         if not self.client:
-            return "Gemini API Key is missing."
+            yield {"type": "token", "text": "Gemini API Key is missing."}
+            return
 
         # Tools mapping
         tools_map = {
@@ -661,9 +746,18 @@ class DetectiveAgent:
             )
         ]
 
-        # Init session
-        if not self.chat_session:
-            vocab = self._get_vocabulary()
+        # One shared read connection for this whole turn (closed in the finally below)
+        self._open_read_conn()
+
+        # Init / rebuild session: first turn, ASIN switch, or history over budget (rolling summary)
+        session_asin = self._normalize_asin(default_asin) if default_asin else None
+        history = self.chat_session.get_history(curated=True) if self.chat_session else []
+        if (
+            not self.chat_session
+            or session_asin != self._session_asin
+            or self._context.needs_compaction(history)
+        ):
+            vocab = self._get_vocabulary(session_asin)
             vocab_str = ", ".join(vocab)
 
             # Build Full System Instruction
@@ -688,72 +782,91 @@ class DetectiveAgent:
             self.chat_session = self.client.chats.create(
                 model=MODEL_NAME,
                 config=types.GenerateContentConfig(tools=tool_declarations, system_instruction=system_instructions),
+                history=self._context.compact(history),
             )
+            self._session_asin = session_asin
 
-        final_response_text = ""
+        streamed = []  # Text chunks already sent to the caller
+        tool_rounds = []  # Function calls per model round, as requested (logged for offline replay)
         previous_tool_calls = []  # Track tool calls to prevent loops
+        db_version = Settings.get_db_version(self._get_db_path())
 
         try:
-            response = self.chat_session.send_message(user_query)
+            message = user_query
+            if self._cached_exchanges:
+                earlier = "\n\n".join(f"Q: {q}\nA: {a}" for q, a in self._cached_exchanges)
+                message = f"[Earlier in this conversation you already answered:]\n{earlier}\n\n[New question:]\n{user_query}"
+                self._cached_exchanges = []
             max_turns = 10
             for _ in range(max_turns):
-                if response.function_calls:
-                    parts = []
-                    current_calls = []
-
-                    for fc in response.function_calls:
-                        fname = fc.name
-                        fargs = dict(fc.args)  # Convert to dict
-
-                        # --- ROBUSTNESS: Auto-inject Default ASIN if missing ---
-                        if default_asin:
-                            if "asin" not in fargs and "asin" in tools_map[fname].__code__.co_varnames:
-                                fargs["asin"] = default_asin
-                            if "current_asin" not in fargs and "current_asin" in tools_map[fname].__code__.co_varnames:
-                                fargs["current_asin"] = default_asin
-                            if "asin_a" not in fargs and "asin_a" in tools_map[fname].__code__.co_varnames:
-                                fargs["asin_a"] = default_asin
-
-                        # --- LOOP DETECTION ---
-                        call_signature = f"{fname}:{json.dumps(fargs, sort_keys=True)}"
-                        if call_signature in previous_tool_calls:
-                            result = "SYSTEM ERROR: You already called this tool with these exact arguments. DO NOT DO IT AGAIN. Stop and answer with what you have."
-                        else:
-                            previous_tool_calls.append(call_signature)
-                            if fname in tools_map:
-                                try:
-                                    result = tools_map[fname](**fargs)
-                                except Exception as tool_err:
-                                    result = f"Tool Execution Error: {tool_err}"
-                            else:
-                                result = "Error: Tool not found"
-
-                        parts.append(
-                            types.Part(
-                                function_response=types.FunctionResponse(name=fname, response={"result": result})
-                            )
-                        )
-
-                    response = self.chat_session.send_message(parts)
-                else:
-                    final_response_text = response.text
+                function_calls = yield from self._send_stream(message, streamed)
+                if not function_calls:
+                    self.last_answer_ok = bool(streamed)
                     break
 
-            if not final_response_text:
-                final_response_text = "Agent stopped to prevent infinite loop. (Max turns reached)"
+                # Resolve args + loop detection serially, then run the real calls in parallel
+                calls, jobs = [], []
+                tool_rounds.append([{"name": fc.name, "args": dict(fc.args or {})} for fc in function_calls])
+                for fc in function_calls:
+                    fname = fc.name
+                    fargs = dict(fc.args or {})  # Convert to dict
+
+                    # --- ROBUSTNESS: Auto-inject Default ASIN if missing ---
+                    if default_asin and fname in tools_map:
+                        if "asin" not in fargs and "asin" in tools_map[fname].__code__.co_varnames:
+                            fargs["asin"] = default_asin
+                        if "current_asin" not in fargs and "current_asin" in tools_map[fname].__code__.co_varnames:
+                            fargs["current_asin"] = default_asin
+                        if "asin_a" not in fargs and "asin_a" in tools_map[fname].__code__.co_varnames:
+                            fargs["asin_a"] = default_asin
+
+                    # --- LOOP DETECTION ---
+                    call_signature = f"{fname}:{json.dumps(fargs, sort_keys=True)}"
+                    if call_signature in previous_tool_calls:
+                        calls.append((fname, "SYSTEM ERROR: You already called this tool with these exact arguments. DO NOT DO IT AGAIN. Stop and answer with what you have."))
+                    elif fname in tools_map:
+                        previous_tool_calls.append(call_signature)
+                        yield {"type": "tool", "name": fname, "args": fargs}
+                        calls.append((fname, len(jobs)))
+                        jobs.append((fname, tools_map[fname], fargs))
+                    else:
+                        previous_tool_calls.append(call_signature)
+                        calls.append((fname, "Error: Tool not found"))
+
+                results = self._run_tools(jobs, db_version) if jobs else []
+
+                parts = []
+                for fname, result in calls:
+                    if isinstance(result, int):
+                        result = results[result]
+                    parts.append(
+                        types.Part(function_response=types.FunctionResponse(name=fname, response={"result": result}))
+                    )
+
+                message = parts
+            else:
+                streamed.append("Agent stopped to prevent infinite loop. (Max turns reached)")
+                yield {"type": "token", "text": streamed[-1]}
 
         except Exception as e:
             self.chat_session = None
-            final_response_text = f"Detective Error: {e}"
+            streamed.append(f"Detective Error: {e}")
+            yield {"type": "token", "text": streamed[-1]}
+        finally:
+            self._close_read_conn()
 
         # --- LOGGING ---
         log_event(
             "chat_history",
-            {"user_id": user_id, "asin": default_asin, "query": user_query, "response": final_response_text},
+            {
+                "user_id": user_id,
+                "asin": default_asin,
+                "query": user_query,
+                "response": "".join(streamed),
+                "tool_calls": tool_rounds,
+            },
         )
 
-        return final_response_text
-
 
 if __name__ == "__main__":
     agent = DetectiveAgent()
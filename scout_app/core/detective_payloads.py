@@ -0,0 +1,244 @@
+import json
+import duckdb
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+from .config import Settings
+
+# Bump when the shape of a payload changes: older rows are ignored (Detective recomputes live)
+PAYLOAD_VERSION = 1
+
+# SWOT thresholds (pos_ratio %)
+SWOT_MIN_MENTIONS = 3
+STRENGTH_RATIO = 75
+WEAKNESS_RATIO = 40
+
+
+def ensure_detective_payloads(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS detective_payloads (
+            asin VARCHAR,
+            tool VARCHAR,
+            version INTEGER,
+            payload_json JSON,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (asin, tool)
+        )
+    """)
+
+
+def has_detective_payloads(conn) -> bool:
+    res = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'detective_payloads'"
+    ).fetchone()
+    return bool(res and res[0])
+
+
+# Params: [asin, tool, PAYLOAD_VERSION]
+PAYLOAD_SQL = "SELECT payload_json FROM detective_payloads WHERE asin = ? AND tool = ? AND version = ?"
+
+
+def _load_metrics(conn, parent_asin: str) -> Optional[Dict]:
+    res = conn.execute("SELECT metrics_json FROM product_stats WHERE asin = ?", [parent_asin]).fetchone()
+    return json.loads(res[0]) if res and res[0] else None
+
+
+def build_dna_payload(conn, parent_asin: str, metrics: Optional[Dict] = None) -> Dict:
+    """get_product_dna payload: metadata + market stats + top aspects (metrics = product_stats JSON)."""
+    if metrics is None:
+        metrics = _load_metrics(conn, parent_asin)
+
+    parent_df = conn.execute(
+        "SELECT category, niche, title, brand, image_url FROM product_parents WHERE parent_asin = ?", [parent_asin]
+    ).df()
+    tech_df = conn.execute(
+        """
+        SELECT material, target_audience, size_capacity, product_line, variation_count,
+               real_average_rating, real_total_ratings, rating_breakdown
+        FROM products WHERE asin = ?
+    """,
+        [parent_asin],
+    ).df()
+
+    result = {
+        "asin": parent_asin,
+        "parent_asin": parent_asin,
+        "metadata": {},
+        "market_stats": {},
+        "top_aspects": {"strengths": [], "weaknesses": []},
+    }
+
+    if not parent_df.empty:
+        result["metadata"].update(parent_df.iloc[0].to_dict())
+
+    if not tech_df.empty:
+        tech_data = tech_df.iloc[0].to_dict()
+        result["metadata"].update(
+            {
+                k: v
+                for k, v in tech_data.items()
+                if k not in ["real_average_rating", "real_total_ratings", "rating_breakdown"]
+            }
+        )
+        result["market_stats"] = {
+            "avg_rating": tech_data.get("real_average_rating"),
+            "total_reviews": tech_data.get("real_total_ratings"),
+        }
+
+    if metrics:
+        sw = metrics.get("sentiment_weighted", [])
+        result["top_aspects"]["strengths"] = [a["aspect"] for a in sw if a.get("net_impact", 0) > 0][:5]
+        result["top_aspects"]["weaknesses"] = [a["aspect"] for a in sw if a.get("net_impact", 0) < 0][-5:]
+
+        # Pre-calculated stats win over raw product metadata
+        kpis = metrics.get("kpis", {})
+        if kpis:
+            result["market_stats"] = {
+                "avg_rating": kpis.get("avg_rating"),
+                "total_reviews": kpis.get("total_reviews"),
+            }
+
+    # Round-trip through JSON so numpy / timestamp values are stored as plain JSON
+    return json.loads(json.dumps(result, ensure_ascii=False, default=str))
+
+
+def build_swot_payload(conn, parent_asin: str, metrics: Optional[Dict] = None) -> Optional[Dict]:
+    """get_product_swot payload, or None when the product has no sentiment data yet."""
+    df = conn.execute(
+        f"""
+        SELECT
+            COALESCE(am.standard_aspect, rt.aspect) as aspect,
+            COUNT(*) as mentions,
+            SUM(CASE WHEN rt.sentiment = 'Positive' THEN 1 ELSE 0 END) as pos_count,
+            SUM(CASE WHEN rt.sentiment = 'Negative' THEN 1 ELSE 0 END) as neg_count,
+            ROUND(SUM(CASE WHEN rt.sentiment = 'Positive' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as pos_ratio
+        FROM review_tags rt
+        LEFT JOIN aspect_mapping am ON lower(trim(rt.aspect)) = lower(trim(am.raw_aspect))
+        WHERE rt.parent_asin = ?
+        GROUP BY 1
+        HAVING mentions >= {SWOT_MIN_MENTIONS}
+        ORDER BY mentions DESC
+    """,
+        [parent_asin],
+    ).df()
+
+    if df.empty:
+        return None
+
+    if metrics is None:
+        metrics = _load_metrics(conn, parent_asin)
+
+    swot = {"strengths": [], "weaknesses": [], "controversial": [], "summary": {}}
+    if metrics:
+        swot["summary"] = {
+            "avg_rating": round(metrics.get("kpis", {}).get("avg_rating", 0) or 0, 2),
+            "total_reviews": int(metrics.get("kpis", {}).get("total_reviews", 0) or 0),
+        }
+    else:
+        meta = conn.execute(
+            "SELECT real_average_rating, real_total_ratings FROM products WHERE asin = ?", [parent_asin]
+        ).fetchone()
+        swot["summary"] = {
+            "avg_rating": round(float((meta[0] if meta else 0) or 0), 2),
+            "total_reviews": int((meta[1] if meta else 0) or 0),
+        }
+
+    for _, row in df.iterrows():
+        item = {"aspect": row["aspect"], "mentions": int(row["mentions"]), "pos_ratio": float(row["pos_ratio"])}
+        if row["pos_ratio"] >= STRENGTH_RATIO:
+            swot["strengths"].append(item)
+        elif row["pos_ratio"] <= WEAKNESS_RATIO:
+            swot["weaknesses"].append(item)
+        else:
+            swot["controversial"].append(item)
+
+    swot["strengths"] = swot["strengths"][:5]
+    swot["weaknesses"] = swot["weaknesses"][:5]
+    swot["controversial"] = swot["controversial"][:3]
+
+    # One query for every weakness' sample complaint (same normalized aspect preferred)
+    weak_aspects = [w["aspect"] for w in swot["weaknesses"]]
+    if weak_aspects:
+        quotes = dict(
+            conn.execute(
+                """
+                SELECT w.aspect, rt.quote
+                FROM (SELECT unnest(?::VARCHAR[]) as aspect) w
+                JOIN review_tags rt ON rt.parent_asin = ? AND rt.sentiment = 'Negative'
+                LEFT JOIN aspect_mapping am ON lower(trim(rt.aspect)) = lower(trim(am.raw_aspect))
+                WHERE rt.quote IS NOT NULL
+                  AND (COALESCE(am.standard_aspect, rt.aspect) = w.aspect OR rt.aspect ILIKE '%' || w.aspect || '%')
+                QUALIFY row_number() OVER (
+                    PARTITION BY w.aspect ORDER BY (COALESCE(am.standard_aspect, rt.aspect) = w.aspect) DESC, rt.review_id
+                ) = 1
+            """,
+                [weak_aspects, parent_asin],
+            ).fetchall()
+        )
+        for w in swot["weaknesses"]:
+            w["sample_complaint"] = quotes.get(w["aspect"])
+
+    return json.loads(json.dumps(swot, default=str))
+
+
+def save_payloads(conn, parent_asin: str, metrics: Optional[Dict] = None) -> int:
+    """Build and upsert every Detective payload for one parent (missing ones are deleted)."""
+    ensure_detective_payloads(conn)
+    if metrics is None:
+        metrics = _load_metrics(conn, parent_asin)
+
+    payloads = {
+        "get_product_dna": build_dna_payload(conn, parent_asin, metrics),
+        "get_product_swot": build_swot_payload(conn, parent_asin, metrics),
+    }
+    now = datetime.now()
+    conn.execute("DELETE FROM detective_payloads WHERE asin = ?", [parent_asin])
+    rows = [
+        (parent_asin, tool, PAYLOAD_VERSION, json.dumps(payload, ensure_ascii=False), now)
+        for tool, payload in payloads.items()
+        if payload is not None
+    ]
+    if rows:
+        conn.executemany(
+            "INSERT OR REPLACE INTO detective_payloads (asin, tool, version, payload_json, last_updated) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+    return len(rows)
+
+
+def refresh_payloads(conn, parent_asins: Optional[List[str]] = None) -> int:
+    """
+    Rebuild payloads for parents that already have product_stats (product metadata
+    changed under them). `None` = every parent in product_stats.
+    """
+    if parent_asins is None:
+        targets = [r[0] for r in conn.execute("SELECT asin FROM product_stats").fetchall()]
+    else:
+        parent_asins = [a for a in dict.fromkeys(parent_asins) if a]
+        if not parent_asins:
+            return 0
+        conn.register("temp_payload_scope", pd.DataFrame({"asin": parent_asins}))
+        targets = [
+            r[0]
+            for r in conn.execute(
+                "SELECT asin FROM product_stats WHERE asin IN (SELECT asin FROM temp_payload_scope)"
+            ).fetchall()
+        ]
+        conn.unregister("temp_payload_scope")
+
+    for asin in targets:
+        save_payloads(conn, asin)
+    return len(targets)
+
+
+def rebuild_all(db_path=None):
+    """Full rebuild against a DB file (CLI entry point)."""
+    db_path = db_path or str(Settings.get_active_db_path())
+    with duckdb.connect(db_path) as conn:
+        total = refresh_payloads(conn)
+    print(f"🕵️ [DetectivePayloads] Built payloads for {total} products on {db_path}")
+    return total
+
+
+if __name__ == "__main__":
+    rebuild_all()
@@ -0,0 +1,123 @@
+import polars as pl
+from typing import Dict, List, Optional, Tuple
+
+# productDetails name (lowercase substring) -> products DNA column.
+# Columns are checked in order, first match wins. A column keeps ONE detail row: an exact
+# name match beats a substring match, then key-list order, then page order
+# ("Size" beats "Item Package Size"; "Style" beats "Pattern").
+# Columns in EXACT_FIELDS only match the whole cleaned name (marks and trailing colon
+# stripped): "manufacturer" must not pick up "Is Discontinued By Manufacturer".
+DNA_FIELDS: Dict[str, List[str]] = {
+    "material": ["material", "fabric type"],
+    "design_type": ["design", "style", "pattern", "theme"],
+    "target_audience": ["target audience", "audience", "department"],
+    "gender": ["gender"],
+    "size_capacity": ["size", "capacity"],
+    "num_pieces": ["number of pieces"],
+    "pack": ["included components"],
+    "brand": ["brand", "publisher", "manufacturer"],
+}
+EXACT_FIELDS = frozenset({"brand"})
+
+# category -> (column, fill value, title regex or None = always); only fills empty columns
+CATEGORY_RULES: Dict[str, List[Tuple[str, str, Optional[str]]]] = {
+    "tumbler": [("material", "Stainless Steel", r"stainless|steel|insulated")],
+    "book": [("material", "Paper", None), ("target_audience", "Kids", r"kids|children|toddler")],
+}
+
+# Invisible direction marks Amazon puts around detail names / values ("Material ‏ : ‎")
+_MARKS = "[\u200e\u200f]"
+
+
+def _field_expr(name: pl.Expr, fields: Dict[str, List[str]]) -> pl.Expr:
+    expr = None
+    for field, keys in fields.items():
+        if field in EXACT_FIELDS:
+            cond = name.is_in(keys)
+        else:
+            cond = pl.any_horizontal([name.str.contains(k, literal=True) for k in keys])
+        expr = (pl.when(cond) if expr is None else expr.when(cond)).then(pl.lit(field))
+    return expr.otherwise(pl.lit(None, dtype=pl.Utf8))
+
+
+def _rank_expr(name: pl.Expr, field: pl.Expr, fields: Dict[str, List[str]]) -> pl.Expr:
+    """Preference of a matched row within its column: exact key j -> j, substring key j -> len(keys) + j."""
+    expr = None
+    for f, keys in fields.items():
+        for j, k in enumerate(keys):
+            for cond, rank in ((name == k, j), (name.str.contains(k, literal=True), len(keys) + j)):
+                cond = (field == f) & cond
+                expr = (pl.when(cond) if expr is None else expr.when(cond)).then(pl.lit(rank))
+    return expr.otherwise(pl.lit(None))
+
+
+def breadcrumb_niche(col: str) -> pl.Expr:
+    """Last breadcrumb segment ("Home > Bedding > Comforters" -> "Comforters")."""
+    return pl.col(col).cast(pl.Utf8).str.split(">").list.last().str.strip_chars()
+
+
+def extract_dna(
+    df: pl.DataFrame,
+    details_col: str = "productDetails",
+    title_col: str = "title",
+    breadcrumbs_col: Optional[str] = "breadCrumbs",
+    category: Optional[str] = None,
+    fields: Dict[str, List[str]] = DNA_FIELDS,
+) -> pl.DataFrame:
+    """
+    Add one column per DNA field from a list[struct{name, value}] details column
+    (explode -> map names -> pivot), plus `niche` from breadcrumbs and the
+    CATEGORY_RULES of `category`. Existing non-null columns win; details fill gaps.
+    """
+    df = df.with_row_index("_dna_row")
+    dna = pl.DataFrame({"_dna_row": df["_dna_row"]})
+    if details_col in df.columns and isinstance(df.schema[details_col], pl.List):
+        details = (
+            df.select("_dna_row", pl.col(details_col).alias("_detail"))
+            .explode("_detail")
+            .filter(pl.col("_detail").is_not_null())
+            .select(
+                "_dna_row",
+                pl.col("_detail")
+                .struct.field("name")
+                .cast(pl.Utf8)
+                .str.replace_all(_MARKS, "")
+                .str.replace(r"\s*:\s*$", "")
+                .str.strip_chars()
+                .str.to_lowercase()
+                .alias("name"),
+                pl.col("_detail").struct.field("value").cast(pl.Utf8).str.replace_all(_MARKS, "").str.strip_chars().alias("value"),
+            )
+            .filter((pl.col("name").str.len_chars() > 0) & (pl.col("value").str.len_chars() > 0))
+            .with_columns(_field_expr(pl.col("name"), fields).alias("field"))
+            .filter(pl.col("field").is_not_null())
+            .with_columns(_rank_expr(pl.col("name"), pl.col("field"), fields).alias("_rank"))
+            .with_row_index("_pos")
+        )
+        if not details.is_empty():
+            pivoted = (
+                details.group_by("_dna_row", "field", maintain_order=True)
+                .agg(pl.col("value").sort_by("_rank", "_pos").first())
+                .pivot(on="field", index="_dna_row", values="value")
+            )
+            dna = dna.join(pivoted, on="_dna_row", how="left")
+
+    # Flat columns already on the frame take precedence over productDetails
+    fill = []
+    for field in fields:
+        extracted = pl.col(f"{field}_dna") if field in dna.columns else pl.lit(None, dtype=pl.Utf8)
+        fill.append((pl.coalesce(pl.col(field).cast(pl.Utf8), extracted) if field in df.columns else extracted).alias(field))
+    df = df.join(dna.rename({f: f"{f}_dna" for f in fields if f in dna.columns}), on="_dna_row", how="left")
+    df = df.with_columns(fill).drop([f"{f}_dna" for f in fields if f"{f}_dna" in df.columns])
+
+    if breadcrumbs_col and breadcrumbs_col in df.columns:
+        niche = breadcrumb_niche(breadcrumbs_col)
+        df = df.with_columns((pl.coalesce(pl.col("niche").cast(pl.Utf8), niche) if "niche" in df.columns else niche).alias("niche"))
+
+    title = pl.col(title_col).cast(pl.Utf8).str.to_lowercase() if title_col in df.columns else pl.lit(None, dtype=pl.Utf8)
+    for column, value, pattern in CATEGORY_RULES.get(category or "", []):
+        cond = pl.col(column).is_null()
+        if pattern:
+            cond = cond & title.str.contains(pattern).fill_null(False)
+        df = df.with_columns(pl.when(cond).then(pl.lit(value)).otherwise(pl.col(column)).alias(column))
+    return df.drop("_dna_row")
@@ -0,0 +1,191 @@
+import multiprocessing as mp
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional
+from .jobs import JobEvents
+
+# Jobs that parse / aggregate data in DuckDB + pandas: run in worker processes so they
+# never hold the API process GIL. Everything else mostly waits on Apify / Gemini / HTTP.
+# A pool child does not share the API process's DuckDB instance: every active-DB
+# connection it opens goes through db_writer.active_write_lock / write_connection,
+# the same cross-process lock the API process's DBWriter takes per batch.
+CPU_JOB_TYPES = {"ingest", "recalc", "dedup"}
+
+CPU_WORKERS = int(os.getenv("WORKER_CPU_PROCESSES", "2"))
+IO_WORKERS = int(os.getenv("WORKER_IO_THREADS", "8"))
+MAX_TASKS_PER_CHILD = 20  # Recycle children (pandas / DuckDB memory)
+
+# Max jobs of one type running at once; extra submissions wait in that type's queue.
+# Writers to the active DB are kept at 1 so they never race each other.
+JOB_LIMITS = {
+    "ingest": 1,
+    "recalc": 1,
+    "dedup": 1,
+    "miner": 1,
+    "janitor": 1,
+    "scrape": 2,
+    "find_parents": 1,
+    "product_details": 1,
+    "social": 4,
+}
+DEFAULT_JOB_LIMIT = 2
+
+
+def _pool_child_init(events_queue):
+    """Process-pool bootstrap: job events go back to the API process over the queue."""
+    from . import worker_tasks
+
+    worker_tasks.init_pool_child(JobEvents(events_queue))
+
+
+class WorkerExecutor:
+    """
+    Runs worker jobs off the request path: a process pool for CPU/DB-heavy job types,
+    a thread pool for IO-bound ones, with a per-type concurrency limit and FIFO queue.
+    Job progress from pool children is pumped into the JobRegistry by one thread.
+    """
+
+    def __init__(self, registry=None, cpu_workers: int = CPU_WORKERS, io_workers: int = IO_WORKERS):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._running: Dict[str, int] = {}
+        self._pending: Dict[str, deque] = {}
+        self._cpu_workers = cpu_workers
+
+        self._ctx = mp.get_context("spawn")  # Never fork the API process (DuckDB handles, threads)
+        self._events = self._ctx.Queue()
+        self._cpu_pool = self._new_cpu_pool()
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="worker-io")
+
+        self._pump = threading.Thread(target=self._pump_events, name="job-events", daemon=True)
+        self._pump.start()
+
+    def _new_cpu_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self._cpu_workers,
+            mp_context=self._ctx,
+            initializer=_pool_child_init,
+            initargs=(self._events,),
+            max_tasks_per_child=MAX_TASKS_PER_CHILD,
+        )
+
+    # --- Job events (pool children -> registry) ---
+    def _pump_events(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            if self.registry is None:
+                continue
+            try:
+                self.registry.apply(event)
+            except Exception as e:
+                print(f"⚠️ [Executor] Job event dropped ({event[0]}): {e}")
+
+    # --- Scheduling ---
+    def submit(self, job_type: str, fn: Callable, *args, job_id: Optional[str] = None) -> Future:
+        """
+        Queue fn(*args[, job_id]) under job_type's limit. Returns a Future for the job.
+        With job_id, a job whose process dies before reporting is marked FAILED.
+        """
+        outer = Future()
+        if job_id is not None:
+            args = (*args, job_id)
+        with self._lock:
+            self._pending.setdefault(job_type, deque()).append((fn, args, job_id, outer))
+        self._drain(job_type)
+        return outer
+
+    def _drain(self, job_type: str):
+        limit = JOB_LIMITS.get(job_type, DEFAULT_JOB_LIMIT)
+        while True:
+            with self._lock:
+                queue = self._pending.get(job_type)
+                if not queue or self._running.get(job_type, 0) >= limit:
+                    return
+                fn, args, job_id, outer = queue.popleft()
+                self._running[job_type] = self._running.get(job_type, 0) + 1
+
+            if not outer.set_running_or_notify_cancel():
+                self._release(job_type)
+                continue
+            try:
+                inner = self._submit_to_pool(job_type, fn, args)
+            except Exception as e:  # Pool shut down
+                self._job_crashed(job_type, job_id, e)
+                outer.set_exception(e)
+                self._release(job_type)
+                continue
+            inner.add_done_callback(lambda f, jt=job_type, jid=job_id, out=outer: self._on_done(jt, jid, f, out))
+
+    def _submit_to_pool(self, job_type: str, fn: Callable, args: tuple) -> Future:
+        if job_type not in CPU_JOB_TYPES:
+            return self._io_pool.submit(fn, *args)
+        try:
+            return self._cpu_pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A child died (OOM, segfault): replace the pool instead of failing every later job
+            print("⚠️ [Executor] Process pool broken, restarting it.")
+            with self._lock:
+                self._cpu_pool = self._new_cpu_pool()
+            return self._cpu_pool.submit(fn, *args)
+
+    def _job_crashed(self, job_type: str, job_id: Optional[str], error: BaseException):
+        print(f"❌ [Executor] {job_type} job crashed: {error}")
+        if job_id and self.registry is not None:
+            try:
+                self.registry.fail(job_id, f"Executor: {error}")
+            except Exception as e:
+                print(f"⚠️ [Executor] Could not mark {job_id} as failed: {e}")
+
+    def _release(self, job_type: str):
+        with self._lock:
+            self._running[job_type] = max(0, self._running.get(job_type, 0) - 1)
+
+    def _on_done(self, job_type: str, job_id: Optional[str], inner: Future, outer: Future):
+        error = inner.exception()
+        if error is not None:
+            self._job_crashed(job_type, job_id, error)
+            outer.set_exception(error)
+        else:
+            outer.set_result(inner.result())
+        self._release(job_type)
+        self._drain(job_type)
+
+    # --- Introspection / lifecycle ---
+    def queue_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            types = set(self._running) | set(self._pending)
+            return {
+                jt: {
+                    "running": self._running.get(jt, 0),
+                    "queued": len(self._pending.get(jt, ())),
+                    "limit": JOB_LIMITS.get(jt, DEFAULT_JOB_LIMIT),
+                    "pool": "process" if jt in CPU_JOB_TYPES else "thread",
+                }
+                for jt in sorted(types)
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            for queue in self._pending.values():
+                for *_, outer in queue:
+                    outer.cancel()
+                queue.clear()
+        self._cpu_pool.shutdown(wait=wait, cancel_futures=True)
+        self._io_pool.shutdown(wait=wait, cancel_futures=True)
+        self._events.put(None)
+
+
+_EXECUTOR: Optional[WorkerExecutor] = None
+
+
+def get_executor(registry=None) -> WorkerExecutor:
+    """Process-wide executor (created on first use)."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = WorkerExecutor(registry=registry)
+    return _EXECUTOR
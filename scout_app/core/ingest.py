@@ -5,7 +5,17 @@ from typing import Dict, Any
 import shutil
 import os
 from .config import Settings
+from .competitors import rebuild_competitor_candidates
+from .db_writer import active_write_lock
+from .detective_payloads import refresh_payloads
+from .dna import DNA_FIELDS, extract_dna
+from .niches import sync_parent_niches
+from .parent_cache import cache_parents, ensure_parent_cache
+from .search_index import ProductSearchIndex
+from .segments import ensure_segment_lexicon
+from .text_index import index_review_text
 
+INGEST_STEPS = 5  # progress_cb stages of ingest_file (sync, products, reviews, index, swap)
 
 class DataIngester:
     def __init__(self):
@@ -72,6 +82,16 @@ class DataIngester:
                         last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         metrics_json JSON
                     );
+                    CREATE TABLE IF NOT EXISTS product_aspect_impact (
+                        asin VARCHAR,
+                        aspect VARCHAR,
+                        est_positive INTEGER,
+                        est_negative INTEGER,
+                        net_impact INTEGER,
+                        total_impact_vol INTEGER,
+                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (asin, aspect)
+                    );
                     CREATE TABLE IF NOT EXISTS aspect_mapping (
                         raw_aspect TEXT PRIMARY KEY,
                         standard_aspect TEXT,
@@ -116,6 +136,9 @@ class DataIngester:
                         last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
                 """)
+                # Configurable audience/occasion lexicons (seeded with defaults)
+                ensure_segment_lexicon(conn)
+                ensure_parent_cache(conn)
         except Exception as e:
             print(f"Schema Init Error: {e}")
 
@@ -210,6 +233,10 @@ class DataIngester:
             else:
                 category_hint = "comforter"
 
+        # Product DNA from productDetails / breadcrumbs (same extractor as the Apify details path)
+        if "productdetails" in df.columns or "breadcrumbs" in df.columns:
+            df = extract_dna(df, details_col="productdetails", breadcrumbs_col="breadcrumbs", category=category_hint)
+
         mapping = {"asin": "asin", "parentasin": "parent_asin", "parent_asin": "parent_asin"}
         if category_hint == "comforter":
             mapping.update(
@@ -235,6 +262,9 @@ class DataIngester:
         else:
             mapping.update({"producttitle": "title", "brand": "brand", "real_total_ratings": "real_total_ratings"})
 
+        mapping.update({f: f for f in DNA_FIELDS if f != "brand"})
+        mapping.setdefault("niche", "main_niche")
+
         exprs = []
         added = set()
         if "url" in df.columns:
@@ -252,7 +282,7 @@ class DataIngester:
                 added.add(d)
 
         if not exprs:
-            return
+            return []
         p_df = df.select(exprs).unique(subset=["asin"])
 
         # --- CLEAN BRAND NAME ---
@@ -278,6 +308,12 @@ class DataIngester:
             "rating_breakdown": pl.Utf8,
             "variation_count": pl.Int32,
             "material": pl.Utf8,
+            "design_type": pl.Utf8,
+            "target_audience": pl.Utf8,
+            "gender": pl.Utf8,
+            "size_capacity": pl.Utf8,
+            "num_pieces": pl.Utf8,
+            "pack": pl.Utf8,
             "main_niche": pl.Utf8,
             "category": pl.Utf8,
         }
@@ -299,13 +335,22 @@ class DataIngester:
         """)
         conn.execute("""
             INSERT INTO products (asin, parent_asin, title, brand, image_url, real_average_rating, real_total_ratings, 
-                                main_niche, category, last_updated)
+                                main_niche, material, design_type, target_audience, gender, size_capacity, num_pieces, pack,
+                                category, last_updated)
             SELECT asin, COALESCE(parent_asin, asin), title, brand, image_url, real_average_rating, real_total_ratings, 
-                   main_niche, category, now()
+                   main_niche, material, design_type, target_audience, gender, size_capacity, num_pieces, pack,
+                   category, now()
             FROM temp_p ON CONFLICT (asin) DO UPDATE SET
                 title = COALESCE(CAST(excluded.title AS VARCHAR), products.title),
                 brand = COALESCE(CAST(excluded.brand AS VARCHAR), products.brand),
                 main_niche = COALESCE(CAST(excluded.main_niche AS VARCHAR), products.main_niche),
+                material = COALESCE(excluded.material, products.material),
+                design_type = COALESCE(excluded.design_type, products.design_type),
+                target_audience = COALESCE(excluded.target_audience, products.target_audience),
+                gender = COALESCE(excluded.gender, products.gender),
+                size_capacity = COALESCE(excluded.size_capacity, products.size_capacity),
+                num_pieces = COALESCE(excluded.num_pieces, products.num_pieces),
+                pack = COALESCE(excluded.pack, products.pack),
                 last_updated = now()
         """)
         conn.execute("""
@@ -314,17 +359,40 @@ class DataIngester:
                 WHERE products.parent_asin = product_parents.parent_asin AND main_niche IS NOT NULL AND main_niche != 'unknown'
             ) WHERE parent_asin IN (SELECT DISTINCT COALESCE(parent_asin, asin) FROM temp_p)
         """)
+        touched = [r[0] for r in conn.execute("SELECT DISTINCT COALESCE(parent_asin, asin) FROM temp_p").fetchall()]
+        # Known child -> parent mappings skip the Playwright parent lookup later
+        cache_parents(
+            conn,
+            conn.execute("SELECT asin, parent_asin FROM temp_p WHERE parent_asin IS NOT NULL").fetchall(),
+            source="ingest_products",
+        )
+        # Normalized niche membership (one row per parent/niche) for equality filters
+        sync_parent_niches(conn, touched)
+        # Showdown / Detective competitor shortlists (categories of touched parents)
+        rebuild_competitor_candidates(conn, touched)
+        # Detective DNA payloads embed product metadata
+        refresh_payloads(conn, touched)
+        return touched
 
-    def ingest_file(self, file_path: Path) -> Dict[str, Any]:
+    def ingest_file(self, file_path: Path, progress_cb=None) -> Dict[str, Any]:
         if not file_path.exists():
             return {"error": "File not found"}
-        target_db = Settings.get_standby_db_path()
-        active_db = Settings.get_active_db_path()
+        # Hold the active DB's write lock from copy to swap: writes queued meanwhile wait
+        # and land in the new active DB instead of being lost with the old one.
+        with active_write_lock() as active_db:
+            target_db = Settings.get_standby_db_path()
+            return self._ingest_into_standby(file_path, active_db, target_db, progress_cb)
+
+    def _ingest_into_standby(self, file_path: Path, active_db: Path, target_db: Path, progress_cb=None) -> Dict[str, Any]:
         try:
             if active_db.exists():
                 shutil.copy(active_db, target_db)
             self._init_schema(target_db)
-            if file_path.suffix == ".xlsx":
+            if progress_cb:
+                progress_cb(1, INGEST_STEPS, "Standby DB synced, reading file")
+            if file_path.suffix == ".parquet":
+                df = pl.read_parquet(file_path)
+            elif file_path.suffix == ".xlsx":
                 df = pl.read_excel(file_path)
             elif file_path.suffix == ".jsonl":
                 df = pl.read_ndjson(file_path)
@@ -332,8 +400,12 @@ class DataIngester:
                 return {"error": "Format not supported"}
 
             with duckdb.connect(str(target_db)) as conn:
-                self._ingest_products(df, conn)
+                if progress_cb:
+                    progress_cb(2, INGEST_STEPS, f"Upserting products ({len(df)} rows)")
+                touched_parents = self._ingest_products(df, conn) or []
                 df_clean = self._clean_dataframe(df, file_path.name)
+                if progress_cb:
+                    progress_cb(3, INGEST_STEPS, f"Inserting reviews ({len(df_clean)} rows)")
                 if not df_clean.is_empty():
                     conn.register("temp_reviews_raw", df_clean.to_arrow())
 
@@ -366,7 +438,34 @@ class DataIngester:
                         LEFT JOIN products p ON tr.child_asin = p.asin
                         WHERE tr.review_id NOT IN (SELECT review_id FROM reviews)
                     """)
+                    touched_parents += [
+                        r[0]
+                        for r in conn.execute("""
+                            SELECT DISTINCT COALESCE(p.parent_asin, tr.parent_asin)
+                            FROM temp_reviews_raw tr LEFT JOIN products p ON tr.child_asin = p.asin
+                        """).fetchall()
+                    ]
+
+                    cache_parents(
+                        conn,
+                        conn.execute("""
+                            SELECT DISTINCT tr.child_asin, COALESCE(p.parent_asin, tr.parent_asin)
+                            FROM temp_reviews_raw tr LEFT JOIN products p ON tr.child_asin = p.asin
+                            WHERE tr.child_asin IS NOT NULL
+                        """).fetchall(),
+                        source="ingest_reviews",
+                    )
+
+                    # Inverted token index over the new review text (keyword / audience lookups)
+                    index_review_text(conn, df_clean["review_id"].to_list())
+
+                # 3. Keep the Product Explorer search index in sync (incremental)
+                if progress_cb:
+                    progress_cb(4, INGEST_STEPS, "Refreshing search index")
+                ProductSearchIndex().refresh(conn, touched_parents)
             Settings.swap_db()
+            if progress_cb:
+                progress_cb(INGEST_STEPS, INGEST_STEPS, f"Swapped to {target_db.name}")
             return {"total_rows": len(df), "db_switched_to": target_db.name}
         except Exception as e:
             return {"error": str(e)}
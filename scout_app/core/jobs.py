@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+import uuid
+import duckdb
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from .config import Settings
+
+# Job states
+QUEUED, RUNNING, SUCCEEDED, FAILED, INTERRUPTED = "QUEUED", "RUNNING", "SUCCEEDED", "FAILED", "INTERRUPTED"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+PROGRESS_MIN_INTERVAL = 1.0  # seconds between progress writes of the same job
+
+# Progress callback handed to core tasks: cb(done, total, message=None)
+ProgressCallback = Callable[..., None]
+
+
+class JobRegistry:
+    """
+    Persistent registry of worker background jobs (JOBS_DB), polled by the Admin Console
+    through GET /jobs. One short connection per call, serialized in-process.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or Settings.JOBS_DB)
+        self._last_progress = {}
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, duckdb.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id VARCHAR PRIMARY KEY,
+                    job_type VARCHAR,
+                    params JSON,
+                    state VARCHAR,
+                    progress_done INTEGER DEFAULT 0,
+                    progress_total INTEGER,
+                    message VARCHAR,
+                    error VARCHAR,
+                    result JSON,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+
+    def _execute(self, sql: str, params: list):
+        with self._lock, duckdb.connect(self.db_path) as conn:
+            conn.execute(sql, params)
+
+    # --- Lifecycle ---
+    def create(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        self._execute(
+            "INSERT INTO jobs (job_id, job_type, params, state, created_at) VALUES (?, ?, ?, ?, ?)",
+            [job_id, job_type, json.dumps(params or {}, default=str), QUEUED, datetime.now()],
+        )
+        return job_id
+
+    def start(self, job_id: str, total: Optional[int] = None, message: Optional[str] = None):
+        self._execute(
+            "UPDATE jobs SET state = ?, started_at = ?, progress_total = COALESCE(?, progress_total), message = ? WHERE job_id = ?",
+            [RUNNING, datetime.now(), total, message, job_id],
+        )
+
+    def progress(self, job_id: str, done: int, total: Optional[int] = None, message: Optional[str] = None, force=False):
+        """Throttled: at most one write per PROGRESS_MIN_INTERVAL unless forced / complete."""
+        now = time.monotonic()
+        complete = total is not None and done >= total
+        if not force and not complete and now - self._last_progress.get(job_id, 0) < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_progress[job_id] = now
+        self._execute(
+            """
+            UPDATE jobs SET progress_done = ?, progress_total = COALESCE(?, progress_total),
+                            message = COALESCE(?, message)
+            WHERE job_id = ?
+        """,
+            [int(done), total, message, job_id],
+        )
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, message: Optional[str] = None):
+        self._last_progress.pop(job_id, None)
+        self._execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, result = ?, message = COALESCE(?, message) WHERE job_id = ?",
+            [SUCCEEDED, datetime.now(), json.dumps(result or {}, default=str), message, job_id],
+        )
+
+    def fail(self, job_id: str, error: str):
+        self._last_progress.pop(job_id, None)
+        self._execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, error = ? WHERE job_id = ?",
+            [FAILED, datetime.now(), str(error)[:2000], job_id],
+        )
+
+    def mark_interrupted(self) -> int:
+        """Worker (re)start: jobs still QUEUED/RUNNING belong to a dead process."""
+        with self._lock, duckdb.connect(self.db_path) as conn:
+            n = conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)", list(ACTIVE_STATES)).fetchone()[0]
+            conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, error = 'Worker restarted' WHERE state IN (?, ?)",
+                [INTERRUPTED, datetime.now(), *ACTIVE_STATES],
+            )
+        return n
+
+    def callback(self, job_id: str) -> ProgressCallback:
+        """Progress callback for core tasks: cb(done, total, message=None)."""
+
+        def _cb(done, total=None, message=None):
+            try:
+                self.progress(job_id, done, total, message)
+            except Exception as e:
+                print(f"⚠️ [Jobs] Progress write failed for {job_id}: {e}")
+
+        return _cb
+
+    def apply(self, event):
+        """Apply a (method, args, kwargs) event forwarded by JobEvents from a pool child."""
+        method, args, kwargs = event
+        if method in ("start", "progress", "finish", "fail"):
+            getattr(self, method)(*args, **kwargs)
+
+    # --- Queries ---
+    def _rows(self, sql: str, params: list) -> List[Dict[str, Any]]:
+        with self._lock, duckdb.connect(self.db_path) as conn:
+            cur = conn.execute(sql, params)
+            cols = [d[0] for d in cur.description]
+            rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+        for row in rows:
+            for key in ("params", "result"):
+                if isinstance(row.get(key), str):
+                    row[key] = json.loads(row[key])
+            if row.get("progress_total"):
+                row["progress_pct"] = round(100.0 * (row["progress_done"] or 0) / row["progress_total"], 1)
+            start, end = row.get("started_at"), row.get("finished_at") or (datetime.now() if row.get("started_at") else None)
+            row["duration_s"] = round((end - start).total_seconds(), 1) if start and end else None
+        return rows
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._rows("SELECT * FROM jobs WHERE job_id = ?", [job_id])
+        return rows[0] if rows else None
+
+    def list(self, limit: int = 50, job_type: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if job_type:
+            clauses.append("job_type = ?")
+            params.append(job_type)
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._rows(f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", params + [int(limit)])
+
+
+class JobEvents:
+    """
+    JobRegistry stand-in for process-pool children: lifecycle / progress calls are
+    forwarded over a multiprocessing queue and applied by the API process
+    (JobRegistry.apply), so only one process ever writes JOBS_DB.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._last_progress = {}
+
+    def _send(self, method, *args, **kwargs):
+        self.queue.put((method, args, kwargs))
+
+    def start(self, job_id: str, total: Optional[int] = None, message: Optional[str] = None):
+        self._send("start", job_id, total=total, message=message)
+
+    def progress(self, job_id: str, done: int, total: Optional[int] = None, message: Optional[str] = None, force=False):
+        now = time.monotonic()
+        complete = total is not None and done >= total
+        if not force and not complete and now - self._last_progress.get(job_id, 0) < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_progress[job_id] = now
+        self._send("progress", job_id, int(done), total=total, message=message, force=True)
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, message: Optional[str] = None):
+        self._send("finish", job_id, result=json.loads(json.dumps(result or {}, default=str)), message=message)
+
+    def fail(self, job_id: str, error: str):
+        self._send("fail", job_id, str(error))
+
+    def callback(self, job_id: str) -> ProgressCallback:
+        return lambda done, total=None, message=None: self.progress(job_id, done, total, message)
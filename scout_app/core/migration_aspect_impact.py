@@ -0,0 +1,61 @@
+import duckdb
+from .config import Settings
+
+
+def migrate_aspect_impact():
+    """
+    Create product_aspect_impact and backfill it from product_stats.metrics_json
+    (sentiment_weighted) on BOTH Blue and Green databases.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("📐 Aspect Impact Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Backfilling {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS product_aspect_impact (
+                        asin VARCHAR,
+                        aspect VARCHAR,
+                        est_positive INTEGER,
+                        est_negative INTEGER,
+                        net_impact INTEGER,
+                        total_impact_vol INTEGER,
+                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (asin, aspect)
+                    )
+                """)
+                conn.execute("DELETE FROM product_aspect_impact")
+                conn.execute("""
+                    INSERT OR REPLACE INTO product_aspect_impact
+                        (asin, aspect, est_positive, est_negative, net_impact, total_impact_vol, last_updated)
+                    SELECT
+                        asin,
+                        e->>'aspect',
+                        CAST(e->>'est_positive' AS INTEGER),
+                        CAST(e->>'est_negative' AS INTEGER),
+                        CAST(e->>'net_impact' AS INTEGER),
+                        CAST(e->>'total_impact_vol' AS INTEGER),
+                        last_updated
+                    FROM (
+                        SELECT asin, last_updated,
+                               unnest(CAST(json_extract(metrics_json, '$.sentiment_weighted') AS JSON[])) as e
+                        FROM product_stats
+                    )
+                    WHERE e->>'aspect' IS NOT NULL
+                """)
+                total = conn.execute("SELECT COUNT(*) FROM product_aspect_impact").fetchone()[0]
+            print(f"      {total} aspect rows.")
+        except Exception as e:
+            print(f"   ❌ Error backfilling {db_path.name}: {e}")
+
+    print("✅ Aspect Impact Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_aspect_impact()
@@ -0,0 +1,31 @@
+import duckdb
+from .config import Settings
+from .competitors import rebuild_competitor_candidates
+
+
+def migrate_competitor_candidates():
+    """
+    Build the precomputed competitor shortlists (competitor_candidates)
+    on BOTH Blue and Green databases. Requires parent_niches (migration_search).
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("⚔️ Competitor Candidates Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Building {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                total = rebuild_competitor_candidates(conn)
+            print(f"      {total} parents shortlisted.")
+        except Exception as e:
+            print(f"   ❌ Error building {db_path.name}: {e}")
+
+    print("✅ Competitor Candidates Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_competitor_candidates()
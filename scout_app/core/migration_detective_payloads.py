@@ -0,0 +1,32 @@
+import duckdb
+from .config import Settings
+from .detective_payloads import ensure_detective_payloads, refresh_payloads
+
+
+def migrate_detective_payloads():
+    """
+    Create detective_payloads and precompute the SWOT / DNA tool payloads
+    for every product in product_stats on BOTH Blue and Green databases.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("🕵️ Detective Payloads Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Building {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                ensure_detective_payloads(conn)
+                total = refresh_payloads(conn)
+            print(f"      {total} products.")
+        except Exception as e:
+            print(f"   ❌ Error building {db_path.name}: {e}")
+
+    print("✅ Detective Payloads Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_detective_payloads()
@@ -0,0 +1,31 @@
+import duckdb
+from .config import Settings
+from .parent_cache import backfill_parent_cache
+
+
+def migrate_parent_cache():
+    """
+    Create asin_parent_cache on BOTH Blue and Green databases and seed it
+    with the child -> parent mappings already known to products / reviews.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("🗂️ Parent Cache Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Seeding {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                total = backfill_parent_cache(conn)
+            print(f"      {total} ASINs cached.")
+        except Exception as e:
+            print(f"   ❌ Error seeding {db_path.name}: {e}")
+
+    print("✅ Parent Cache Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_parent_cache()
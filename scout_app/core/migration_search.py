@@ -0,0 +1,34 @@
+import duckdb
+from .config import Settings
+from .niches import sync_parent_niches
+from .search_index import ProductSearchIndex
+
+
+def migrate_search_index():
+    """
+    Build the Product Explorer search index (search_* tables + parent_niches)
+    on BOTH Blue and Green databases.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+    index = ProductSearchIndex()
+
+    print("🔎 Search Index Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Indexing {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                sync_parent_niches(conn)
+                total = index.refresh(conn)
+            print(f"      {total} parents indexed.")
+        except Exception as e:
+            print(f"   ❌ Error indexing {db_path.name}: {e}")
+
+    print("✅ Search Index Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_search_index()
@@ -0,0 +1,31 @@
+import duckdb
+from .config import Settings
+from .segments import ensure_segment_lexicon
+
+
+def migrate_segment_lexicon():
+    """
+    Create and seed segment_lexicon (audience / occasion keywords per category)
+    on BOTH Blue and Green databases. Existing rows are left untouched.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("🎯 Segment Lexicon Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            with duckdb.connect(str(db_path)) as conn:
+                ensure_segment_lexicon(conn)
+                total = conn.execute("SELECT COUNT(*) FROM segment_lexicon").fetchone()[0]
+            print(f"   -> {db_path.name}: {total} lexicon rows.")
+        except Exception as e:
+            print(f"   ❌ Error on {db_path.name}: {e}")
+
+    print("✅ Segment Lexicon Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_segment_lexicon()
@@ -0,0 +1,32 @@
+import duckdb
+from .config import Settings
+from .text_index import index_review_text, index_tag_quotes
+
+
+def migrate_text_index():
+    """
+    Build the inverted token index (review_tokens) over review text and tag quotes
+    on BOTH Blue and Green databases.
+    """
+    databases = [Settings.DB_PATH_A, Settings.DB_PATH_B]
+
+    print("🔤 Text Index Migration Started...")
+
+    for db_path in databases:
+        if not db_path.exists():
+            continue
+
+        try:
+            print(f"   -> Indexing {db_path.name}...")
+            with duckdb.connect(str(db_path)) as conn:
+                n_text = index_review_text(conn)
+                n_quote = index_tag_quotes(conn)
+            print(f"      {n_text} reviews / {n_quote} tagged reviews indexed.")
+        except Exception as e:
+            print(f"   ❌ Error indexing {db_path.name}: {e}")
+
+    print("✅ Text Index Migration Completed.")
+
+
+if __name__ == "__main__":
+    migrate_text_index()
@@ -1,4 +1,3 @@
-import duckdb
 import os
 import json
 import time
@@ -7,7 +6,9 @@ from pathlib import Path
 from google import genai
 from google.genai import types
 from .config import Settings
+from .db_writer import get_writer
 from .stats_engine import StatsEngine
+from .text_index import index_tag_quotes
 
 class AIMiner:
     # Production Backend Model (Jan 2026)
@@ -22,14 +23,13 @@ class AIMiner:
             self.client = None
             print("⚠️ Warning: Gemini API Key not set. AI operations will fail.")
 
-    def _get_conn(self, read_only=False):
-        # Use active DB path from Settings (Blue-Green aware)
-        return duckdb.connect(str(Settings.get_active_db_path()), read_only=read_only)
-
     def get_unmined_reviews(self, limit=200, status='PENDING') -> List[Dict]:
-        """Fetch reviews that need AI analysis. Auto-completes trash (too short) with sentiment injection."""
-        conn = self._get_conn()
-        
+        """Fetch reviews that need AI analysis. Auto-completes trash (too short) with sentiment injection.
+        Runs as one DB writer command: no ad-hoc connection next to the writer / other processes."""
+        return get_writer().run(lambda conn: self._claim_reviews(conn, limit, status))
+
+    def _claim_reviews(self, conn, limit, status) -> List[Dict]:
+        """Writer command behind get_unmined_reviews."""
         # 1. AUTO-COMPLETE TRASH & INJECT SATISFACTION TAGS
         trash_data = conn.execute(f"""
             SELECT review_id, parent_asin, rating_score, text 
@@ -51,15 +51,14 @@ class AIMiner:
                     sent, (txt or "N/A")[:100]
                 ))
             
-            # Batch Insert Tags
+            # Batch Insert Tags + Update Status to COMPLETED
+            trash_ids = [t[0] for t in trash_data]
             conn.executemany("""
                 INSERT INTO review_tags (review_id, parent_asin, category, aspect, sentiment, quote)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, tags_to_inject)
-            
-            # Update Status to COMPLETED
-            trash_ids = [t[0] for t in trash_data]
-            self._update_mining_status(trash_ids, "COMPLETED")
+            index_tag_quotes(conn, trash_ids)
+            self._set_status(conn, trash_ids, "COMPLETED")
             print(f"🧹 [Miner] Auto-processed {len(trash_ids)} short reviews into Satisfaction tags.")
 
         # 2. FETCH QUALIFIED FOR AI
@@ -72,7 +71,6 @@ class AIMiner:
             LIMIT {limit}
         """
         df = conn.execute(query).df()
-        conn.close()
         return df.to_dict(orient='records')
 
     def _build_prompt(self, reviews_chunk: List[Dict]) -> str:
@@ -94,8 +92,9 @@ class AIMiner:
         {reviews_text}
         """
 
-    def run_live(self, limit=100):
-        """Live mining using 2.5 Flash Lite. Immediate results with locking."""
+    def run_live(self, limit=100, progress_cb=None):
+        """Live mining using 2.5 Flash Lite. Immediate results with locking.
+        progress_cb(done, total, message) is called after each chunk (worker job registry)."""
         if not self.client: return
         
         reviews = self.get_unmined_reviews(limit=limit, status='PENDING')
@@ -112,6 +111,8 @@ class AIMiner:
         print(f"🧠 [Miner-Live] Dispatching to AI ({self.MODEL_NAME})...")
         
         chunk_size = 50 
+        if progress_cb:
+            progress_cb(0, len(reviews), "Mining reviews")
         for i in range(0, len(reviews), chunk_size):
             chunk = reviews[i:i+chunk_size]
             prompt = self._build_prompt(chunk)
@@ -129,6 +130,8 @@ class AIMiner:
                 print(f"   ✅ Processed chunk ({len(chunk)} reviews)")
             except Exception as e:
                 print(f"💥 [Miner-Live] API Error: {e}. Items remain 'QUEUED'.")
+            if progress_cb:
+                progress_cb(i + len(chunk), len(reviews))
 
     def prepare_batch_file(self, limit=10000) -> Optional[Path]:
         """Prepare JSONL for Batch API."""
@@ -206,50 +209,53 @@ class AIMiner:
                 ))
 
         if data_to_insert:
-            conn = self._get_conn()
-            id_list = "', '".join(original_ids)
-            # DEDUPLICATION: Delete all old tags for this chunk
-            conn.execute(f"DELETE FROM review_tags WHERE review_id IN ('{id_list}')")
-            
-            conn.executemany("""
-                INSERT INTO review_tags (review_id, parent_asin, category, aspect, sentiment, quote)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, data_to_insert)
-            conn.close()
-            
-            # --- NEW: Trigger Recalculation ---
-            try:
-                unique_parents = list(set([asin for _, asin, _, _, _, _ in data_to_insert if asin]))
-                if unique_parents:
-                    print(f"📊 [Miner] Triggering recalc for {len(unique_parents)} parents...")
-                    engine = StatsEngine()
-                    for pasin in unique_parents:
-                        engine.calculate_and_save(pasin)
-            except Exception as e:
-                print(f"⚠️ [Miner] Recalc trigger warning: {e}")
-            
+            get_writer().run(lambda w_conn: self._replace_tags(w_conn, original_ids, data_to_insert))
+
         # --- STATUS UPGRADE (ALWAYS COMPLETED AFTER PROCESSING) ---
         self._update_mining_status(original_ids, "COMPLETED")
+        self._recalc_parents(data_to_insert)
+
+    def _recalc_parents(self, tag_rows: List[tuple]):
+        """Refresh stats of the parents these tags belong to (one writer command per ASIN)."""
+        unique_parents = list(set([asin for _, asin, _, _, _, _ in tag_rows if asin]))
+        if unique_parents:
+            print(f"📊 [Miner] Triggering recalc for {len(unique_parents)} parents...")
+            StatsEngine().recalc_via_writer(unique_parents)
+
+    def _replace_tags(self, conn, review_ids: List[str], data_to_insert: List[tuple]):
+        """Writer command: swap the tags of these reviews and reindex their quotes."""
+        # DEDUPLICATION: Delete all old tags for this chunk
+        conn.execute("DELETE FROM review_tags WHERE review_id IN (SELECT unnest(?::VARCHAR[]))", [list(review_ids)])
+        conn.executemany("""
+            INSERT INTO review_tags (review_id, parent_asin, category, aspect, sentiment, quote)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, data_to_insert)
+        index_tag_quotes(conn, list(review_ids))
+
+    @staticmethod
+    def _set_status(conn, review_ids: List[str], status: str):
+        conn.execute(
+            "UPDATE reviews SET mining_status = ? WHERE review_id IN (SELECT unnest(?::VARCHAR[]))",
+            [status, list(review_ids)],
+        )
 
     def _update_mining_status(self, review_ids: List[str], status: str):
         if not review_ids: return
-        conn = self._get_conn()
-        id_list = "', '".join(review_ids)
-        conn.execute(f"UPDATE reviews SET mining_status = '{status}' WHERE review_id IN ('{id_list}')")
-        conn.close()
+        get_writer().run(lambda w_conn: self._set_status(w_conn, review_ids, status))
 
     def ingest_batch_results(self, jsonl_content: str):
         """Universal Batch Ingest."""
         print("⚙️ [Miner-Batch] Ingesting results...")
-        conn = self._get_conn(read_only=True)
-        reviews_df = conn.execute("SELECT review_id, parent_asin, text, rating_score FROM reviews").df()
+        reviews_df = get_writer().run(
+            lambda conn: conn.execute("SELECT review_id, parent_asin, text, rating_score FROM reviews").df()
+        )
         asin_map = dict(zip(reviews_df['review_id'], reviews_df['parent_asin']))
         rating_map = dict(zip(reviews_df['review_id'], reviews_df['rating_score']))
         text_map = dict(zip(reviews_df['review_id'], reviews_df['text']))
-        conn.close()
 
         success_count = 0
         sentiment_map = {"Pos": "Positive", "Neg": "Negative", "Neu": "Neutral"}
+        saved_rows = []  # Recalc their parents once, after every chunk is written
 
         for line in jsonl_content.strip().split('\n'):
             try:
@@ -272,19 +278,14 @@ class AIMiner:
                         success_count += 1
                 
                 if data_to_insert:
-                    conn = self._get_conn()
-                    id_list = "', '".join(processed_ids)
-                    conn.execute(f"DELETE FROM review_tags WHERE review_id IN ('{id_list}')")
-                    conn.executemany("INSERT INTO review_tags (review_id, parent_asin, category, aspect, sentiment, quote) VALUES (?, ?, ?, ?, ?, ?)", data_to_insert)
-                    self._update_mining_status(list(processed_ids), "COMPLETED")
-                    conn.close()
-                    
-                    # --- NEW: Trigger Recalculation (Batch) ---
-                    try:
-                        unique_parents = list(set([asin for _, asin, _, _, _, _ in data_to_insert if asin]))
-                        if unique_parents:
-                            engine = StatsEngine()
-                            for pasin in unique_parents:
-                                engine.calculate_and_save(pasin)
-                    except: pass
-            except: continue
\ No newline at end of file
+                    ids = list(processed_ids)
+
+                    def _write_chunk(w_conn, ids=ids, rows=data_to_insert):
+                        self._replace_tags(w_conn, ids, rows)
+                        self._set_status(w_conn, ids, "COMPLETED")
+
+                    get_writer().run(_write_chunk)
+                    saved_rows += data_to_insert
+            except: continue
+
+        self._recalc_parents(saved_rows)
@@ -0,0 +1,83 @@
+import pandas as pd
+from typing import List, Optional
+
+# Niche placeholders that must never become a membership row / filter option
+NICHE_BLACKLIST = ("", "unknown", "null", "none", "non-defined", "multi-niche")
+
+
+def ensure_parent_niches(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parent_niches (
+            parent_asin VARCHAR,
+            niche VARCHAR,
+            PRIMARY KEY (parent_asin, niche)
+        );
+        CREATE INDEX IF NOT EXISTS idx_parent_niches_niche ON parent_niches (niche);
+    """)
+
+
+def has_parent_niches(conn) -> bool:
+    res = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'parent_niches'"
+    ).fetchone()
+    return bool(res and res[0])
+
+
+def sync_parent_niches(conn, parent_asins: Optional[List[str]] = None) -> int:
+    """
+    Rebuild (parent_asin, niche) membership rows from products.main_niche,
+    falling back to the legacy comma-joined product_parents.niche string.
+    `parent_asins=None` rebuilds the whole table (also used on first sync).
+    """
+    if parent_asins is not None and not has_parent_niches(conn):
+        parent_asins = None
+    ensure_parent_niches(conn)
+
+    if parent_asins is None:
+        scope = "TRUE"
+        conn.execute("DELETE FROM parent_niches")
+    else:
+        parent_asins = [a for a in dict.fromkeys(parent_asins) if a]
+        if not parent_asins:
+            return 0
+        conn.register("temp_niche_scope", pd.DataFrame({"parent_asin": parent_asins}))
+        scope = "pp.parent_asin IN (SELECT parent_asin FROM temp_niche_scope)"
+        conn.execute("DELETE FROM parent_niches WHERE parent_asin IN (SELECT parent_asin FROM temp_niche_scope)")
+
+    blacklist = ", ".join(f"'{n}'" for n in NICHE_BLACKLIST)
+    conn.execute(f"""
+        INSERT OR IGNORE INTO parent_niches (parent_asin, niche)
+        SELECT DISTINCT parent_asin, niche FROM (
+            SELECT pp.parent_asin, trim(p.main_niche) as niche
+            FROM product_parents pp
+            JOIN products p ON pp.parent_asin = p.parent_asin
+            WHERE {scope}
+            UNION ALL
+            SELECT pp.parent_asin, trim(unnest(string_split(pp.niche, ','))) as niche
+            FROM product_parents pp
+            WHERE {scope} AND pp.niche IS NOT NULL
+        )
+        WHERE niche IS NOT NULL AND lower(niche) NOT IN ({blacklist})
+    """)
+
+    if parent_asins is not None:
+        conn.unregister("temp_niche_scope")
+        return len(parent_asins)
+    return conn.execute("SELECT COUNT(DISTINCT parent_asin) FROM parent_niches").fetchone()[0]
+
+
+# Most common niche among the parent's variations (alphabetical on ties). Param: parent_asin
+PRIMARY_NICHE_SQL = """
+    SELECT pn.niche
+    FROM parent_niches pn
+    LEFT JOIN products p ON p.parent_asin = pn.parent_asin AND trim(p.main_niche) = pn.niche
+    WHERE pn.parent_asin = ?
+    GROUP BY pn.niche
+    ORDER BY COUNT(p.asin) DESC, pn.niche
+    LIMIT 1
+"""
+
+
+def get_primary_niche(conn, parent_asin: str) -> Optional[str]:
+    res = conn.execute(PRIMARY_NICHE_SQL, [parent_asin]).fetchone()
+    return res[0] if res else None
@@ -1,4 +1,3 @@
-import duckdb
 import os
 import json
 import time
@@ -7,6 +6,7 @@ from pathlib import Path
 from google import genai
 from google.genai import types
 from .config import Settings
+from .db_writer import get_writer
 from .ai_batch import AIBatchHandler
 from .stats_engine import StatsEngine
 
@@ -23,13 +23,8 @@ class TagNormalizer:
             self.client = None
             print("⚠️ Warning: Janitor API Key not set.")
 
-    def _get_conn(self, read_only=False):
-        # Always use dynamic path for Blue-Green safety
-        return duckdb.connect(str(Settings.get_active_db_path()), read_only=read_only)
-
     def get_unmapped_aspects(self) -> List[str]:
         """Fetch unique RAW aspects that are NOT yet standardized."""
-        conn = self._get_conn(read_only=True)
         query = """
             SELECT DISTINCT lower(trim(rt.aspect))
             FROM review_tags rt
@@ -38,18 +33,19 @@ class TagNormalizer:
             AND length(rt.aspect) BETWEEN 2 AND 100
             AND rt.aspect NOT SIMILAR TO '^[0-9]+$' -- Ignore purely numeric noise
         """
-        res = conn.execute(query).fetchall()
-        conn.close()
+        # Through the DB writer: no ad-hoc connection next to it / other processes' locks
+        res = get_writer().run(lambda conn: conn.execute(query).fetchall())
         return [row[0] for row in res]
 
     def get_existing_standards(self) -> List[str]:
         """Fetch existing standard terms to maintain consistency (RAG Shield)."""
         try:
-            conn = self._get_conn(read_only=True)
-            res = conn.execute("SELECT DISTINCT standard_aspect FROM aspect_mapping WHERE standard_aspect IS NOT NULL ORDER BY 1").fetchall()
-            vocab = [r[0] for r in res if r[0]]
-            conn.close()
-            return vocab
+            res = get_writer().run(
+                lambda conn: conn.execute(
+                    "SELECT DISTINCT standard_aspect FROM aspect_mapping WHERE standard_aspect IS NOT NULL ORDER BY 1"
+                ).fetchall()
+            )
+            return [r[0] for r in res if r[0]]
         except:
             return []
 
@@ -80,8 +76,9 @@ class TagNormalizer:
         **Output:** JSON List of objects: {{"raw": "original_term", "std": "Standard Noun", "cat": "Category"}}
         """
 
-    def run_live(self, batch_size=50):
-        """Standardize aspects in real-time. Fast & Precise."""
+    def run_live(self, batch_size=50, progress_cb=None):
+        """Standardize aspects in real-time. Fast & Precise.
+        progress_cb(done, total, message) is called after each batch (worker job registry)."""
         if not self.client: return
         
         unmapped = self.get_unmapped_aspects()
@@ -94,6 +91,8 @@ class TagNormalizer:
         shield = self.get_existing_standards()
         print(f"🛡️ RAG Shield active with {len(shield)} standard terms.")
 
+        if progress_cb:
+            progress_cb(0, len(unmapped), "Standardizing aspects")
         for i in range(0, len(unmapped), batch_size):
             batch = unmapped[i:i+batch_size]
             prompt = self._build_prompt(batch, shield)
@@ -110,6 +109,8 @@ class TagNormalizer:
                 time.sleep(1) # Rate limit safety
             except Exception as e:
                 print(f"💥 [Janitor-Live] Error: {e}")
+            if progress_cb:
+                progress_cb(i + len(batch), len(unmapped))
 
     def run_batch_prepare(self, limit=5000) -> Optional[Path]:
         """Prepare JSONL for large-scale Batch Normalization (Cheap mode)."""
@@ -156,34 +157,23 @@ class TagNormalizer:
                 data_to_insert.append((raw.lower().strip(), std, cat))
         
         if data_to_insert:
-            conn = self._get_conn()
-            conn.executemany("""
-                INSERT OR REPLACE INTO aspect_mapping (raw_aspect, standard_aspect, category)
-                VALUES (?, ?, ?)
-            """, data_to_insert)
-            conn.close()
-            
+            asins_to_calc = get_writer().run(lambda w_conn: self._write_mappings(w_conn, data_to_insert))
+
             # --- NEW: Trigger Smart Recalc (Global) ---
-            try:
-                print("📊 [Janitor] New mappings saved. Triggering Smart Recalc...")
-                import requests
-                # We can call the worker's own endpoint or run logic directly. 
-                # Since we are in the core, let's just use StatsEngine directly for affected ASINs?
-                # Actually, a global smart recalc is better because mappings affect MANY products.
-                # We can use the logic from worker_api:run_recalc_task
-                engine = StatsEngine()
-                with duckdb.connect(str(Settings.get_active_db_path())) as c_recalc:
-                    # Find ASINs that use these raw aspects
-                    raw_list = [f"'{r[0]}'" for r in data_to_insert]
-                    query = f"SELECT DISTINCT parent_asin FROM review_tags WHERE lower(trim(aspect)) IN ({', '.join(raw_list)})"
-                    asins_to_calc = [row[0] for row in c_recalc.execute(query).fetchall()]
-                    
-                    if asins_to_calc:
-                        print(f"   👉 Updating stats for {len(asins_to_calc)} impacted products...")
-                        for pasin in asins_to_calc:
-                            engine.calculate_and_save(pasin, conn=c_recalc)
-            except Exception as e:
-                print(f"⚠️ [Janitor] Recalc trigger warning: {e}")
+            # Mappings affect MANY products: one writer command per ASIN, not one long command
+            if asins_to_calc:
+                print(f"📊 [Janitor] New mappings saved. Updating stats for {len(asins_to_calc)} impacted products...")
+                StatsEngine().recalc_via_writer(asins_to_calc)
+
+    def _write_mappings(self, conn, data_to_insert: List[tuple]) -> List[str]:
+        """Writer command: upsert mappings, return the products that use these raw aspects."""
+        conn.executemany("""
+            INSERT OR REPLACE INTO aspect_mapping (raw_aspect, standard_aspect, category)
+            VALUES (?, ?, ?)
+        """, data_to_insert)
+        raw_list = [r[0] for r in data_to_insert]
+        query = "SELECT DISTINCT parent_asin FROM review_tags WHERE lower(trim(aspect)) IN (SELECT unnest(?::VARCHAR[]))"
+        return [row[0] for row in conn.execute(query, [raw_list]).fetchall() if row[0]]
 
     def ingest_batch_results(self, jsonl_content: str):
         """Universal parser for Janitor batch results."""
@@ -0,0 +1,103 @@
+import os
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+
+# child ASIN -> parent ASIN resolutions, checked before any Playwright lookup
+STATUS_FOUND = "FOUND"
+STATUS_NOT_FOUND = "NOT_FOUND"
+POSITIVE_TTL_DAYS = int(os.getenv("PARENT_CACHE_TTL_DAYS", "90"))  # Parents rarely change
+NEGATIVE_TTL_DAYS = int(os.getenv("PARENT_CACHE_NEGATIVE_TTL_DAYS", "7"))  # Retry "no parent" after a week
+
+
+def ensure_parent_cache(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS asin_parent_cache (
+            asin VARCHAR PRIMARY KEY,
+            parent_asin VARCHAR,
+            status VARCHAR,
+            source VARCHAR,
+            resolved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def has_parent_cache(conn) -> bool:
+    res = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'asin_parent_cache'"
+    ).fetchone()
+    return bool(res and res[0])
+
+
+def get_cached_parents(conn, asins: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    Fresh cache hits only: {asin: parent} for FOUND entries younger than POSITIVE_TTL_DAYS,
+    {asin: None} for NOT_FOUND entries younger than NEGATIVE_TTL_DAYS. Misses are absent.
+    """
+    asins = [a for a in dict.fromkeys(asins) if a]
+    if not asins or not has_parent_cache(conn):
+        return {}
+    rows = conn.execute(
+        """
+        SELECT asin, parent_asin FROM asin_parent_cache
+        WHERE asin IN (SELECT UNNEST(?))
+          AND (
+              (status = ? AND resolved_at > now() - to_days(CAST(? AS INTEGER)))
+              OR (status = ? AND resolved_at > now() - to_days(CAST(? AS INTEGER)))
+          )
+    """,
+        [asins, STATUS_FOUND, POSITIVE_TTL_DAYS, STATUS_NOT_FOUND, NEGATIVE_TTL_DAYS],
+    ).fetchall()
+    return {asin: parent for asin, parent in rows}
+
+
+def cache_parents(conn, pairs: Iterable[Tuple[str, Optional[str]]], source: str) -> int:
+    """
+    Upsert (asin, parent or None) resolutions. A negative result never overwrites a
+    still-fresh positive one (a transient miss must not hide a known parent).
+    """
+    pairs = {a: p for a, p in pairs if a}
+    if not pairs:
+        return 0
+    ensure_parent_cache(conn)
+    df = pd.DataFrame(
+        {
+            "asin": list(pairs),
+            "parent_asin": list(pairs.values()),
+            "status": [STATUS_FOUND if p else STATUS_NOT_FOUND for p in pairs.values()],
+        }
+    )
+    conn.register("temp_parent_cache", df)
+    conn.execute(
+        """
+        INSERT INTO asin_parent_cache (asin, parent_asin, status, source, resolved_at)
+        SELECT asin, parent_asin, status, ?, now() FROM temp_parent_cache
+        ON CONFLICT (asin) DO UPDATE SET
+            parent_asin = excluded.parent_asin,
+            status = excluded.status,
+            source = excluded.source,
+            resolved_at = now()
+        WHERE excluded.status = ?
+           OR asin_parent_cache.status = ?
+           OR asin_parent_cache.resolved_at <= now() - to_days(CAST(? AS INTEGER))
+    """,
+        [source, STATUS_FOUND, STATUS_NOT_FOUND, POSITIVE_TTL_DAYS],
+    )
+    conn.unregister("temp_parent_cache")
+    return len(pairs)
+
+
+def backfill_parent_cache(conn) -> int:
+    """Seed the cache from mappings already known to products / reviews (child_asin -> parent_asin)."""
+    ensure_parent_cache(conn)
+    conn.execute(f"""
+        INSERT INTO asin_parent_cache (asin, parent_asin, status, source, resolved_at)
+        SELECT asin, ANY_VALUE(parent_asin), '{STATUS_FOUND}', 'backfill', now()
+        FROM (
+            SELECT asin, parent_asin FROM products WHERE asin IS NOT NULL AND parent_asin IS NOT NULL
+            UNION ALL
+            SELECT child_asin, parent_asin FROM reviews WHERE child_asin IS NOT NULL AND parent_asin IS NOT NULL
+        )
+        GROUP BY asin
+        ON CONFLICT (asin) DO NOTHING
+    """)
+    return conn.execute("SELECT COUNT(*) FROM asin_parent_cache").fetchone()[0]
@@ -0,0 +1,307 @@
+import asyncio
+import math
+import os
+import random
+import time
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from .browser_pool import USER_AGENT, BrowserPool
+from .db_writer import get_writer
+from .logger import log_event
+from .parent_cache import cache_parents, get_cached_parents
+
+AMAZON_BASE_URL = "https://www.amazon.com"
+PARENT_RE = re.compile(r'"parentAsin"\s*:\s*"(B[A-Z0-9]{9})"')
+
+# HTTP fast path: raw HTML, regex over the stream, stop reading at the first match
+HTTP_ENABLED = os.getenv("PARENT_FINDER_HTTP", "1") != "0"
+HTTP_MAX_CONNECTIONS = 4
+HTTP_TIMEOUT = 15.0
+HTTP_MAX_BYTES = 3_000_000  # Give up (miss) after this much HTML
+STREAM_OVERLAP = 128  # Chars kept between chunks so a match split across two chunks is still found
+BOT_WALL_STATUS = {403, 429, 503}
+LOOKUP_TIMEOUT = 120.0  # Budget per lookup round: HTTP try + browser page + context cooldown
+CLOSE_TIMEOUT = 30.0
+BOT_WALL_MARKERS = ("validateCaptcha", "Type the characters you see", "api-services-support@amazon.com", "Robot Check")
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def save_parent(conn, asin: str, parent: Optional[str], category: Optional[str] = None, cache: bool = True):
+    """
+    Persist one lookup: product_parents upsert + scrape_queue status (COMPLETED / FAILED)
+    and, for fresh lookups (`cache`), the asin_parent_cache entry (negative results too).
+    """
+    if cache:
+        cache_parents(conn, [(asin, parent)], source="parent_finder")
+    if parent:
+        if category:
+            conn.execute(
+                """
+                INSERT INTO product_parents (parent_asin, category, last_updated)
+                VALUES (?, ?, now())
+                ON CONFLICT (parent_asin) DO UPDATE SET
+                    category = CASE
+                        WHEN product_parents.category IS NULL OR product_parents.category IN ('Unknown', 'comforter')
+                        THEN excluded.category
+                        ELSE product_parents.category
+                    END,
+                    last_updated = now()
+            """,
+                [parent, category],
+            )
+        else:
+            conn.execute(
+                """
+                INSERT INTO product_parents (parent_asin, last_updated)
+                VALUES (?, now())
+                ON CONFLICT (parent_asin) DO UPDATE SET last_updated = now()
+            """,
+                [parent],
+            )
+
+        # Update Queue Status to COMPLETED
+        conn.execute(
+            """
+            UPDATE scrape_queue
+            SET status = 'COMPLETED',
+                note = COALESCE(note, '') || ' [Found Parent: ' || ? || ']'
+            WHERE asin = ? AND status = 'IN_PROGRESS'
+        """,
+            [parent, asin],
+        )
+    else:
+        # Update Queue Status to FAILED
+        conn.execute(
+            """
+            UPDATE scrape_queue
+            SET status = 'FAILED',
+                note = COALESCE(note, '') || ' [Parent Not Found]'
+            WHERE asin = ? AND status = 'IN_PROGRESS'
+        """,
+            [asin],
+        )
+
+
+class ParentFinder:
+    """
+    Finds parentAsin from Amazon DP pages through a BrowserPool (one Chromium, N contexts).
+    The pool lives on a private event-loop thread, so worker job threads share it and
+    the browser launch is paid once per worker process. ASINs of a batch are fetched
+    concurrently, paced per context and per domain by the pool.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool: Optional[BrowserPool] = None, use_http: bool = HTTP_ENABLED):
+        # base_url: point at a local fixture server for tests (PARENT_FINDER_BASE_URL)
+        self.base_url = (base_url or os.getenv("PARENT_FINDER_BASE_URL") or AMAZON_BASE_URL).rstrip("/")
+        self.pool = pool or BrowserPool()
+        self.use_http = use_http
+        self.stats = {"cache_hits": 0, "http_found": 0, "http_no_parent": 0, "fallback": 0, "fallback_found": 0}
+        self._http = None
+        self._http_slots: Optional[asyncio.Queue] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="parent-finder", daemon=True)
+        self._thread.start()
+
+    def _call(self, coro, timeout: float = LOOKUP_TIMEOUT):
+        """Run on the finder loop; a hung browser cancels the coroutine and raises TimeoutError."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"ParentFinder call timed out after {timeout:.0f}s")
+
+    def _batch_timeout(self, n: int) -> float:
+        # Lookups run pool.size at a time
+        return LOOKUP_TIMEOUT * max(1, math.ceil(n / self.pool.size))
+
+    # --- Fast path: pooled HTTP client ---
+    def _get_http(self):
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(
+                headers=HTTP_HEADERS,
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+            )
+        return self._http
+
+    def _get_http_slots(self) -> asyncio.Queue:
+        # One ready-at time per HTTP connection: each slot rests pool.cooldown between
+        # two fetches, the same pace as a browser context
+        if self._http_slots is None:
+            self._http_slots = asyncio.Queue()
+            for _ in range(HTTP_MAX_CONNECTIONS):
+                self._http_slots.put_nowait(0.0)
+        return self._http_slots
+
+    async def _find_parent_http(self, url: str) -> Tuple[str, Optional[str]]:
+        """
+        ("found", parent) | ("no_parent", None) when the whole page has no parentAsin |
+        ("blocked", None) on a bot wall | ("error", None) on anything else.
+        """
+        slots = self._get_http_slots()
+        ready_at = await slots.get()
+        try:
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return await self._fetch_http(url)
+        finally:
+            slots.put_nowait(time.monotonic() + random.uniform(*self.pool.cooldown))
+
+    async def _fetch_http(self, url: str) -> Tuple[str, Optional[str]]:
+        await self.pool.limiter.wait(url)  # Same per-domain pacing as the browser path
+        try:
+            async with self._get_http().stream("GET", url) as resp:
+                if resp.status_code in BOT_WALL_STATUS:
+                    return "blocked", None
+                if resp.status_code != 200:
+                    return "error", None
+                tail, read = "", 0
+                async for chunk in resp.aiter_text():
+                    window = tail + chunk
+                    match = PARENT_RE.search(window)
+                    if match:
+                        return "found", match.group(1)  # Leaving the block closes the stream
+                    if any(marker in window for marker in BOT_WALL_MARKERS):
+                        return "blocked", None
+                    read += len(chunk)
+                    if read > HTTP_MAX_BYTES:
+                        break
+                    tail = window[-STREAM_OVERLAP:]
+                return "no_parent", None
+        except Exception as e:
+            print(f"⚠️ [ParentFinder] HTTP fetch failed for {url}: {e}")
+            return "error", None
+
+    # --- Fallback: Playwright pool ---
+    async def _find_parent_browser(self, url: str) -> Optional[str]:
+        match = PARENT_RE.search(await self.pool.fetch(url))
+        return match.group(1) if match else None
+
+    async def _find_parent(self, asin: str) -> Optional[str]:
+        """Find the parentAsin of a DP page: HTTP first, browser only on bot walls / failures."""
+        url = f"{self.base_url}/dp/{asin}"
+        print(f"🕵️ Searching for parent of {asin} at {url}...")
+        if self.use_http:
+            outcome, parent = await self._find_parent_http(url)
+            if outcome in ("found", "no_parent"):
+                self.stats[f"http_{outcome}"] += 1
+                print(f"✅ Found Parent ASIN: {parent}" if parent else f"❌ No parentAsin in page source for {asin}")
+                return parent
+            print(f"🔁 [ParentFinder] HTTP {outcome} for {asin}, falling back to browser...")
+
+        self.stats["fallback"] += 1
+        try:
+            parent = await self._find_parent_browser(url)
+        except Exception as e:
+            print(f"⚠️ Error scraping {asin}: {e}")
+            return None
+        if parent:
+            self.stats["fallback_found"] += 1
+            print(f"✅ Found Parent ASIN: {parent}")
+            return parent
+        print(f"❌ Could not find parentAsin in page source for {asin}")
+        return None
+
+    def report(self, since: Optional[Dict[str, int]] = None) -> Dict[str, float]:
+        """Cache / fast-path / fallback counts and ratios (since a previous `dict(self.stats)` snapshot)."""
+        counts = {k: v - (since or {}).get(k, 0) for k, v in self.stats.items()}
+        fast = counts["http_found"] + counts["http_no_parent"]
+        total = fast + counts["fallback"]
+        return {
+            **counts,
+            "lookups": total,  # Page fetches (cache hits excluded)
+            "fast_path_ratio": round(fast / total, 3) if total else 0.0,
+            "fallback_ratio": round(counts["fallback"] / total, 3) if total else 0.0,
+        }
+
+    def find_parent(self, asin: str) -> Optional[str]:
+        return self._call(self._find_parent(asin))
+
+    def find_parents(self, asins: List[str]) -> Dict[str, Optional[str]]:
+        """Lookup only (no DB writes): {asin: parent or None}."""
+
+        async def _all():
+            parents = await asyncio.gather(*(self._find_parent(a) for a in asins))
+            return dict(zip(asins, parents))
+
+        return self._call(_all(), timeout=self._batch_timeout(len(asins)))
+
+    async def _run(self, asins: List[str], category: Optional[str], progress_cb) -> Dict[str, Optional[str]]:
+        writer = get_writer()
+        results = {}
+        before = dict(self.stats)
+        # Fresh cache hits (found or known-missing) cost no page fetch
+        cached = await asyncio.wrap_future(writer.submit(lambda conn: get_cached_parents(conn, asins)))
+        self.stats["cache_hits"] += len(cached)
+        if cached:
+            print(f"🗂️ [ParentFinder] {len(cached)}/{len(asins)} ASINs resolved from cache.")
+
+        async def _one(asin):
+            hit = asin in cached
+            parent = cached[asin] if hit else await self._find_parent(asin)
+            # Persist without blocking the event loop (DB writer thread)
+            await asyncio.wrap_future(
+                writer.submit(lambda conn: save_parent(conn, asin, parent, category, cache=not hit))
+            )
+            results[asin] = parent
+            if parent:
+                log_event("ParentFinder", {"asin": asin, "parent": parent, "category": category, "status": "mapped"})
+            else:
+                log_event("ParentFinder", {"asin": asin, "status": "not_found"})
+            if progress_cb:
+                progress_cb(len(results), len(asins), f"{asin} -> {parent or 'not found'}")
+
+        await asyncio.gather(*(_one(a) for a in asins))
+        print(f"📈 [ParentFinder] {self.report(since=before)}")
+        return {a: results.get(a) for a in asins}
+
+    def run(self, asins: List[str], category: Optional[str] = None, progress_cb=None) -> Dict[str, Optional[str]]:
+        """Resolve every ASIN (asin_parent_cache first), persist through the DB writer. Returns {asin: parent or None}."""
+        return self._call(self._run(asins, category, progress_cb), timeout=self._batch_timeout(len(asins)))
+
+    async def _close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        await self.pool.close()
+
+    def close(self):
+        try:
+            self._call(self._close(), timeout=CLOSE_TIMEOUT)
+        except TimeoutError as e:
+            print(f"⚠️ [ParentFinder] {e} (closing browser)")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+_FINDER: Optional[ParentFinder] = None
+_FINDER_LOCK = threading.Lock()
+
+
+def get_parent_finder() -> ParentFinder:
+    """Process-wide ParentFinder (browser launched on first lookup)."""
+    global _FINDER
+    with _FINDER_LOCK:
+        if _FINDER is None:
+            _FINDER = ParentFinder()
+        return _FINDER
+
+
+def close_parent_finder():
+    """Worker shutdown: close the shared browser if one was started."""
+    global _FINDER
+    with _FINDER_LOCK:
+        if _FINDER is not None:
+            _FINDER.close()
+            _FINDER = None
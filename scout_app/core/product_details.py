@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+from typing import Iterable, List, Optional
+import polars as pl
+from apify_client import ApifyClient
+from .config import Settings
+from .db_writer import get_writer
+from .logger import log_event
+from .competitors import rebuild_competitor_candidates
+from .detective_payloads import refresh_payloads
+from .dna import extract_dna
+from .niches import sync_parent_niches
+from .parent_cache import cache_parents
+from .search_index import ProductSearchIndex
+
+DETAILS_ACTOR = "axesso_data/amazon-product-details-scraper"
+DP_ASIN_RE = re.compile(r"/dp/([A-Z0-9]{10})")
+
+_CLIENT: Optional[ApifyClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_apify_client() -> ApifyClient:
+    """Process-wide Apify client (one HTTP session for every details job)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = ApifyClient(Settings.APIFY_TOKEN or os.getenv("APIFY_TOKEN"))
+        return _CLIENT
+
+
+# Flat, typed view of one Axesso item (nested / mixed-type fields resolved while streaming)
+DETAILS_SCHEMA = {
+    "url": pl.Utf8,
+    "asin": pl.Utf8,
+    "parent_asin_raw": pl.Utf8,
+    "title": pl.Utf8,
+    "brand_raw": pl.Utf8,
+    "manufacturer": pl.Utf8,
+    "image_url": pl.Utf8,
+    "bread_crumbs": pl.Utf8,
+    "category_niche": pl.Utf8,
+    "details": pl.List(pl.Struct({"name": pl.Utf8, "value": pl.Utf8})),
+}
+
+
+def _flatten_item(item: dict) -> dict:
+    image = item.get("mainImage")
+    if isinstance(image, dict):
+        image = image.get("imageUrl")
+    elif not image and item.get("imageUrlList"):
+        image = item["imageUrlList"][0]
+    categories = item.get("categoriesExtended") or []
+    return {
+        "url": item.get("url"),
+        "asin": item.get("asin"),
+        "parent_asin_raw": item.get("parentAsin"),
+        "title": item.get("title") or item.get("productTitle"),
+        "brand_raw": item.get("brand"),
+        "manufacturer": item.get("manufacturer"),
+        "image_url": image,
+        "bread_crumbs": item.get("breadCrumbs"),
+        "category_niche": categories[-1].get("name") if categories else None,
+        "details": [
+            {"name": str(d.get("name", "")), "value": None if d.get("value") is None else str(d.get("value"))}
+            for d in item.get("productDetails") or []
+        ],
+    }
+
+
+def details_frame(items: Iterable[dict]) -> pl.DataFrame:
+    """Stream Axesso items (e.g. dataset.iterate_items()) into one typed frame, one flat row per item."""
+    return pl.DataFrame((_flatten_item(i) for i in items), schema=DETAILS_SCHEMA)
+
+
+def _clean_brand(col: pl.Expr) -> pl.Expr:
+    return (
+        col.str.replace_all("Brand: ", "", literal=True)
+        .str.replace_all("Visit the ", "", literal=True)
+        .str.replace_all(" Store", "", literal=True)
+        .str.replace_all("\u200e", "", literal=True)
+        .str.strip_chars()
+    )
+
+
+def _extract_dna(df: pl.DataFrame, category: str) -> pl.DataFrame:
+    """Metadata + shared DNA extraction (core/dna.py); brand falls back to manufacturer, then productDetails."""
+    df = df.with_columns(brand=pl.coalesce(pl.col("brand_raw"), _clean_brand(pl.col("manufacturer"))))
+    df = extract_dna(df, details_col="details", breadcrumbs_col="bread_crumbs", category=category)
+    df = df.with_columns(
+        requested_asin=pl.col("url").str.extract(DP_ASIN_RE.pattern, 1),
+        brand=_clean_brand(pl.col("brand")),
+        niche=pl.coalesce(pl.col("niche"), pl.col("category_niche"), pl.lit("Unknown")),
+    )
+    # CRITICAL: Prioritize requested_asin (Source of Truth) over scraper's canonical parent
+    # to prevent unwanted "Grandparent" consolidation.
+    df = df.with_columns(final_parent_asin=pl.coalesce("requested_asin", "parent_asin_raw", "asin"))
+    return df.filter(pl.col("final_parent_asin").is_not_null())
+
+
+def save_product_details(conn, results, category: str = "comforter") -> List[str]:
+    """
+    Persist Axesso items (iterable or details_frame) into product_parents / products with
+    one set-based upsert per table, then refresh derived tables. Returns enriched parents.
+    """
+    frame = results if isinstance(results, pl.DataFrame) else details_frame(results)
+    df = _extract_dna(frame, category)
+    if df.is_empty():
+        return []
+
+    # --- DB UPDATE 1: product_parents (High-level Anchor) ---
+    # We update this FIRST to satisfy Foreign Key constraints in the products table.
+    # One row per parent (last non-null value per column, as sequential upserts would leave it)
+    # so ON CONFLICT never touches a row twice.
+    parents = df.group_by("final_parent_asin", maintain_order=True).agg(
+        pl.col("niche").last(),
+        *(pl.col(c).drop_nulls().last() for c in ("title", "brand", "image_url")),
+    )
+    conn.register("temp_detail_parents", parents.to_arrow())
+    conn.execute("""
+        INSERT INTO product_parents (parent_asin, category, niche, title, brand, image_url, last_updated)
+        SELECT final_parent_asin, ?, niche, title, brand, image_url, now() FROM temp_detail_parents
+        ON CONFLICT (parent_asin) DO UPDATE SET
+            category = CASE 
+                WHEN product_parents.category IS NULL OR product_parents.category IN ('Unknown', 'comforter') 
+                THEN excluded.category 
+                ELSE product_parents.category 
+            END,
+            niche = COALESCE(excluded.niche, product_parents.niche),
+            title = COALESCE(excluded.title, product_parents.title),
+            brand = COALESCE(excluded.brand, product_parents.brand),
+            image_url = COALESCE(excluded.image_url, product_parents.image_url),
+            last_updated = now()
+    """, [category])
+
+    # --- DB UPDATE 2: products (Technical Metadata) ---
+    products = (
+        df.filter(pl.col("asin").is_not_null())
+        .unique(subset="asin", keep="last", maintain_order=True)
+        .select(
+            "asin", "final_parent_asin", "title", "brand", "image_url", "material", "niche",
+            "design_type", "target_audience", "gender", "size_capacity", "num_pieces", "pack",
+        )
+    )
+    conn.register("temp_detail_products", products.to_arrow())
+    conn.execute("""
+        INSERT INTO products (asin, parent_asin, title, brand, image_url, material, main_niche, design_type, target_audience, gender,
+                              size_capacity, num_pieces, pack, last_updated)
+        SELECT asin, final_parent_asin, title, brand, image_url, material, niche, design_type, target_audience, gender,
+               size_capacity, num_pieces, pack, now()
+        FROM temp_detail_products
+        ON CONFLICT (asin) DO UPDATE SET
+            title = COALESCE(excluded.title, products.title),
+            brand = COALESCE(excluded.brand, products.brand),
+            image_url = COALESCE(excluded.image_url, products.image_url),
+            material = COALESCE(excluded.material, products.material),
+            main_niche = COALESCE(excluded.main_niche, products.main_niche),
+            design_type = COALESCE(excluded.design_type, products.design_type),
+            target_audience = COALESCE(excluded.target_audience, products.target_audience),
+            gender = COALESCE(excluded.gender, products.gender),
+            size_capacity = COALESCE(excluded.size_capacity, products.size_capacity),
+            num_pieces = COALESCE(excluded.num_pieces, products.num_pieces),
+            pack = COALESCE(excluded.pack, products.pack),
+            last_updated = now()
+    """)
+
+    enriched_parents = parents["final_parent_asin"].to_list()
+    print(f"✅ Enriched {len(enriched_parents)} families ({len(products)} ASINs)")
+    for parent, asin in df.select("final_parent_asin", "asin").iter_rows():
+        log_event("ApifyDetail", {"parent_asin": parent, "scraped_asin": asin, "status": "enriched"})
+
+    # --- SMART NICHE: Multi-Niche Parents (one grouped UPDATE for the batch) ---
+    affected = df.select(pl.coalesce("parent_asin_raw", "asin", "requested_asin").alias("parent_asin")).drop_nulls()
+    conn.register("temp_detail_affected", affected.unique().to_arrow())
+    multi = conn.execute("""
+        UPDATE product_parents SET niche = 'Multi-Niche'
+        WHERE parent_asin IN (
+            SELECT p.parent_asin FROM products p
+            JOIN temp_detail_affected a ON p.parent_asin = a.parent_asin
+            GROUP BY p.parent_asin
+            HAVING COUNT(DISTINCT p.main_niche) > 1
+        )
+    """).fetchone()[0]
+    if multi:
+        print(f"🔀 Marked {multi} parents as 'Multi-Niche'")
+    for name in ("temp_detail_parents", "temp_detail_products", "temp_detail_affected"):
+        conn.unregister(name)
+
+    cache_parents(conn, products.select("asin", "final_parent_asin").iter_rows(), source="apify_details")
+
+    # --- NICHE MEMBERSHIP + COMPETITORS + SEARCH INDEX: Refresh enriched families ---
+    sync_parent_niches(conn, enriched_parents)
+    rebuild_competitor_candidates(conn, enriched_parents)
+    refresh_payloads(conn, enriched_parents)
+    ProductSearchIndex().refresh(conn, enriched_parents)
+    return enriched_parents
+
+
+def run_apify_product_details(asins: List[str], category: str = "comforter", progress_cb=None) -> Optional[int]:
+    """
+    Fetch full product details from Apify Axesso Scraper and persist them through the DB writer.
+    Returns the number of items fetched (None on error).
+    """
+    urls = [f"https://www.amazon.com/dp/{asin}" for asin in asins]
+    print(f"🎭 Launching Apify Detail Scraper for {len(urls)} URLs...")
+
+    try:
+        client = get_apify_client()
+        run = client.actor(DETAILS_ACTOR).call(run_input={"urls": urls})
+        # Stream the dataset straight into a typed frame (no list of raw items kept)
+        frame = details_frame(client.dataset(run["defaultDatasetId"]).iterate_items())
+        print(f"✅ Fetched details for {len(frame)} items.")
+        if progress_cb:
+            progress_cb(len(asins) // 2, len(asins), f"Fetched {len(frame)} items, saving")
+
+        # --- PERSIST TO DB ---
+        get_writer().run(lambda conn: save_product_details(conn, frame, category))
+        if progress_cb:
+            progress_cb(len(asins), len(asins))
+        return len(frame)
+
+    except Exception as e:
+        print(f"❌ Apify Error: {e}")
+        return None
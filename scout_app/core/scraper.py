@@ -1,88 +1,218 @@
+import asyncio
 import datetime
+import io
+import os
+import tempfile
 from pathlib import Path
-from typing import List, Optional
-from apify_client import ApifyClient
+from typing import Callable, List, Optional, Tuple
+import polars as pl
+import pyarrow.parquet as pq
+from apify_client import ApifyClientAsync
 from .config import Settings
 
+SHARD_ASINS = int(os.getenv("APIFY_SHARD_ASINS", "10"))  # ASINs per actor run (x5 star filters)
+MAX_CONCURRENT_RUNS = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", "4"))
+RUN_TIMEOUT_SECS = int(os.getenv("APIFY_RUN_TIMEOUT_SECS", "3600"))  # Give up waiting on one run after this
+PAGE_ITEMS = int(os.getenv("APIFY_PAGE_ITEMS", "5000"))  # Dataset items per JSONL page = one Parquet row group
+
+
+def _flatten_page(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Apify XLSX-style column names so the ingester sees the same columns:
+    struct fields become "a/b", scalar lists also get "a/0" (the list column itself is kept).
+    """
+    while any(isinstance(t, pl.Struct) for t in df.dtypes):
+        cols = []
+        for name, dtype in df.schema.items():
+            if isinstance(dtype, pl.Struct):
+                cols += [pl.col(name).struct.field(f.name).alias(f"{name}/{f.name}") for f in dtype.fields]
+            else:
+                cols.append(pl.col(name))
+        df = df.select(cols)
+    firsts = [
+        pl.col(name).list.get(0, null_on_oob=True).alias(f"{name}/0")
+        for name, dtype in df.schema.items()
+        if isinstance(dtype, pl.List) and not isinstance(dtype.inner, (pl.Struct, pl.List)) and f"{name}/0" not in df.columns
+    ]
+    return df.with_columns(firsts) if firsts else df
+
+
+def _file_type(dtype):
+    """File schema type: all-null columns (at any depth) are written as strings."""
+    if dtype == pl.Null:
+        return pl.Utf8
+    if isinstance(dtype, pl.List):
+        return pl.List(_file_type(dtype.inner))
+    if isinstance(dtype, pl.Struct):
+        return pl.Struct({f.name: _file_type(f.dtype) for f in dtype.fields})
+    return dtype
+
+
+def _spill_page(body: bytes, path: Path) -> Tuple[pl.Schema, int]:
+    """Parse + flatten one JSONL page and spill it to `path` as-is (runs in a worker thread)."""
+    page = _flatten_page(pl.read_ndjson(io.BytesIO(body), infer_schema_length=None))
+    page.write_parquet(path)
+    return page.schema, page.height
+
+
+def _merge_pages(pages: List[Path], schemas: List[pl.Schema], file_path: Path) -> int:
+    """
+    Rewrite the spilled pages into one Parquet file, one row group per page, under the
+    widened schema of all pages (union of columns, supertype per column: no column is
+    dropped and no value nulled by a failed cast). Runs in a worker thread.
+    """
+    widened = pl.concat([pl.DataFrame(schema=s) for s in schemas], how="diagonal_relaxed")
+    file_schema = {name: _file_type(dtype) for name, dtype in widened.schema.items()}
+    writer, rows = None, 0
+    try:
+        for path in pages:
+            page = pl.concat([widened, pl.read_parquet(path)], how="diagonal_relaxed").cast(file_schema)
+            table = page.to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(file_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
 class AmazonScraper:
-    def __init__(self):
+    def __init__(self, api_url: Optional[str] = None, max_runs: int = MAX_CONCURRENT_RUNS, shard_size: int = SHARD_ASINS):
         # Zero Trust: Validate Config again just in case
         if not Settings.APIFY_TOKEN:
             raise ValueError("APIFY_TOKEN is missing in Settings")
-        
-        self.client = ApifyClient(Settings.APIFY_TOKEN)
+
+        # api_url: point at a local Apify-compatible stub for tests (APIFY_API_URL)
+        self.api_url = api_url or Settings.APIFY_API_URL
         self.actor_id = Settings.APIFY_ACTOR_ID
+        self.max_runs = max(1, max_runs)
+        self.shard_size = max(1, shard_size)
         self.stars = ["one_star", "two_star", "three_star", "four_star", "five_star"]
 
-    def run_deep_scrape(self, asins: List[str]) -> Optional[Path]:
-        """
-        Trigger Apify task for a list of ASINs using 5-star split strategy.
-        Downloads the result to staging_data/.
-        
-        Returns:
-            Path: Absolute path to the downloaded file.
-            None: If failed or empty.
-        """
-        if not asins:
-            print("⚠️ Scraper: No ASINs provided.")
-            return None
+    def _build_input(self, asins: List[str]) -> List[dict]:
+        """Deep Scrape Strategy: one task per ASIN x star filter."""
+        return [
+            {
+                "asin": asin,
+                "domainCode": "com",
+                "sortBy": "recent",
+                "filterByStar": star,
+                "maxPages": 10,  # Max amazon allows usually
+            }
+            for asin in asins
+            for star in self.stars
+        ]
 
-        # 1. Build Payload (Deep Scrape Strategy)
-        run_input_items = []
-        for asin in asins:
-            asin = asin.strip()
-            if not asin: continue
-            
-            for star in self.stars:
-                run_input_items.append({
-                    "asin": asin,
-                    "domainCode": "com",
-                    "sortBy": "recent",
-                    "filterByStar": star,
-                    "maxPages": 10  # Max amazon allows usually
-                })
-
-        print(f"🚀 [Scraper] Dispatching {len(run_input_items)} tasks (Parallel 5-Star Split) for {len(asins)} ASINs...")
-
-        try:
-            # 2. Execute on Apify (Blocking call - waits for finish)
-            # Memory Limit: Default actor memory is usually fine.
-            run = self.client.actor(self.actor_id).call(run_input={"input": run_input_items})
-            
+    async def _scrape_shard(self, client: ApifyClientAsync, shard: List[str], slots: asyncio.Semaphore) -> Optional[Path]:
+        """Start one actor run (non-blocking), wait for it, stream its dataset to staging_data/*.parquet."""
+        async with slots:
+            run = await client.actor(self.actor_id).start(run_input={"input": self._build_input(shard)})
             run_id = run.get("id")
-            status = run.get("status")
-            print(f"⏳ [Scraper] Run ID: {run_id} | Status: {status}")
+            print(f"⏳ [Scraper] Run {run_id} started for {len(shard)} ASINs")
+            run = await client.run(run_id).wait_for_finish(wait_secs=RUN_TIMEOUT_SECS) or run
 
-            if status != "SUCCEEDED":
-                print(f"❌ [Scraper] Run failed with status: {status}")
-                return None
-
-            # 3. Check Dataset
-            dataset_id = run["defaultDatasetId"]
-            dataset_info = self.client.dataset(dataset_id).get()
-            item_count = dataset_info.get("itemCount", 0)
+        status = run.get("status")
+        if status != "SUCCEEDED":
+            print(f"❌ [Scraper] Run {run_id} ended with status: {status}")
+            return None
 
-            if item_count == 0:
-                print("⚠️ [Scraper] Apify returned 0 items. Nothing to download.")
-                return None
+        dataset = client.dataset(run["defaultDatasetId"])
+        item_count = ((await dataset.get()) or {}).get("itemCount", 0)  # Lazy: for the log only
 
-            print(f"📥 [Scraper] Downloading {item_count} items...")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = Settings.INGEST_STAGING_DIR / f"raw_scrape_{timestamp}_{run_id}.parquet"
+        print(f"📥 [Scraper] Downloading ~{item_count} items from run {run_id}...")
+        rows = await self._download_parquet(dataset, file_path)
+        if rows == 0:
+            print(f"⚠️ [Scraper] Run {run_id} returned 0 items. Nothing to download.")
+            return None
+        print(f"✅ [Scraper] Saved {rows} rows to: {file_path}")
+        return file_path
 
-            # 4. Download Raw Bytes (XLSX format preferred for now based on legacy)
-            # We download as ONE big file. The Ingester will handle splitting/deduplication.
-            dataset_bytes = self.client.dataset(dataset_id).get_items_as_bytes(item_format="xlsx")
+    async def _download_parquet(self, dataset, file_path: Path) -> int:
+        """
+        Page through the dataset as JSONL (PAGE_ITEMS per request) until a short or empty
+        page: itemCount is only a hint (Apify updates it lazily). Each page is parsed with
+        Polars and spilled to a temp Parquet file, then all pages are rewritten as one row
+        group each under the widened schema (a column first seen on a late page is kept).
+        Parsing and writing run in worker threads so the event loop keeps polling the
+        other runs. Written to .part and renamed when complete so the staging list /
+        ingester never see a half-written file. Returns 0 (no file) for an empty dataset.
+        """
+        part_path = file_path.with_name(file_path.name + ".part")
+        with tempfile.TemporaryDirectory(prefix=f".{file_path.stem}_", dir=file_path.parent) as spill_dir:
+            pages, schemas, offset = [], [], 0
+            while True:
+                async with dataset.stream_items(item_format="jsonl", offset=offset, limit=PAGE_ITEMS) as resp:
+                    body = b"".join([chunk async for chunk in resp.aiter_bytes()])
+                if not body.strip():
+                    break
+                page_path = Path(spill_dir) / f"{len(pages):05d}.parquet"
+                schema, n_items = await asyncio.to_thread(_spill_page, body, page_path)
+                pages.append(page_path)
+                schemas.append(schema)
+                if n_items < PAGE_ITEMS:
+                    break
+                offset += n_items
+            if not pages:
+                return 0
+            try:
+                rows = await asyncio.to_thread(_merge_pages, pages, schemas, part_path)
+            except BaseException:
+                part_path.unlink(missing_ok=True)
+                raise
+        part_path.rename(file_path)
+        return rows
 
-            # 5. Save to Staging
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"raw_scrape_{timestamp}_{run_id}.xlsx"
-            file_path = Settings.INGEST_STAGING_DIR / filename
+    async def scrape(
+        self, asins: List[str], progress_cb=None, on_file: Optional[Callable[[Path], None]] = None
+    ) -> List[Path]:
+        """
+        Shard `asins` across actor runs (at most max_runs in flight), poll them concurrently
+        and save each dataset as soon as its run finishes. on_file(path) is called per file
+        in completion order (e.g. to queue an ingest). A failed shard does not stop the others.
+        """
+        asins = [a.strip() for a in asins if a and a.strip()]
+        if not asins:
+            print("⚠️ Scraper: No ASINs provided.")
+            return []
 
-            with open(file_path, "wb") as f:
-                f.write(dataset_bytes)
+        shards = [asins[i : i + self.shard_size] for i in range(0, len(asins), self.shard_size)]
+        print(
+            f"🚀 [Scraper] Dispatching {len(asins) * len(self.stars)} tasks (5-Star Split) for {len(asins)} ASINs "
+            f"in {len(shards)} runs (max {self.max_runs} concurrent)..."
+        )
+        if progress_cb:
+            progress_cb(0, len(shards), f"Apify: {len(shards)} runs")
 
-            print(f"✅ [Scraper] Saved raw data to: {file_path}")
-            return file_path
+        client = ApifyClientAsync(Settings.APIFY_TOKEN, api_url=self.api_url)
+        slots = asyncio.Semaphore(self.max_runs)
+        tasks = [asyncio.create_task(self._scrape_shard(client, shard, slots)) for shard in shards]
+        files, done = [], 0
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                file_path = await next_done
+            except Exception as e:
+                print(f"💥 [Scraper] Shard failed: {e}")
+                file_path = None
+            done += 1
+            if file_path:
+                files.append(file_path)
+                if on_file:
+                    on_file(file_path)
+            if progress_cb:
+                progress_cb(done, len(shards), f"{done}/{len(shards)} runs finished, {len(files)} files saved")
+        return files
 
+    def run_deep_scrape(self, asins: List[str], progress_cb=None, on_file=None) -> List[Path]:
+        """
+        Blocking wrapper around scrape() (own event loop, one thread for all runs).
+        Returns the downloaded staging files (empty if every run failed or was empty).
+        """
+        try:
+            return asyncio.run(self.scrape(asins, progress_cb=progress_cb, on_file=on_file))
         except Exception as e:
             print(f"💥 [Scraper] Critical Error: {e}")
-            return None
+            return []
@@ -0,0 +1,210 @@
+import duckdb
+import pandas as pd
+from typing import List, Optional
+from .config import Settings
+from .niches import ensure_parent_niches, sync_parent_niches
+
+
+class ProductSearchIndex:
+    """
+    Prebuilt search index for the Product Explorer sidebar.
+
+    Tables (rebuilt from product_parents / products):
+      - search_parents      : one row per parent with normalized title/brand
+      - search_asin_lookup  : every parent + variation ASIN -> parent_asin
+      - search_trigrams     : (trigram, parent_asin) postings over title + brand
+
+    Niche filters read parent_niches, which is owned by core/niches.py.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or str(Settings.get_active_db_path())
+
+    # --- SCHEMA ---
+    def ensure_schema(self, conn):
+        ensure_parent_niches(conn)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_parents (
+                parent_asin VARCHAR PRIMARY KEY,
+                category VARCHAR,
+                brand VARCHAR,
+                title VARCHAR,
+                avg_rating DOUBLE,
+                search_text VARCHAR
+            );
+            CREATE TABLE IF NOT EXISTS search_asin_lookup (
+                asin VARCHAR PRIMARY KEY,
+                parent_asin VARCHAR
+            );
+            CREATE TABLE IF NOT EXISTS search_trigrams (
+                trigram VARCHAR,
+                parent_asin VARCHAR
+            );
+            CREATE INDEX IF NOT EXISTS idx_search_trigrams_trigram ON search_trigrams (trigram);
+            CREATE INDEX IF NOT EXISTS idx_search_parents_category ON search_parents (category);
+        """)
+
+    def has_index(self, conn) -> bool:
+        res = conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name IN ('search_parents', 'search_trigrams')"
+        ).fetchone()
+        return bool(res and res[0] == 2)
+
+    # --- BUILD ---
+    def refresh(self, conn, parent_asins: Optional[List[str]] = None):
+        """
+        (Re)build index rows. `parent_asins=None` rebuilds everything,
+        otherwise only the given parents are replaced (incremental).
+        """
+        if parent_asins is not None and not self.has_index(conn):
+            parent_asins = None  # First build on this DB must be complete
+        self.ensure_schema(conn)
+
+        if parent_asins is None:
+            scope = "TRUE"
+            params = []
+            for table in ("search_parents", "search_asin_lookup", "search_trigrams"):
+                conn.execute(f"DELETE FROM {table}")
+        else:
+            parent_asins = [a for a in dict.fromkeys(parent_asins) if a]
+            if not parent_asins:
+                return 0
+            conn.register("temp_search_scope", pd.DataFrame({"parent_asin": parent_asins}))
+            scope = "pp.parent_asin IN (SELECT parent_asin FROM temp_search_scope)"
+            params = []
+            for table in ("search_parents", "search_trigrams"):
+                conn.execute(f"DELETE FROM {table} WHERE parent_asin IN (SELECT parent_asin FROM temp_search_scope)")
+            conn.execute("""
+                DELETE FROM search_asin_lookup
+                WHERE parent_asin IN (SELECT parent_asin FROM temp_search_scope)
+                   OR asin IN (SELECT asin FROM products WHERE parent_asin IN (SELECT parent_asin FROM temp_search_scope))
+            """)
+
+        # 1. Parents (one row each, normalized search text)
+        conn.execute(
+            f"""
+            INSERT INTO search_parents (parent_asin, category, brand, title, avg_rating, search_text)
+            SELECT
+                pp.parent_asin,
+                ANY_VALUE(pp.category),
+                ANY_VALUE(pp.brand),
+                ANY_VALUE(pp.title),
+                MAX(p.real_average_rating),
+                lower(COALESCE(ANY_VALUE(pp.title), '') || ' ' || COALESCE(ANY_VALUE(pp.brand), ''))
+            FROM product_parents pp
+            LEFT JOIN products p ON pp.parent_asin = p.parent_asin
+            WHERE {scope}
+            GROUP BY pp.parent_asin
+        """,
+            params,
+        )
+
+        # 2. ASIN lookup (parents + all variations)
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO search_asin_lookup (asin, parent_asin)
+            SELECT asin, parent_asin FROM (
+                SELECT pp.parent_asin as asin, pp.parent_asin FROM product_parents pp WHERE {scope}
+                UNION ALL
+                SELECT p.asin, pp.parent_asin
+                FROM product_parents pp JOIN products p ON pp.parent_asin = p.parent_asin
+                WHERE {scope}
+            )
+        """,
+            params,
+        )
+
+        # 3. Trigram postings over title + brand
+        conn.execute(
+            f"""
+            INSERT INTO search_trigrams (trigram, parent_asin)
+            SELECT DISTINCT substr(search_text, i, 3), parent_asin
+            FROM (
+                SELECT sp.parent_asin, sp.search_text, unnest(range(1, length(sp.search_text) - 1)) as i
+                FROM search_parents sp
+                JOIN product_parents pp ON sp.parent_asin = pp.parent_asin
+                WHERE {scope}
+            )
+        """,
+            params,
+        )
+
+        if parent_asins is not None:
+            conn.unregister("temp_search_scope")
+            return len(parent_asins)
+        return conn.execute("SELECT COUNT(*) FROM search_parents").fetchone()[0]
+
+    def rebuild(self):
+        """Full rebuild against self.db_path (CLI / migration entry point)."""
+        with duckdb.connect(self.db_path) as conn:
+            sync_parent_niches(conn)
+            total = self.refresh(conn)
+        print(f"🔎 [SearchIndex] Indexed {total} parents on {self.db_path}")
+        return total
+
+    # --- QUERY ---
+    @staticmethod
+    def _trigrams(term: str) -> List[str]:
+        return sorted({term[i : i + 3] for i in range(len(term) - 2)})
+
+    def list_categories(self, conn) -> List[str]:
+        res = conn.execute(
+            "SELECT DISTINCT category FROM search_parents WHERE category IS NOT NULL AND category != '' ORDER BY 1"
+        ).fetchall()
+        return [r[0] for r in res]
+
+    def search(
+        self,
+        conn,
+        category: Optional[str] = None,
+        niche: Optional[str] = None,
+        term: Optional[str] = None,
+        limit: int = 200,
+    ) -> pd.DataFrame:
+        """
+        Filter parents by category / niche (equality) and a free-text term matched against
+        ASIN (parent or variation, prefix), title and brand (trigram postings, substring verified).
+        """
+        clauses = ["TRUE"]
+        params = []
+
+        if category:
+            clauses.append("sp.category = ?")
+            params.append(category)
+        if niche:
+            clauses.append("sp.parent_asin IN (SELECT parent_asin FROM parent_niches WHERE niche = ?)")
+            params.append(niche)
+
+        term = (term or "").strip().lower()
+        if term:
+            asin_match = "sp.parent_asin IN (SELECT parent_asin FROM search_asin_lookup WHERE starts_with(lower(asin), ?))"
+            if len(term) >= 3:
+                grams = self._trigrams(term)
+                text_match = f"""sp.parent_asin IN (
+                    SELECT parent_asin FROM search_trigrams
+                    WHERE trigram IN ({", ".join(["?"] * len(grams))})
+                    GROUP BY parent_asin HAVING COUNT(DISTINCT trigram) = {len(grams)}
+                ) AND contains(sp.search_text, ?)"""
+                text_params = grams + [term]
+            else:
+                # Too short for trigrams: word-prefix match only
+                text_match = "(starts_with(sp.search_text, ?) OR contains(sp.search_text, ' ' || ?))"
+                text_params = [term, term]
+            clauses.append(f"({asin_match} OR ({text_match}))")
+            params.extend([term] + text_params)
+
+        sql = f"""
+            SELECT
+                sp.parent_asin, sp.category,
+                (SELECT STRING_AGG(niche, ', ' ORDER BY niche) FROM parent_niches pn WHERE pn.parent_asin = sp.parent_asin) as niche,
+                sp.brand, sp.title, sp.avg_rating
+            FROM search_parents sp
+            WHERE {" AND ".join(clauses)}
+            ORDER BY sp.category, sp.brand, sp.parent_asin
+            LIMIT {int(limit)}
+        """
+        return conn.execute(sql, params).df()
+
+
+if __name__ == "__main__":
+    ProductSearchIndex().rebuild()
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from .text_index import group_counts_sql
+
+# Segment lexicons: category -> segment_type -> segment -> keywords.
+# 'default' applies to every category without its own rows in segment_lexicon.
+DEFAULT_LEXICON = {
+    "default": {
+        "target_audience": {
+            "End-User: Kids/Teens": [
+                "daughter",
+                "son",
+                "kid",
+                "child",
+                "teen",
+                "girl",
+                "boy",
+                "granddaughter",
+                "grandson",
+            ],
+            "End-User: Adults/Self": ["master bedroom", "myself", "husband", "wife", "we"],
+            "End-User: Guest": ["guest room", "visitor", "airbnb", "spare room"],
+            "End-User: College Student": ["dorm", "college", "campus", "student"],
+        },
+        "usage_occasion": {
+            "Gift": ["gift", "birthday", "christmas", "present", "xmas"],
+            "Renovation": ["remodel", "new house", "moving", "makeover"],
+            "Replacement": ["replace", "old comforter", "worn out"],
+        },
+    },
+    "tumbler": {
+        "target_audience": {
+            "End-User: Kids/Teens": ["daughter", "son", "kid", "child", "teen", "school"],
+            "End-User: Commuter": ["car", "commute", "cup holder", "drive", "office"],
+            "End-User: Fitness": ["gym", "workout", "hike", "hiking", "sport"],
+            "End-User: Coffee Drinker": ["coffee", "tea", "latte"],
+        },
+        "usage_occasion": {
+            "Gift": ["gift", "birthday", "christmas", "present", "xmas"],
+            "Travel": ["travel", "road trip", "camping", "beach"],
+            "Replacement": ["replace", "lost", "broke", "old tumbler"],
+        },
+    },
+    "book": {
+        "target_audience": {
+            "End-User: Kids/Teens": ["daughter", "son", "kid", "child", "teen", "toddler", "grandson", "granddaughter"],
+            "End-User: Parent/Teacher": ["teacher", "classroom", "homeschool", "parent"],
+            "End-User: Self": ["myself", "my own", "for me"],
+        },
+        "usage_occasion": {
+            "Gift": ["gift", "birthday", "christmas", "present", "xmas"],
+            "Bedtime": ["bedtime", "bed time", "before bed"],
+            "Learning": ["learn", "school", "reading level", "homework"],
+        },
+    },
+}
+
+SEGMENT_TYPES = ("target_audience", "usage_occasion")
+
+
+def ensure_segment_lexicon(conn):
+    """Create segment_lexicon and seed it with DEFAULT_LEXICON if it is empty."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS segment_lexicon (
+            category VARCHAR,
+            segment_type VARCHAR,
+            segment VARCHAR,
+            keyword VARCHAR,
+            PRIMARY KEY (category, segment_type, segment, keyword)
+        )
+    """)
+    if conn.execute("SELECT COUNT(*) FROM segment_lexicon").fetchone()[0] == 0:
+        rows = [
+            (cat, seg_type, seg, kw)
+            for cat, types_ in DEFAULT_LEXICON.items()
+            for seg_type, segs in types_.items()
+            for seg, kws in segs.items()
+            for kw in kws
+        ]
+        conn.executemany("INSERT OR IGNORE INTO segment_lexicon VALUES (?, ?, ?, ?)", rows)
+
+
+# Rows for a category, falling back to 'default' when the category has none. Params: [category, category]
+LEXICON_SQL = """
+    SELECT segment_type, segment, keyword
+    FROM segment_lexicon
+    WHERE category = (
+        SELECT CASE WHEN COUNT(*) > 0 THEN lower(?) ELSE 'default' END
+        FROM segment_lexicon WHERE category = lower(?)
+    )
+    ORDER BY segment_type, segment, keyword
+"""
+
+
+def lexicon_from_rows(rows) -> Dict[str, Dict[str, List[str]]]:
+    lexicon = {t: {} for t in SEGMENT_TYPES}
+    for seg_type, segment, keyword in rows:
+        lexicon.setdefault(seg_type, {}).setdefault(segment, []).append(keyword)
+    return lexicon
+
+
+def default_lexicon(category: Optional[str] = None) -> Dict[str, Dict[str, List[str]]]:
+    return DEFAULT_LEXICON.get((category or "").lower(), DEFAULT_LEXICON["default"])
+
+
+def segment_counts_sql(lexicon: Dict[str, Dict[str, List[str]]], use_tokens: bool) -> Tuple[str, List, list]:
+    """
+    One query: per star rating, how many reviews mention each segment (columns g0..gN).
+    Returns (sql, params_before_parent_asin, groups) where groups = [(segment_type, segment)].
+    Final params: params + [parent_asin].
+    """
+    groups = [(seg_type, seg) for seg_type in lexicon for seg in lexicon[seg_type]]
+    keyword_groups = {f"g{i}": lexicon[t][s] for i, (t, s) in enumerate(groups)}
+
+    if use_tokens:
+        sql = group_counts_sql(keyword_groups, by_star=True)
+        if sql:
+            return sql, [], groups
+
+    selects, params = [], []
+    for i, kws in enumerate(keyword_groups.values()):
+        selects.append(f"COUNT(*) FILTER (WHERE {' OR '.join(['text ILIKE ?'] * len(kws)) or 'FALSE'}) as g{i}")
+        params.extend([f"%{k}%" for k in kws])
+    sql = f"""
+        SELECT CAST(rating_score AS INTEGER) as star, {', '.join(selects)}
+        FROM reviews WHERE parent_asin = ?
+        GROUP BY 1
+    """
+    return sql, params, groups
+
+
+def shape_segment_counts(df: pd.DataFrame, groups) -> Dict[str, Dict[str, Dict]]:
+    """{segment_type: {segment: {"total": n, "by_star": {"5": n, ...}}}} (segments with 0 mentions dropped)."""
+    result = {t: {} for t in SEGMENT_TYPES}
+    if df is None or df.empty:
+        return result
+    for i, (seg_type, segment) in enumerate(groups):
+        by_star, total = {}, 0
+        for _, row in df.iterrows():
+            cnt = int(row[f"g{i}"] or 0)
+            total += cnt
+            if cnt > 0 and pd.notnull(row["star"]):
+                by_star[str(int(row["star"]))] = by_star.get(str(int(row["star"])), 0) + cnt
+        if total > 0:
+            result.setdefault(seg_type, {})[segment] = {"total": total, "by_star": by_star}
+    return result
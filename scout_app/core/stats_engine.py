@@ -3,6 +3,10 @@ import duckdb
 import pandas as pd
 from datetime import datetime
 from .config import Settings
+from .db_writer import get_writer
+from .detective_payloads import save_payloads
+from .segments import LEXICON_SQL, default_lexicon, lexicon_from_rows, segment_counts_sql, shape_segment_counts
+from .text_index import has_token_source
 
 
 class StatsEngine:
@@ -249,6 +253,28 @@ class StatsEngine:
         results.sort(key=lambda x: x["total_impact_vol"], reverse=True)
         return results[:20]
 
+    def _has_table(self, conn, table_name):
+        return bool(
+            self._query_one(conn, "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table_name])
+        )
+
+    def calculate_customer_segments(self, conn, asin):
+        """
+        Audience / occasion mention counts (with per-star breakdown) from the category's
+        segment lexicon. Uses the review token index when built, else ILIKE.
+        """
+        category = self._query_one(conn, "SELECT category FROM product_parents WHERE parent_asin = ?", [asin])
+        if self._has_table(conn, "segment_lexicon"):
+            lexicon = lexicon_from_rows(conn.execute(LEXICON_SQL, [category or "", category or ""]).fetchall())
+        else:
+            lexicon = default_lexicon(category)
+
+        sql, params, groups = segment_counts_sql(lexicon, use_tokens=has_token_source(conn, "text"))
+        if not groups:
+            return {}
+        df = self._query_df(conn, sql, params + [asin])
+        return shape_segment_counts(df, groups)
+
     def calculate_rating_trend(self, conn, asin):
         sql = """
             SELECT 
@@ -278,13 +304,52 @@ class StatsEngine:
             "sentiment_raw": self.calculate_sentiment_raw(conn, asin),
             "sentiment_weighted": self.calculate_sentiment_weighted(conn, asin),
             "rating_trend": self.calculate_rating_trend(conn, asin),
+            "customer_segments": self.calculate_customer_segments(conn, asin),
         }
 
+    def _save_aspect_impact(self, conn, asin, impact_rows, now):
+        """Columnar copy of sentiment_weighted (one row per aspect) for cross-product queries."""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS product_aspect_impact (
+                asin VARCHAR,
+                aspect VARCHAR,
+                est_positive INTEGER,
+                est_negative INTEGER,
+                net_impact INTEGER,
+                total_impact_vol INTEGER,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (asin, aspect)
+            )
+        """)
+        conn.execute("DELETE FROM product_aspect_impact WHERE asin = ?", [asin])
+        rows = [
+            (asin, r["aspect"], r["est_positive"], r["est_negative"], r["net_impact"], r["total_impact_vol"], now)
+            for r in (impact_rows or [])
+            if r.get("aspect")
+        ]
+        if rows:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO product_aspect_impact
+                    (asin, aspect, est_positive, est_negative, net_impact, total_impact_vol, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                rows,
+            )
+
+    def _save_detective_payloads(self, conn, asin, metrics_dict):
+        """Output stage: Detective SWOT / DNA tool payloads built from the fresh metrics."""
+        try:
+            save_payloads(conn, asin, metrics_dict)
+        except Exception as e:
+            print(f"⚠️ [StatsEngine] Detective payloads skipped for {asin}: {e}")
+
     def save_to_db(self, asin, metrics_dict, conn=None):
-        """Upsert metrics into product_stats table."""
+        """Upsert metrics into product_stats table (+ product_aspect_impact rows, Detective payloads)."""
         try:
             json_str = json.dumps(metrics_dict)
             now = datetime.now()
+            impact_rows = metrics_dict.get("sentiment_weighted", [])
 
             sql_stats = """
                 INSERT INTO product_stats (asin, last_updated, metrics_json)
@@ -296,9 +361,13 @@ class StatsEngine:
 
             if conn:
                 conn.execute(sql_stats, [asin, now, json_str])
+                self._save_aspect_impact(conn, asin, impact_rows, now)
+                self._save_detective_payloads(conn, asin, metrics_dict)
             else:
                 with duckdb.connect(self.db_path) as conn:
                     conn.execute(sql_stats, [asin, now, json_str])
+                    self._save_aspect_impact(conn, asin, impact_rows, now)
+                    self._save_detective_payloads(conn, asin, metrics_dict)
         except Exception as e:
             # Swallow error to prevent crash on Foreign Key constraints
             pass
@@ -312,4 +381,16 @@ class StatsEngine:
             with duckdb.connect(self.db_path) as conn:
                 data = self._calculate_logic(conn, asin)
                 self.save_to_db(asin, data, conn=conn)
-        return data
\ No newline at end of file
+        return data
+
+    def recalc_via_writer(self, asins):
+        """
+        Recalc through the process DB writer, one command per ASIN (miner / janitor in the
+        API process): other queued writes interleave instead of waiting for the whole set.
+        """
+        writer = get_writer()
+        for asin in asins:
+            try:
+                writer.run(lambda conn, a=asin: self.calculate_and_save(a, conn=conn))
+            except Exception as e:
+                print(f"⚠️ [StatsEngine] Recalc skipped for {asin}: {e}")
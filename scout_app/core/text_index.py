@@ -0,0 +1,184 @@
+import re
+import duckdb
+import pandas as pd
+from typing import Dict, List, Optional, Sequence
+from .config import Settings
+
+# Inverted token index over reviews.text ('text') and review_tags.quote ('quote').
+# One posting = (parent_asin, review_id, token, source), tokens deduplicated per review.
+# Postings are appended sorted by (parent_asin, token) so row-group zone maps prune the
+# `parent_asin = ?` lookups instead of scanning the whole table.
+TOKEN_SPLIT = "[^a-z0-9]+"
+MIN_TOKEN_LEN = 2
+
+
+def ensure_review_tokens(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_tokens (
+            parent_asin VARCHAR,
+            review_id VARCHAR,
+            token VARCHAR,
+            source VARCHAR
+        );
+        CREATE INDEX IF NOT EXISTS idx_review_tokens_review ON review_tokens (review_id);
+    """)
+
+
+def has_review_tokens(conn) -> bool:
+    res = conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'review_tokens'"
+    ).fetchone()
+    return bool(res and res[0])
+
+
+# Per source: the table can exist with one source built and the other never built
+TOKEN_SOURCE_SQL = "SELECT EXISTS(SELECT 1 FROM review_tokens WHERE source = ?)"
+
+
+def has_token_source(conn, source: str) -> bool:
+    """True once `source` ('text' / 'quote') has had its full first build."""
+    return has_review_tokens(conn) and bool(conn.execute(TOKEN_SOURCE_SQL, [source]).fetchone()[0])
+
+
+def _index(conn, source: str, review_ids: Optional[List[str]]) -> int:
+    if review_ids is not None and not has_token_source(conn, source):
+        review_ids = None  # First build of this source must be complete
+    ensure_review_tokens(conn)
+
+    if source == "text":
+        src_sql = "SELECT parent_asin, review_id, text as body FROM reviews WHERE text IS NOT NULL"
+    else:
+        src_sql = "SELECT parent_asin, review_id, quote as body FROM review_tags WHERE quote IS NOT NULL"
+
+    if review_ids is None:
+        conn.execute("DELETE FROM review_tokens WHERE source = ?", [source])
+        scope = ""
+    else:
+        review_ids = [r for r in dict.fromkeys(review_ids) if r]
+        if not review_ids:
+            return 0
+        conn.register("temp_token_scope", pd.DataFrame({"review_id": review_ids}))
+        conn.execute(
+            "DELETE FROM review_tokens WHERE source = ? AND review_id IN (SELECT review_id FROM temp_token_scope)",
+            [source],
+        )
+        scope = "WHERE review_id IN (SELECT review_id FROM temp_token_scope)"
+
+    conn.execute(
+        f"""
+        INSERT INTO review_tokens (parent_asin, review_id, token, source)
+        SELECT DISTINCT parent_asin, review_id, token, ?
+        FROM (
+            SELECT parent_asin, review_id, unnest(regexp_split_to_array(lower(body), '{TOKEN_SPLIT}')) as token
+            FROM ({src_sql}) {scope}
+        )
+        WHERE length(token) >= {MIN_TOKEN_LEN}
+        ORDER BY parent_asin, token
+    """,
+        [source],
+    )
+
+    if review_ids is not None:
+        conn.unregister("temp_token_scope")
+        return len(review_ids)
+    return conn.execute("SELECT COUNT(DISTINCT review_id) FROM review_tokens WHERE source = ?", [source]).fetchone()[0]
+
+
+def index_review_text(conn, review_ids: Optional[List[str]] = None) -> int:
+    """(Re)index reviews.text for the given reviews (None = everything)."""
+    return _index(conn, "text", review_ids)
+
+
+def index_tag_quotes(conn, review_ids: Optional[List[str]] = None) -> int:
+    """(Re)index review_tags.quote for the given reviews (None = everything)."""
+    return _index(conn, "quote", review_ids)
+
+
+# --- QUERY ---
+def tokenize(keyword: str) -> List[str]:
+    return [t for t in re.split(TOKEN_SPLIT, (keyword or "").lower()) if len(t) >= MIN_TOKEN_LEN]
+
+
+def _lit(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _forms(token: str) -> List[str]:
+    """Surface forms a keyword token matches (exact + simple plurals)."""
+    return [token, token + "s", token + "es"]
+
+
+def _hits_cte(keyword_lists: Sequence[Sequence[str]], sources: Sequence[str]):
+    """
+    Postings-only plan: hash-join the parent's postings with the keyword forms, then one
+    row per review with a boolean flag per distinct token (t0..tN). Param: parent_asin.
+    Returns (cte_sql, {token: flag_column}) or (None, {}) if no usable token.
+    """
+    tokens = list(dict.fromkeys(t for kws in keyword_lists for kw in kws for t in tokenize(kw)))
+    if not tokens:
+        return None, {}
+    flags = {t: f"t{i}" for i, t in enumerate(tokens)}
+    forms = ", ".join(f"({_lit(f)}, {_lit(flags[t])})" for t in tokens for f in _forms(t))
+    src = ", ".join(_lit(s) for s in sources)
+    cols = ", ".join(f"bool_or(kw.flag = '{flags[t]}') as {flags[t]}" for t in tokens)
+    cte = f"""
+        SELECT rt.review_id, {cols}
+        FROM review_tokens rt
+        JOIN (VALUES {forms}) kw(form, flag) ON rt.token = kw.form
+        WHERE rt.parent_asin = ? AND rt.source IN ({src})
+        GROUP BY rt.review_id
+    """
+    return cte, flags
+
+
+def _keywords_expr(keywords: Sequence[str], flags: Dict[str, str]) -> str:
+    """OR over keywords; a multi-word keyword needs all its words in the same review."""
+    ors = []
+    for kw in keywords:
+        tokens = tokenize(kw)
+        if tokens:
+            ors.append("(" + " AND ".join(flags[t] for t in tokens) + ")")
+    return "(" + " OR ".join(ors) + ")" if ors else "FALSE"
+
+
+def group_counts_sql(
+    groups: Dict[str, Sequence[str]], sources: Sequence[str] = ("text",), by_star: bool = False
+) -> Optional[str]:
+    """
+    One query counting matching reviews per keyword group (columns g0..gN in `groups` order).
+    `by_star=True` adds a `star` column (reviews.rating_score) and one row per star.
+    Params: [parent_asin].
+    """
+    cte, flags = _hits_cte(list(groups.values()), sources)
+    if not cte:
+        return None
+    selects = [f"COUNT(*) FILTER (WHERE {_keywords_expr(kws, flags)}) as g{i}" for i, kws in enumerate(groups.values())]
+    if by_star:
+        return f"""
+            WITH h AS ({cte})
+            SELECT CAST(r.rating_score AS INTEGER) as star, {', '.join(selects)}
+            FROM h JOIN reviews r ON r.review_id = h.review_id
+            GROUP BY 1
+        """
+    return f"WITH h AS ({cte}) SELECT {', '.join(selects)} FROM h"
+
+
+def matching_reviews_sql(keywords: Sequence[str], sources: Sequence[str] = ("text", "quote")) -> Optional[str]:
+    """Subquery returning review_ids of a parent matching any keyword. Param: parent_asin."""
+    cte, flags = _hits_cte([keywords], sources)
+    if not cte:
+        return None
+    return f"SELECT review_id FROM ({cte}) WHERE {_keywords_expr(keywords, flags)}"
+
+
+def rebuild_all(db_path=None):
+    """Full rebuild against a DB file (CLI entry point)."""
+    db_path = db_path or str(Settings.get_active_db_path())
+    with duckdb.connect(db_path) as conn:
+        n_text = index_review_text(conn)
+        n_quote = index_tag_quotes(conn)
+    print(f"🔤 [TextIndex] Indexed {n_text} reviews / {n_quote} tagged reviews on {db_path}")
+
+
+if __name__ == "__main__":
+    rebuild_all()
@@ -0,0 +1,288 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List
+
+from .config import Settings
+from .db_writer import active_write_lock, write_connection
+from .ingest import DataIngester
+from .miner import AIMiner
+from .normalizer import TagNormalizer
+from .parent_finder import get_parent_finder
+from .product_details import run_apify_product_details
+from .scraper import AmazonScraper
+from .stats_engine import StatsEngine
+
+# Background job bodies run by the worker executor (core/executor.py).
+# They live here, not in worker_api.py, so process-pool children can import them
+# without building the FastAPI app. JOBS is the job reporter of the current process:
+# the JobRegistry in the API process, a JobEvents proxy inside pool children.
+
+LOG_FILE = "scout_app/logs/worker.log"
+RECALC_CHUNK = 10  # ASINs per write connection in recalc jobs (lock released between chunks)
+logger = logging.getLogger("Gatekeeper")
+JOBS = None
+
+
+def setup_logging():
+    """worker.log + console handlers on the Gatekeeper logger (once per process)."""
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    fh = logging.FileHandler(LOG_FILE)
+    fh.setLevel(logging.INFO)
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+def set_job_reporter(reporter):
+    global JOBS
+    JOBS = reporter
+
+
+def init_pool_child(reporter):
+    """Process-pool initializer: logging + job events forwarded to the API process."""
+    setup_logging()
+    set_job_reporter(reporter)
+
+
+def run_miner_task(limit: int, job_id: str):
+    logger.info(f"🚀 [Miner] Starting Job {job_id} (Limit: {limit})...")
+    try:
+        JOBS.start(job_id)
+        miner = AIMiner()
+        miner.run_live(limit=limit, progress_cb=JOBS.callback(job_id))
+        JOBS.finish(job_id)
+        logger.info(f"✅ [Miner] Job Complete.")
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Miner] Failed: {e}")
+
+def run_parent_finder_task(asins: List[str], category: str, job_id: str):
+    logger.info(f"🔍 [ParentFinder] Starting Job {job_id}: {asins} (Category: {category or 'Automatic'})")
+    try:
+        JOBS.start(job_id, total=len(asins))
+        finder = get_parent_finder()
+        before = dict(finder.stats)
+        results = finder.run(asins, category, progress_cb=JOBS.callback(job_id))
+        found = sum(1 for p in results.values() if p)
+        JOBS.finish(
+            job_id,
+            {"found": found, "not_found": len(asins) - found, "parents": results, "fetch": finder.report(since=before)},
+        )
+        logger.info(f"✅ [ParentFinder] Job Complete ({found}/{len(asins)} mapped).")
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [ParentFinder] Failed: {e}")
+
+def run_apify_details_task(asins: List[str], category: str, job_id: str):
+    logger.info(f"🎭 [ApifyDetails] Starting Job {job_id}: {asins} (Category: {category})")
+    try:
+        JOBS.start(job_id, total=len(asins))
+        fetched = run_apify_product_details(asins, category, progress_cb=JOBS.callback(job_id))
+        if fetched is None:
+            JOBS.fail(job_id, "Apify details run failed (see worker log)")
+            return
+        JOBS.finish(job_id, {"fetched": fetched})
+        logger.info(f"✅ [ApifyDetails] Job Complete ({fetched} items).")
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [ApifyDetails] Failed: {e}")
+
+def run_janitor_task(job_id: str):
+    logger.info(f"🧹 [Janitor] Starting Job {job_id}...")
+    try:
+        JOBS.start(job_id)
+        janitor = TagNormalizer()
+        janitor.run_live(progress_cb=JOBS.callback(job_id))
+        JOBS.finish(job_id)
+        logger.info(f"✅ [Janitor] Job Complete.")
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Janitor] Failed: {e}")
+
+def run_scraper_task(asins: List[str], auto_ingest: bool, job_id: str):
+    logger.info(f"🕷️ [Scraper] Starting deep scrape for {len(asins)} ASINs (Job {job_id})")
+    ingest_jobs = []
+
+    def queue_ingest(file_path: Path):
+        # Hand each finished dataset to ingest right away (ingest jobs run one at a time)
+        from .executor import get_executor
+
+        ingest_job = JOBS.create("ingest", {"file_path": str(file_path), "source_job": job_id})
+        get_executor().submit("ingest", run_ingest_task, str(file_path), job_id=ingest_job)
+        ingest_jobs.append(ingest_job)
+        logger.info(f"📥 [Scraper] Queued ingest job {ingest_job} for {file_path.name}")
+
+    try:
+        JOBS.start(job_id)
+        scraper = AmazonScraper()
+        files = scraper.run_deep_scrape(
+            asins, progress_cb=JOBS.callback(job_id), on_file=queue_ingest if auto_ingest else None
+        )
+        if files:
+            JOBS.finish(job_id, {"files": [str(f) for f in files], "ingest_jobs": ingest_jobs})
+            logger.info(f"✅ [Scraper] {len(files)} files saved: {[f.name for f in files]}")
+            if not auto_ingest:
+                logger.info(f"👉 [Action Required] Go to Admin Console -> Staging Files to verify & ingest.")
+        else:
+            JOBS.fail(job_id, "No data returned from Apify")
+            logger.warning("⚠️ [Scraper] No data returned from Apify.")
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Scraper] Failed: {e}")
+
+def run_ingest_task(file_path: str, job_id: str):
+    logger.info(f"📥 [Ingest] Starting ingestion for: {file_path} (Job {job_id})")
+    try:
+        JOBS.start(job_id)
+        from pathlib import Path
+        path_obj = Path(file_path).resolve()
+        path_str = str(path_obj)
+        
+        # Controlled Whitelist: staging_data OR upload_batch_ folders
+        allowed = ["staging_data", "upload_batch_"]
+        is_allowed = any(tag in path_str for tag in allowed)
+        
+        if not is_allowed:
+            JOBS.fail(job_id, "Security Block: path is not in an allowed directory")
+            logger.error(f"❌ [Ingest] Security Block: Path '{path_str}' is not in an allowed directory.")
+            return
+
+        ingester = DataIngester()
+        result = ingester.ingest_file(path_obj, progress_cb=JOBS.callback(job_id))
+        if "error" in result:
+            JOBS.fail(job_id, result["error"])
+            logger.error(f"❌ [Ingest] Failed: {result['error']}")
+        else:
+            logger.info(f"✅ [Ingest] Success! Total: {result.get('total_rows')}. New Reviews: {result.get('inserted_rows')}")
+            
+            # --- POST-INGEST MAINTENANCE (Prevent 5GB Bloat) ---
+            try:
+                logger.info(f"🧹 [Ingest] Reclaiming space (Vacuum) on {Settings.get_active_db_path()}...")
+                with write_connection() as conn:
+                    conn.execute("CHECKPOINT; VACUUM;")
+                logger.info("✨ [Ingest] DB Compaction complete.")
+            except Exception as v_err:
+                logger.warning(f"⚠️ Vacuum warning: {v_err}")
+            JOBS.finish(job_id, result)
+
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Ingest] Critical Error: {e}")
+
+
+def _recalc_in_chunks(engine: StatsEngine, asins: List[str], job_id: str, pause: float = 0.0):
+    """
+    Recalc ASINs RECALC_CHUNK at a time, each chunk on its own short write connection:
+    the active DB lock is released between chunks so queued DBWriter commands
+    (scrape_queue endpoints, miner tags) are not held up for the whole set.
+    """
+    for start in range(0, len(asins), RECALC_CHUNK):
+        chunk = asins[start : start + RECALC_CHUNK]
+        with write_connection() as conn:
+            for a in chunk:
+                engine.calculate_and_save(a, conn=conn)
+        for i, a in enumerate(chunk, start + 1):
+            JOBS.progress(job_id, i, len(asins), a)
+        if pause:
+            time.sleep(pause)  # Keep CPU cool between chunks, outside the lock
+
+
+def run_recalc_task(asin: str, job_id: str):
+    logger.info(f"📊 [Recalc] Starting task {job_id} (Target: {asin or 'SMART GLOBAL'})...")
+    try:
+        JOBS.start(job_id)
+        engine = StatsEngine()
+
+        if asin:
+            # Support multiple ASINs separated by comma
+            target_asins = [a.strip() for a in asin.split(',') if a.strip()]
+            logger.info(f"📊 [Recalc] Processing {len(target_asins)} targeted ASINs...")
+            _recalc_in_chunks(engine, target_asins, job_id)
+            JOBS.finish(job_id, {"asins": len(target_asins)})
+            logger.info(f"✅ [Recalc] Completed for {len(target_asins)} ASINs")
+        else:
+            # SMART GLOBAL RECALC: Only target ASINs with fresh reviews
+            query = """
+                SELECT DISTINCT r.parent_asin 
+                FROM reviews r
+                LEFT JOIN product_stats ps ON r.parent_asin = ps.asin
+                LEFT JOIN (
+                    SELECT parent_asin, MAX(created_at) as max_created 
+                    FROM review_tags 
+                    GROUP BY 1
+                ) rt ON r.parent_asin = rt.parent_asin
+                WHERE r.mining_status = 'COMPLETED'
+                AND (
+                    ps.last_updated IS NULL 
+                    OR r.ingested_at >= ps.last_updated
+                    OR rt.max_created >= ps.last_updated
+                )
+            """
+            with write_connection() as conn:
+                asins_to_calc = [r[0] for r in conn.execute(query).fetchall() if r[0]]
+
+            if not asins_to_calc:
+                JOBS.finish(job_id, {"asins": 0}, message="Everything is already up to date")
+                logger.info("✨ [Recalc] Everything is already up to date.")
+                return
+
+            logger.info(f"📊 [Recalc] Processing {len(asins_to_calc)} ASINs with new data...")
+            _recalc_in_chunks(engine, asins_to_calc, job_id, pause=0.05)
+            JOBS.finish(job_id, {"asins": len(asins_to_calc)})
+            logger.info(f"✅ [Recalc] Smart Global task complete.")
+
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Recalc] Failed: {e}")
+
+
+def run_dedup_task(job_id: str):
+    logger.info("🧹 [Dedup] Starting Smart Cleanup...")
+    try:
+        JOBS.start(job_id)
+        import duckdb
+        import shutil
+
+        # Copy -> swap under the active DB write lock (queued writes follow the swap).
+        # Paths are resolved under the lock: an ingest may have swapped while we waited.
+        with active_write_lock() as active_path:
+            standby_path = Settings.get_standby_db_path()
+            # 1. Sync
+            shutil.copy(active_path, standby_path)
+
+            # 2. Clean Standby
+            with duckdb.connect(str(standby_path)) as conn:
+                conn.execute("""
+                    DELETE FROM review_tags 
+                    WHERE tag_id IN (
+                        SELECT tag_id FROM (
+                            SELECT 
+                                rt.tag_id,
+                                ROW_NUMBER() OVER (
+                                    PARTITION BY rt.review_id, rt.quote, rt.sentiment 
+                                    ORDER BY (CASE WHEN am.standard_aspect IS NOT NULL THEN 1 ELSE 0 END) DESC, rt.created_at DESC
+                                ) as rank
+                            FROM review_tags rt
+                            LEFT JOIN aspect_mapping am ON rt.aspect = am.raw_aspect
+                        ) WHERE rank > 1
+                    )
+                """)
+
+            # 3. Swap
+            Settings.swap_db()
+        JOBS.finish(job_id, message=f"Swapped to {os.path.basename(standby_path)}")
+        logger.info(f"✅ [Dedup] Cleanup complete. Swapped to {os.path.basename(standby_path)}")
+
+    except Exception as e:
+        JOBS.fail(job_id, e)
+        logger.error(f"❌ [Dedup] Failed: {e}")
@@ -10,6 +10,7 @@ import streamlit as st
 
 # Add root to sys.path to find core
 sys.path.append(str(Path(__file__).resolve().parent.parent))
+from core.answer_cache import AnswerCache
 from core.config import Settings
 
 # --- Configuration ---
@@ -44,6 +45,7 @@ BASE_DIR = Path(__file__).parent.parent.parent
 LOG_FILE = BASE_DIR / "scout_app/logs/worker.log"
 STAGING_DIR = BASE_DIR / "staging_data"
 WORKER_URL = os.getenv("WORKER_URL", "http://worker:8000")
+JOBS_POLL_SECONDS = 3
 
 
 # --- DB Helpers (Direct for Admin) ---
@@ -93,13 +95,18 @@ def query_df(sql, params=None):
         return pd.DataFrame()
 
 
-def execute_sql(sql, params=None):
+def set_queue_status(status, request_ids=None, asins=None, only_from=None):
+    """scrape_queue writes go through the worker's single DB writer (no write lock from the UI)."""
     try:
-        with duckdb.connect(get_db_path(), read_only=False) as conn:
-            conn.execute(sql, params)
+        res = requests.post(
+            f"{WORKER_URL}/scrape_queue/status",
+            json={"status": status, "request_ids": request_ids or [], "asins": asins or [], "only_from": only_from},
+            timeout=30,
+        )
+        res.raise_for_status()
         return True
     except Exception as e:
-        st.error(f"SQL Error: {e}")
+        st.error(f"Queue Update Error: {e}")
         return False
 
 
@@ -114,11 +121,40 @@ def tail_log(lines=30):
         return ["Error reading log file."]
 
 
+@st.fragment(run_every=JOBS_POLL_SECONDS)
+def render_jobs_panel():
+    """Polls GET /jobs (worker job registry) instead of tailing worker.log."""
+    try:
+        jobs = requests.get(f"{WORKER_URL}/jobs", params={"limit": 30}, timeout=5).json().get("jobs", [])
+    except Exception as e:
+        st.error(f"Worker offline: {e}")
+        return
+    if not jobs:
+        st.info("No jobs yet.")
+        return
+
+    running = [j for j in jobs if j["state"] in ("QUEUED", "RUNNING")]
+    for j in running:
+        pct = (j.get("progress_pct") or 0) / 100
+        label = f"⏳ {j['job_type']} `{j['job_id']}` — {j['progress_done'] or 0}/{j['progress_total'] or '?'}"
+        st.progress(min(1.0, pct), text=f"{label} {j.get('message') or ''}")
+
+    df_jobs = pd.DataFrame(jobs)
+    df_jobs["progress"] = df_jobs.get("progress_pct", pd.Series(dtype=float)).fillna(0)
+    cols = ["job_id", "job_type", "state", "progress", "message", "error", "created_at", "duration_s"]
+    st.dataframe(
+        df_jobs[[c for c in cols if c in df_jobs.columns]],
+        use_container_width=True,
+        hide_index=True,
+        column_config={"progress": st.column_config.ProgressColumn("Progress", min_value=0, max_value=100, format="%.0f%%")},
+    )
+
+
 def list_staging_files():
     if not STAGING_DIR.exists():
         return []
     return sorted(
-        list(STAGING_DIR.glob("*.xlsx")) + list(STAGING_DIR.glob("*.jsonl")),
+        list(STAGING_DIR.glob("*.parquet")) + list(STAGING_DIR.glob("*.xlsx")) + list(STAGING_DIR.glob("*.jsonl")),
         key=os.path.getmtime,
         reverse=True,
     )
@@ -175,15 +211,13 @@ with tab_scrape:
         
         if st.button("🚀 Approve Selected", type="primary"):
             selected = edited_df[edited_df["Select"] == True]
-            for _, row in selected.iterrows():
-                execute_sql("UPDATE scrape_queue SET status = 'READY_TO_SCRAPE' WHERE request_id = ?", [row["request_id"]])
+            set_queue_status("READY_TO_SCRAPE", request_ids=selected["request_id"].tolist())
             st.success(f"Approved {len(selected)} requests.")
             st.rerun()
             
         if st.button("❌ Reject Selected", type="secondary"):
             selected = edited_df[edited_df["Select"] == True]
-            for _, row in selected.iterrows():
-                execute_sql("UPDATE scrape_queue SET status = 'REJECTED' WHERE request_id = ?", [row["request_id"]])
+            set_queue_status("REJECTED", request_ids=selected["request_id"].tolist())
             st.warning(f"Rejected {len(selected)} requests.")
             st.rerun()
 
@@ -215,11 +249,15 @@ with tab_scrape:
                 st.error("⛔ Please enter a **Target Category** before launching.")
             elif pf_asins.strip():
                 asins = [a.strip() for a in pf_asins.replace("\n", ",").split(",") if a.strip()]
-                requests.post(f"{WORKER_URL}/trigger/find_parents", json={"asins": asins, "category": target_cat})
-                # Sync status in queue
-                for asin in asins:
-                    execute_sql("UPDATE scrape_queue SET status = 'IN_PROGRESS' WHERE asin = ? AND status = 'READY_TO_SCRAPE'", [asin])
-                st.success(f"Parent Finder dispatched for {len(asins)} items in category '{target_cat}'!")
+                # The worker flips READY_TO_SCRAPE -> IN_PROGRESS itself before the job starts
+                try:
+                    res = requests.post(
+                        f"{WORKER_URL}/trigger/find_parents", json={"asins": asins, "category": target_cat}, timeout=30
+                    )
+                    res.raise_for_status()
+                    st.success(f"Parent Finder dispatched for {len(asins)} items in category '{target_cat}'!")
+                except Exception as e:
+                    st.error(f"Parent Finder Error: {e}")
             
     with c2:
         st.subheader("🎭 Apify Detail Scraper")
@@ -259,11 +297,12 @@ with tab_scrape:
             st.info("No parents found without reviews.")
 
     asins_input = st.text_area("Enter ASINs for Reviews (Legacy JSON flow)", height=100, key="rev_input", value=st.session_state.get("rev_input", ""))
+    auto_ingest = st.checkbox("Auto-ingest each finished run (skip Staging review)", value=False)
     if st.button("Launch Review Scraper"):
         if asins_input.strip():
             asins = [a.strip() for a in asins_input.replace("\n", ",").split(",") if a.strip()]
-            requests.post(f"{WORKER_URL}/trigger/scrape", json={"asins": asins})
-            st.success("Scraper started!")
+            res = requests.post(f"{WORKER_URL}/trigger/scrape", json={"asins": asins, "auto_ingest": auto_ingest})
+            st.success(f"Scraper started! (job `{res.json().get('job_id')}`)")
 
 # --- TAB 2: STAGING AREA ---
 with tab_staging:
@@ -290,7 +329,7 @@ with tab_ingest:
             try:
                 res = requests.post(f"{WORKER_URL}/trigger/ingest", json={"file_path": str(selected_file)})
                 if res.status_code == 202:
-                    st.success("Ingestion dispatched!")
+                    st.success(f"Ingestion dispatched! (job `{res.json().get('job_id')}`)")
                 else:
                     st.error(res.text)
             except:
@@ -306,13 +345,13 @@ with tab_ai:
         st.subheader("⛏️ Aspect Miner")
         limit = st.number_input("Review Limit", 10, 5000, 50)
         if st.button("Start Miner"):
-            requests.post(f"{WORKER_URL}/trigger/miner", params={"limit": limit})
-            st.success("Miner started")
+            res = requests.post(f"{WORKER_URL}/trigger/miner", params={"limit": limit})
+            st.success(f"Miner started (job `{res.json().get('job_id')}`)")
     with c2:
         st.subheader("🧹 Tag Janitor")
         if st.button("Start Janitor"):
-            requests.post(f"{WORKER_URL}/trigger/janitor")
-            st.success("Janitor started")
+            res = requests.post(f"{WORKER_URL}/trigger/janitor")
+            st.success(f"Janitor started (job `{res.json().get('job_id')}`)")
 
 # --- TAB 5: STATS ENGINE ---
 with tab_stats:
@@ -320,8 +359,23 @@ with tab_stats:
     target_asin = st.text_input("Target ASIN (Optional)", placeholder="B0...")
     if st.button("🔄 Recalculate Stats"):
         params = {"asin": target_asin} if target_asin else {}
-        requests.post(f"{WORKER_URL}/trigger/recalc", params=params)
-        st.success("Stats recalc started")
+        res = requests.post(f"{WORKER_URL}/trigger/recalc", params=params)
+        st.success(f"Stats recalc started (job `{res.json().get('job_id')}`)")
+
+    st.subheader("⚡ Strategy Hub Answer Cache")
+    answer_cache = AnswerCache()
+    cache_stats = answer_cache.get_stats()
+    if cache_stats.empty:
+        st.info("No quick-action cache traffic yet.")
+    else:
+        total_hits, total_misses = int(cache_stats["hits"].sum()), int(cache_stats["misses"].sum())
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Hits", total_hits)
+        c2.metric("Misses", total_misses)
+        c3.metric("Hit rate", f"{total_hits * 100 / max(1, total_hits + total_misses):.1f}%")
+        st.dataframe(cache_stats, use_container_width=True, hide_index=True)
+    if st.button(f"🧹 Purge expired answers (TTL {Settings.ANSWER_CACHE_TTL_HOURS:g}h)"):
+        st.success(f"Removed {answer_cache.purge_expired()} expired answers")
 
 # --- TAB 6: ORCHESTRATOR ---
 with tab_orch:
@@ -437,11 +491,11 @@ with tab_logs:
                 st.error(f"Connection Error: {e}")
 
     st.divider()
-    st.header("📜 Worker Event History")
-    st.caption("Persistent log of all background activities (Scraping, Ingesting, Mining).")
-    if st.button("🔄 Refresh History"):
-        st.rerun()
-
-    logs = tail_log(50)
-    log_text = "".join(logs)
-    st.code(log_text, language="bash", line_numbers=True)
+    st.header("📜 Worker Jobs")
+    st.caption("Job registry of all background activities (Scraping, Ingesting, Mining). Auto-refreshes while jobs run.")
+    render_jobs_panel()
+
+    with st.expander("📟 Raw worker.log (last 50 lines)"):
+        logs = tail_log(50)
+        log_text = "".join(logs)
+        st.code(log_text, language="bash", line_numbers=True)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
@@ -9,6 +9,7 @@ import pandas as pd
 
 from scout_app.core.social_scraper import SocialScraper
 from scout_app.core.config import Settings
+from scout_app.core.executor import get_executor
 from scout_app.core.wallet import WalletGuard
 from scout_app.core.logger import log_event
 
@@ -182,7 +183,7 @@ def estimate_cost_endpoint(req: CostCheckRequest):
     }
 
 @router.post("/trigger", status_code=202)
-def trigger_social_scrape(req: SocialRequest, background_tasks: BackgroundTasks):
+def trigger_social_scrape(req: SocialRequest):
     if not req.keywords:
         raise HTTPException(status_code=400, detail="Keywords required.")
     
@@ -195,8 +196,8 @@ def trigger_social_scrape(req: SocialRequest, background_tasks: BackgroundTasks)
     if not wallet.check_funds(req.user_id, est_cost):
         raise HTTPException(status_code=402, detail=f"Insufficient funds. Estimated cost: ${est_cost}")
 
-    # 3. Queue Task
-    background_tasks.add_task(run_social_task, req, est_cost)
+    # 3. Queue Task (IO pool)
+    get_executor().submit("social", run_social_task, req, est_cost)
     
     return {
         "status": "accepted", 
@@ -206,7 +207,7 @@ def trigger_social_scrape(req: SocialRequest, background_tasks: BackgroundTasks)
     }
 
 @router.post("/trigger_comments", status_code=202)
-def trigger_comment_scrape(req: CommentRequest, background_tasks: BackgroundTasks):
+def trigger_comment_scrape(req: CommentRequest):
     if not req.video_urls:
         raise HTTPException(status_code=400, detail="Video URLs required.")
     
@@ -219,8 +220,8 @@ def trigger_comment_scrape(req: CommentRequest, background_tasks: BackgroundTask
     if not wallet.check_funds(req.user_id, est_cost):
         raise HTTPException(status_code=402, detail=f"Insufficient funds. Estimated cost: ${est_cost}")
 
-    # 3. Queue Task
-    background_tasks.add_task(run_comment_task, req, est_cost)
+    # 3. Queue Task (IO pool)
+    get_executor().submit("social", run_comment_task, req, est_cost)
     
     return {
         "status": "accepted", 
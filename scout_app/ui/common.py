@@ -1,9 +1,10 @@
 import json
+import os
 import duckdb
 import pandas as pd
+import requests
 import streamlit as st
 import sys
-import uuid
 from pathlib import Path
 import time
 import functools
@@ -12,6 +13,9 @@ import functools
 # Assuming this file is in scout_app/ui/common.py, root is ../../
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 from scout_app.core.config import Settings
+from scout_app.core.parent_cache import get_cached_parents
+
+WORKER_URL = os.getenv("WORKER_URL", "http://worker:8000")
 
 
 def time_it(func):
@@ -159,10 +163,54 @@ def get_precalc_stats(asin):
     return None
 
 
-@st.cache_data
-def get_evidence_data(asin: str):
-    """Fetch evidence quotes with robust mapping and deduplication."""
-    ev_query = """
+EVIDENCE_PAGE_SIZE = 50
+
+
+@st.cache_data(ttl=600)
+def get_evidence_aspects(asin: str):
+    """List the (standardized) aspects that have evidence quotes, for the explorer filter."""
+    sql = """
+        SELECT DISTINCT COALESCE(am.standard_aspect, rt.aspect) as aspect
+        FROM review_tags rt
+        LEFT JOIN aspect_mapping am ON lower(trim(rt.aspect)) = lower(trim(am.raw_aspect))
+        WHERE rt.parent_asin = ? AND rt.quote IS NOT NULL
+        ORDER BY 1
+    """
+    df = query_df(sql, [asin])
+    return df["aspect"].dropna().tolist() if not df.empty else []
+
+
+@st.cache_data(ttl=300)
+def get_evidence_page(
+    asin: str, aspect=None, sentiment=None, keyword=None, cursor=None, page_size=EVIDENCE_PAGE_SIZE
+):
+    """
+    Fetch ONE page of evidence quotes using keyset pagination.
+    Order is (sentiment DESC, category ASC, tag_id ASC); `cursor` is the key of the last row
+    of the previous page. Returns (df_page, next_cursor) - next_cursor is None on the last page.
+    """
+    clauses = ["rt.parent_asin = ?"]
+    params = [asin]
+
+    if aspect:
+        clauses.append("(am.standard_aspect = ? OR (am.standard_aspect IS NULL AND rt.aspect = ?))")
+        params.extend([aspect, aspect])
+    if sentiment:
+        clauses.append("rt.sentiment = ?")
+        params.append(sentiment)
+    if keyword:
+        clauses.append("rt.quote ILIKE ?")
+        params.append(f"%{keyword}%")
+    if cursor:
+        c_sent, c_cat, c_tag = cursor
+        clauses.append("""(
+            COALESCE(rt.sentiment, '') < ?
+            OR (COALESCE(rt.sentiment, '') = ? AND COALESCE(am.category, rt.category, '') > ?)
+            OR (COALESCE(rt.sentiment, '') = ? AND COALESCE(am.category, rt.category, '') = ? AND rt.tag_id > CAST(? AS UUID))
+        )""")
+        params.extend([c_sent, c_sent, c_cat, c_sent, c_cat, c_tag])
+
+    ev_query = f"""
         SELECT 
             COALESCE(am.category, rt.category) as "Category",
             CASE 
@@ -170,14 +218,25 @@ def get_evidence_data(asin: str):
                 ELSE '⏳ ' || rt.aspect 
             END as "Aspect (Status)",
             rt.sentiment as "Sentiment", 
-            rt.quote as "Evidence Quote"
+            rt.quote as "Evidence Quote",
+            COALESCE(rt.sentiment, '') as _k_sent,
+            COALESCE(am.category, rt.category, '') as _k_cat,
+            CAST(rt.tag_id AS VARCHAR) as _k_tag
         FROM review_tags rt
         LEFT JOIN aspect_mapping am ON lower(trim(rt.aspect)) = lower(trim(am.raw_aspect))
-        WHERE rt.parent_asin = ?
-        ORDER BY rt.sentiment DESC, "Category" ASC
-        LIMIT 300
+        WHERE {" AND ".join(clauses)}
+        ORDER BY _k_sent DESC, _k_cat ASC, rt.tag_id ASC
+        LIMIT {int(page_size) + 1}
     """
-    return query_df(ev_query, [asin])
+    df = query_df(ev_query, params)
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        next_cursor = (last["_k_sent"], last["_k_cat"], last["_k_tag"])
+
+    return df.drop(columns=["_k_sent", "_k_cat", "_k_tag"]), next_cursor
 
 
 @st.cache_data(ttl=3600)
@@ -223,24 +282,204 @@ def get_niche_benchmark(niche: str):
 
 
 # --- NEW: Optimized ASIN List Fetcher ---
-@st.cache_data(ttl=600)
-def get_all_product_metadata(cache_key=None):
-    """Fetch clean metadata from product_parents with all variations for smart search."""
-    sql = """
+# --- Showdown (Precomputed competitor shortlist) ---
+@st.cache_data(ttl=3600)
+def get_competitor_shortlist(asin, db_version=None):
+    """
+    Showdown candidates read from competitor_candidates (ranked by niche/line affinity,
+    then ratings gap). Returns None when the table is not built on the active DB.
+    """
+    from scout_app.core.competitors import SHORTLIST_SQL, STRICT_MIN, MAX_PER_BAND, has_competitor_candidates
+
+    with duckdb.connect(Settings.get_active_db_path(), read_only=True) as conn:
+        if not has_competitor_candidates(conn):
+            return None
+        sql = f"""
+            WITH sl AS ({SHORTLIST_SQL})
+            SELECT 
+                p.asin, p.title, p.image_url, p.real_total_ratings, p.real_average_rating, 
+                pp.category, pp.niche, p.product_line, sl.niche_match
+            FROM sl
+            JOIN products p ON p.asin = sl.candidate_asin
+            LEFT JOIN product_parents pp ON p.asin = pp.parent_asin
+            ORDER BY sl.score DESC, sl.ratings_gap ASC, sl.candidate_asin
+        """
+        return conn.execute(sql, [asin, STRICT_MIN, MAX_PER_BAND]).df()
+
+
+# --- Mass Mode (Market Heatmap) ---
+HEATMAP_TOP_N = 10
+NEGATIVE_WEIGHT = 3.0  # Aggressive Penalized Net Score: Negative feedback has 3x visual weight
+
+
+@st.cache_data(ttl=3600)
+def get_market_parents(db_version=None):
+    """All parents with brand/category, biggest first. Cached per DB version."""
+    return query_df("""
         SELECT 
-            pp.parent_asin, 
-            ANY_VALUE(pp.category) as category, 
-            ANY_VALUE(pp.niche) as niche, 
-            ANY_VALUE(pp.brand) as brand, 
-            ANY_VALUE(pp.title) as title,
-            MAX(p.real_average_rating) as avg_rating,
-            STRING_AGG(p.asin, ',') as variation_pool
-        FROM product_parents pp
-        LEFT JOIN products p ON pp.parent_asin = p.parent_asin
-        GROUP BY pp.parent_asin
-        ORDER BY category, niche, brand
+            p.parent_asin as asin, 
+            MAX(COALESCE(pp.brand, p.brand)) as brand, 
+            ANY_VALUE(COALESCE(pp.title, p.title)) as title,
+            ANY_VALUE(pp.category) as category
+        FROM products p 
+        LEFT JOIN product_parents pp ON p.parent_asin = pp.parent_asin
+        GROUP BY 1 
+        ORDER BY MAX(p.real_total_ratings) DESC
+    """)
+
+
+@st.cache_data(ttl=3600)
+@time_it
+def get_market_heatmap(asins: tuple, db_version=None, top_n=HEATMAP_TOP_N):
+    """
+    Ready-to-plot Mass Mode data from product_aspect_impact in ONE query.
+    Pass `asins` as a sorted tuple so the cache key is (ASIN set, DB version).
+
+    Returns dict: pivot (aspect x product Visual Score), pos / neg (same shape, hover),
+    summary (brand/asin/reviews for the drill-down table). Empty dict if no data.
+    """
+    sql = f"""
+        WITH sel AS (
+            SELECT
+                p.asin,
+                COALESCE(NULLIF(COALESCE(pp.brand, p.brand), 'None'), 'Unknown') as brand,
+                COALESCE(p.real_total_ratings, 0) as reviews
+            FROM products p
+            JOIN product_stats ps ON p.asin = ps.asin
+            LEFT JOIN product_parents pp ON p.asin = pp.parent_asin
+            WHERE p.asin IN (SELECT unnest(?::VARCHAR[]))
+        ),
+        cells AS (
+            SELECT
+                i.asin, i.aspect,
+                i.est_positive as pos, i.est_negative as neg,
+                i.est_positive - i.est_negative * {NEGATIVE_WEIGHT} as score
+            FROM product_aspect_impact i
+            WHERE i.asin IN (SELECT asin FROM sel)
+        ),
+        market AS (
+            -- Top N positive and Top N negative market drivers
+            SELECT
+                aspect, SUM(score) as market_score,
+                row_number() OVER (PARTITION BY SUM(score) > 0 ORDER BY ABS(SUM(score)) DESC, aspect) as rnk
+            FROM cells
+            GROUP BY aspect
+            HAVING SUM(score) != 0
+        )
+        SELECT
+            s.asin, s.brand, s.reviews,
+            left(s.brand, 10) || ' (' || s.asin || ')' as label,
+            m.aspect, m.market_score,
+            COALESCE(c.score, 0) as score, COALESCE(c.pos, 0) as pos, COALESCE(c.neg, 0) as neg
+        FROM sel s
+        LEFT JOIN market m ON m.rnk <= ?
+        LEFT JOIN cells c ON c.asin = s.asin AND c.aspect = m.aspect
     """
-    return query_df(sql)
+    df = query_df(sql, [list(asins), int(top_n)])
+    if df.empty:
+        return {}
+
+    summary = df.drop_duplicates("asin")[["brand", "asin", "reviews"]].reset_index(drop=True)
+    summary.columns = ["Brand", "ASIN", "Reviews"]
+
+    cells = df[df["aspect"].notna()]
+    if cells.empty:
+        return {"pivot": pd.DataFrame(), "summary": summary}
+
+    # Positives on top (best first), negatives at the bottom (worst first)
+    order = (
+        cells.drop_duplicates("aspect")
+        .assign(_pos=lambda d: d["market_score"] > 0, _mag=lambda d: d["market_score"].abs())
+        .sort_values(["_pos", "_mag"], ascending=[False, False])
+    )
+    pos_aspects = order[order["_pos"]]["aspect"].tolist()
+    neg_aspects = order[~order["_pos"]]["aspect"].tolist()
+    aspects = pos_aspects + neg_aspects
+
+    def _pivot(col):
+        return cells.pivot(index="aspect", columns="label", values=col).reindex(aspects).fillna(0)
+
+    pivot = _pivot("score")
+    pivot.index.name, pivot.columns.name = "Khía cạnh", "Sản phẩm"
+    return {"pivot": pivot, "pos": _pivot("pos"), "neg": _pivot("neg"), "summary": summary}
+
+
+# --- Product Explorer (Search Index backed) ---
+EXPLORER_RESULT_LIMIT = 200
+
+
+def _search_index():
+    from scout_app.core.search_index import ProductSearchIndex
+
+    return ProductSearchIndex()
+
+
+@st.cache_data(ttl=600)
+def get_explorer_categories(cache_key=None):
+    with duckdb.connect(Settings.get_active_db_path(), read_only=True) as conn:
+        index = _search_index()
+        if index.has_index(conn):
+            return index.list_categories(conn)
+        res = conn.execute(
+            "SELECT DISTINCT category FROM product_parents WHERE category IS NOT NULL AND category != '' ORDER BY 1"
+        ).fetchall()
+        return [r[0] for r in res]
+
+
+@st.cache_data(ttl=600)
+def get_explorer_niches(category=None, cache_key=None):
+    """Distinct niches from the normalized parent_niches table (optionally within a category)."""
+    from scout_app.core.niches import has_parent_niches
+
+    with duckdb.connect(Settings.get_active_db_path(), read_only=True) as conn:
+        if not has_parent_niches(conn):
+            return []
+        sql = """
+            SELECT DISTINCT pn.niche FROM parent_niches pn
+            JOIN product_parents pp ON pn.parent_asin = pp.parent_asin
+            WHERE (? IS NULL OR pp.category = ?)
+            ORDER BY 1
+        """
+        return [r[0] for r in conn.execute(sql, [category, category]).fetchall()]
+
+
+@st.cache_data(ttl=600)
+def get_niche_members(niche, cache_key=None):
+    """Parent ASINs belonging to `niche` (indexed equality lookup on parent_niches)."""
+    if not niche:
+        return []
+    df = query_df("SELECT parent_asin FROM parent_niches WHERE niche = ?", [niche])
+    return df["parent_asin"].tolist() if not df.empty else []
+
+
+@st.cache_data(ttl=120)
+@time_it
+def search_products(category=None, niche=None, term=None, limit=EXPLORER_RESULT_LIMIT, cache_key=None):
+    """Server-side Product Explorer query. Returns at most `limit` parents."""
+    with duckdb.connect(Settings.get_active_db_path(), read_only=True) as conn:
+        index = _search_index()
+        if index.has_index(conn):
+            return index.search(conn, category=category, niche=niche, term=term, limit=limit)
+
+    # Fallback: index not built yet on this DB (run migration_search)
+    clauses, params = ["TRUE"], []
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if niche:
+        clauses.append("parent_asin IN (SELECT parent_asin FROM parent_niches WHERE niche = ?)")
+        params.append(niche)
+    if term:
+        clauses.append("(parent_asin ILIKE '%' || ? || '%' OR title ILIKE '%' || ? || '%' OR brand ILIKE '%' || ? || '%')")
+        params.extend([term] * 3)
+    sql = f"""
+        SELECT parent_asin, category, niche, brand, title, NULL as avg_rating
+        FROM product_parents
+        WHERE {" AND ".join(clauses)}
+        ORDER BY category, brand, parent_asin
+        LIMIT {int(limit)}
+    """
+    return query_df(sql, params)
 
 
 @st.cache_data
@@ -285,8 +524,17 @@ def request_new_asin(asin_input, note="", force_update=False, user_id=None):
                     final_asin = mapped_parent
                     system_note = f"[Auto-Map] Child {asin_input} -> Parent {final_asin}"
             else:
-                is_unknown = True
-                system_note = "[Unknown ASIN] Not in Product DB. Admin verify Parent."
+                # Resolved earlier by the parent finder / detail scrapes (fresh entries only)
+                cached = get_cached_parents(conn, [asin_input])
+                if cached.get(asin_input):
+                    final_asin = cached[asin_input]
+                    if final_asin != asin_input:
+                        system_note = f"[Cache-Map] Child {asin_input} -> Parent {final_asin}"
+                else:
+                    is_unknown = True
+                    system_note = "[Unknown ASIN] Not in Product DB. Admin verify Parent."
+                    if asin_input in cached:
+                        system_note += " [Cache] No parentAsin found on last lookup."
 
             # 2. Check Existing Data (Reviews)
             rev_stats = conn.execute(
@@ -320,15 +568,14 @@ def request_new_asin(asin_input, note="", force_update=False, user_id=None):
     # Append User Note
     full_note = f"{system_note} | {note}" if note else system_note
 
-    # Insert
-    req_id = str(uuid.uuid4())
-    sql = """
-        INSERT INTO scrape_queue (request_id, asin, status, requested_by, note)
-        VALUES (?, ?, 'PENDING_APPROVAL', ?, ?)
-    """
+    # Insert (via the worker's single DB writer)
     try:
-        with duckdb.connect(db_path, read_only=False) as conn:
-            conn.execute(sql, [req_id, final_asin, user_id, full_note])
+        res = requests.post(
+            f"{WORKER_URL}/scrape_queue/request",
+            json={"asin": final_asin, "requested_by": user_id, "note": full_note},
+            timeout=30,
+        )
+        res.raise_for_status()
 
         # Success Messages
         if is_unknown:
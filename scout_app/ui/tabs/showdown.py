@@ -2,7 +2,9 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 
-from scout_app.ui.common import query_df
+from scout_app.core.config import Settings
+from scout_app.core.niches import PRIMARY_NICHE_SQL
+from scout_app.ui.common import get_competitor_shortlist, get_niche_members, query_df
 
 
 @st.fragment
@@ -28,9 +30,9 @@ def render_showdown_tab(selected_asin):
 
     my_row = my_dna.iloc[0]
     my_cat = my_row.get("category") if pd.notnull(my_row.get("category")) else "NONE"
-    my_niche_raw = str(my_row.get("niche") if pd.notnull(my_row.get("niche")) else "NONE")
-    # Pick the first niche if aggregated for better primary matching
-    my_niche = my_niche_raw.split(",")[0].strip() if "," in my_niche_raw else my_niche_raw
+    # Primary niche = most common niche among the family's variations (parent_niches)
+    df_niche = query_df(PRIMARY_NICHE_SQL, [selected_asin])
+    my_niche = df_niche.iloc[0]["niche"] if not df_niche.empty else "NONE"
 
     my_ratings = float(my_row.get("real_total_ratings")) if pd.notnull(my_row.get("real_total_ratings")) else 0.0
     my_line = my_row.get("product_line") if pd.notnull(my_row.get("product_line")) else "NONE"
@@ -39,37 +41,51 @@ def render_showdown_tab(selected_asin):
     sidebar_cat = st.session_state.get("sidebar_category", "All")
     sidebar_niche = st.session_state.get("sidebar_niche", "All")
 
-    # 2. Smart Matchmaking (Strict Category Arena)
+    # 2. Smart Matchmaking (Strict Category Arena) - live fallback
     def fetch_candidates(rating_min, rating_max):
-        sql = """
+        # Niche matching via exact parent_niches membership (no substring ILIKE)
+        niche_clause = ""
+        params = [my_niche, my_cat, selected_asin, rating_min, rating_max]
+        if sidebar_niche != "All":
+            niche_clause = "AND p.asin IN (SELECT parent_asin FROM parent_niches WHERE niche = ?)"
+            params.append(sidebar_niche)
+        sql = f"""
             SELECT 
                 p.asin, p.title, p.image_url, p.real_total_ratings, p.real_average_rating, 
-                pp.category, pp.niche, p.product_line
+                pp.category, pp.niche, p.product_line,
+                (mn.niche IS NOT NULL) as niche_match
             FROM products p
             LEFT JOIN product_parents pp ON p.asin = pp.parent_asin
+            LEFT JOIN parent_niches mn ON mn.parent_asin = p.asin AND mn.niche = ?
             WHERE pp.category = ? -- STRICT CATEGORY ARENA
               AND p.asin != ? 
               AND p.real_total_ratings BETWEEN ? AND ?
+              {niche_clause}
             ORDER BY 
-                (CASE WHEN pp.niche ILIKE ? THEN 10 ELSE 0 END) + -- PRIORITY: SAME NICHE
+                (CASE WHEN mn.niche IS NOT NULL THEN 10 ELSE 0 END) + -- PRIORITY: SAME NICHE
                 (CASE WHEN p.product_line = ? THEN 1 ELSE 0 END) DESC, -- PRIORITY: SAME LINE
                 ABS(p.real_total_ratings - ?) ASC
             LIMIT 100
         """
-        return query_df(sql, [my_cat, selected_asin, rating_min, rating_max, f"%{my_niche}%", my_line, my_ratings])
-
-    # Try Strict Match (+/- 40%)
-    candidates = fetch_candidates(my_ratings * 0.6, my_ratings * 1.4)
-
-    # Fallback (+/- 60%) if too few candidates
-    if len(candidates) < 5:
-        candidates = fetch_candidates(my_ratings * 0.4, my_ratings * 1.6)
+        return query_df(sql, params + [my_line, my_ratings])
+
+    # Precomputed shortlist (competitor_candidates); live matchmaking only if not built yet
+    db_version = Settings.get_db_version()
+    candidates = get_competitor_shortlist(selected_asin, db_version)
+    if candidates is not None:
+        if sidebar_niche != "All":
+            candidates = candidates[candidates["asin"].isin(get_niche_members(sidebar_niche, cache_key=db_version))]
+    else:
+        # Try Strict Match (+/- 40%)
+        candidates = fetch_candidates(my_ratings * 0.6, my_ratings * 1.4)
+
+        # Fallback (+/- 60%) if too few candidates
+        if len(candidates) < 5:
+            candidates = fetch_candidates(my_ratings * 0.4, my_ratings * 1.6)
 
     # --- 2.5. APPLY SIDEBAR FILTERS (Manual Pick UX Boost) ---
     if sidebar_cat != "All":
         candidates = candidates[candidates["category"] == sidebar_cat]
-    if sidebar_niche != "All":
-        candidates = candidates[candidates["niche"].str.contains(sidebar_niche, na=False, regex=False)]
 
     if candidates.empty:
         st.warning(
@@ -78,8 +94,8 @@ def render_showdown_tab(selected_asin):
         return
 
     # 3. Categorize Results (Smart vs Others)
-    # Smart = Same Niche (Partial) OR Same Line (High Relevance)
-    candidates["is_smart"] = (candidates["niche"].str.contains(my_niche, na=False, regex=False)) | (
+    # Smart = Same Niche (Exact membership) OR Same Line (High Relevance)
+    candidates["is_smart"] = candidates["niche_match"].fillna(False).astype(bool) | (
         candidates["product_line"] == my_line
     )
 
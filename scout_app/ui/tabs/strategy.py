@@ -12,10 +12,12 @@ def render_strategy_tab(selected_asin, current_user_id):
     # --- LAZY IMPORT (Fix Performance & Circular Import) ---
     # Only load DetectiveAgent when this function is actually called
     try:
-        from core.detective import DetectiveAgent
+        from core.answer_cache import AnswerCache, answer_version
+        from core.detective import MODEL_NAME, DetectiveAgent
     except ImportError:
         # Fallback if sys.path is tricky
-        from scout_app.core.detective import DetectiveAgent
+        from scout_app.core.answer_cache import AnswerCache, answer_version
+        from scout_app.core.detective import MODEL_NAME, DetectiveAgent
 
     if "detective" not in st.session_state:
         st.session_state.detective = DetectiveAgent()
@@ -24,12 +26,18 @@ def render_strategy_tab(selected_asin, current_user_id):
 
     # --- 1. Render Chat History (TOP) ---
     # This ensures that when we rerun, the full history (including new msg) appears first
+    regenerate = None
     for i, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
+            is_latest = message["role"] == "assistant" and i == len(st.session_state.messages) - 1
             # Anchor for the latest assistant response
-            if message["role"] == "assistant" and i == len(st.session_state.messages) - 1:
+            if is_latest:
                 st.markdown("<div id='latest-answer'></div>", unsafe_allow_html=True)
             st.markdown(message["content"])
+            if message.get("cached"):
+                st.caption("⚡ Câu trả lời từ cache (cùng dữ liệu, cùng câu hỏi)")
+                if is_latest and st.button("🔄 Tạo lại câu trả lời", key=f"regen_{i}"):
+                    regenerate = message
 
     # Auto-Scroll JS (Runs on every render)
     # If 'latest-answer' exists, scroll to it smoothly.
@@ -51,50 +59,67 @@ def render_strategy_tab(selected_asin, current_user_id):
     st.markdown("##### 🚀 Quick Strategy Actions")
     
     quick_prompt = None
+    quick_template = None  # Answer-cache key for fixed quick-action prompts
 
     # Row 1: R&D & Strategy
     st.markdown("##### 🧠 Nghiên cứu & Chiến lược (R&D)")
     r1_c1, r1_c2, r1_c3, r1_c4 = st.columns(4)
     if r1_c1.button("🧠 Tâm lý khách", use_container_width=True, help="Tại sao khách mua?"):
         quick_prompt = "Phân tích các yếu tố thúc đẩy quyết định mua dựa trên dữ liệu thực tế. Sử dụng tool `analyze_customer_context`. Trình bày dạng bảng: [Yếu tố tâm lý] | [Dữ liệu chứng minh] | [Tác động]."
+        quick_template = "customer_psychology"
     if r1_c2.button("🚧 Rào cản mua", use_container_width=True, help="Tại sao khách chê?"):
         quick_prompt = "Xác định 3 lý do chính khiến khách hàng do dự hoặc đánh giá thấp sản phẩm. Sử dụng dữ liệu từ tool `get_product_swot`. Liệt kê trực diện, không văn vẻ."
+        quick_template = "purchase_barriers"
     if r1_c3.button("💡 Ý tưởng SP mới", use_container_width=True, help="Cải tiến V2"):
         quick_prompt = "Đề xuất 3 cải tiến kỹ thuật cụ thể cho phiên bản V2.0 dựa trên điểm yếu của đối thủ cạnh tranh. Sử dụng tool `analyze_competitors`. Định dạng: [Cải tiến] | [Lý do/Dữ liệu] | [Độ ưu tiên]."
+        quick_template = "v2_ideas"
     if r1_c4.button("👥 Chân dung khách", use_container_width=True, help="Targeting"):
         quick_prompt = "Phân loại 3 nhóm khách hàng mục tiêu dựa trên dữ liệu review. Sử dụng tool `analyze_customer_context`. Định dạng bảng: [Phân khúc] | [Đặc điểm] | [Nhu cầu chính]."
+        quick_template = "customer_persona"
 
     # Row 2: Execution & Content
     st.markdown("##### ⚡ Thực thi (Content & Media)")
     r2_c1, r2_c2, r2_c3, r2_c4 = st.columns(4)
     if r2_c1.button("🤖 Review Insights", use_container_width=True, help="Tóm tắt review"):
         quick_prompt = "Tóm tắt ngắn gọn các điểm khen/chê chính. Sử dụng tool `get_product_dna`. Không chào hỏi, vào thẳng danh sách gạch đầu dòng."
+        quick_template = "review_insights"
     if r2_c2.button("✍️ Viết Listing", use_container_width=True, help="Title & Bullets"):
         quick_prompt = "Tạo Title và 5 Bullet Points chuẩn SEO Amazon bằng tool `generate_listing_content`. Tập trung vào việc giải quyết các Pain Points thực tế từ review. Trả lời bằng Tiếng Anh (Listing) và Tiếng Việt (Giải thích)."
+        quick_template = "listing"
     if r2_c3.button("❓ Tạo Q&A", use_container_width=True, help="15 câu thắc mắc"):
         quick_prompt = "Soạn 10 cặp câu hỏi và trả lời (Q&A) dựa trên các thắc mắc và khiếu nại thực tế của khách hàng trong review. Sử dụng tool `search_review_evidence`."
+        quick_template = "qna"
     if r2_c4.button("📸 Media Brief", use_container_width=True, help="Gợi ý Media"):
         quick_prompt = "Đề xuất 5 concept hình ảnh/video để xử lý nỗi sợ của khách hàng. Liên kết mỗi concept với một điểm đau (Pain Point) cụ thể từ dữ liệu tool `get_product_swot`."
+        quick_template = "media_brief"
 
     # Row 3: Growth & Support
     st.markdown("##### 🚀 Tăng trưởng & Hỗ trợ")
     r3_c1, r3_c2, r3_c3, r3_c4 = st.columns(4)
     if r3_c1.button("⚔️ Soi Đối Thủ", use_container_width=True, help="So sánh với Brand khác"):
         quick_prompt = "So sánh sản phẩm hiện tại với các đối thủ cùng phân khúc. Sử dụng tool `analyze_competitors`. Chỉ ra chính xác đối thủ nào mạnh hơn ở điểm nào. Trình bày dạng bảng so sánh."
+        quick_template = "competitor_check"
     if r3_c2.button("🔥 Roast Sản phẩm", use_container_width=True, help="Bóc phốt cực gắt"):
         quick_prompt = "Liệt kê những lời chê tệ nhất và gắt nhất về sản phẩm này dựa trên review. Không nói giảm nói tránh, không múa văn. Vào thẳng vấn đề."
+        quick_template = "roast"
     if r3_c3.button("💣 Kịch bản Seeding", use_container_width=True, help="Điều hướng dư luận"):
         quick_prompt = "Viết kịch bản seeding xử lý khủng hoảng dựa trên các điểm yếu thực tế. Sử dụng dữ liệu từ tool `search_review_evidence` để viết nội dung phản hồi thuyết phục."
+        quick_template = "seeding"
     if r3_c4.button("📞 Kịch bản CSKH", use_container_width=True, help="Xử lý khiếu nại song ngữ"):
         quick_prompt = "Viết 3 mẫu kịch bản trả lời khiếu nại cho 3 vấn đề bị chê nhiều nhất. Nội dung giải thích bằng Tiếng Việt, văn mẫu phản hồi bằng Tiếng Anh chuyên nghiệp."
+        quick_template = "cs_scripts"
 
     st.markdown("---")
 
     # --- 3. Input Logic (BOTTOM) ---
     # Handle Quick Buttons (Set prompt directly)
     final_prompt = None
+    bypass_cache = False
     if quick_prompt:
         final_prompt = quick_prompt
+    elif regenerate:
+        # "Regenerate" on a cached answer: same template, skip the cache
+        final_prompt, quick_template, bypass_cache = regenerate["prompt"], regenerate["template_id"], True
     
     # Handle Chat Input
     # Note: Streamlit's chat_input is separate from buttons. 
@@ -104,28 +129,69 @@ def render_strategy_tab(selected_asin, current_user_id):
     if (prompt := st.chat_input("Ask Strategy Hub...")) or final_prompt:
         if not final_prompt:
             final_prompt = prompt
+            quick_template = None  # Free text is never cached
 
         # 1. Append User Msg & Draw immediately
         st.session_state.messages.append({"role": "user", "content": final_prompt})
         with st.chat_message("user"):
             st.markdown(final_prompt)
-        
-        # 2. Generate Answer (Streamed/Spinner)
+
+        # Quick actions on an ASIN: answer cache keyed by (template, ASIN, data version of that ASIN
+        # + hash of the prompt text and model)
+        db_version = (
+            answer_version(selected_asin, final_prompt, MODEL_NAME) if quick_template and selected_asin else None
+        )
+        cache = AnswerCache() if db_version else None
+        cached = None
+        if cache and bypass_cache:
+            cache.record_bypass(quick_template)
+        elif cache:
+            cached = cache.get(quick_template, selected_asin, db_version)
+
         with st.chat_message("assistant"):
-            with st.spinner("🕵️ Detective is thinking..."):
-                try:
-                    # Run Agent
-                    response = st.session_state.detective.answer(
-                        final_prompt, default_asin=selected_asin, user_id=current_user_id
-                    )
-                    st.markdown(response)
-                    
-                    # 3. Append Assistant Msg to History
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    
-                except Exception as e:
-                    st.error(f"Agent Error: {e}")
-                    st.session_state.messages.append({"role": "assistant", "content": f"⚠️ Error: {e}"})
+            if cached:
+                st.markdown(cached)
+                st.caption("⚡ Câu trả lời từ cache (cùng dữ liệu, cùng câu hỏi)")
+                st.session_state.detective.note_cached_answer(final_prompt, cached)
+                st.session_state.messages.append(
+                    {
+                        "role": "assistant",
+                        "content": cached,
+                        "cached": True,
+                        "template_id": quick_template,
+                        "prompt": final_prompt,
+                    }
+                )
+                return
+
+            # 2. Generate Answer (Streamed: tool progress in a status box, tokens as they arrive)
+            status = st.status("🕵️ Detective is thinking...", expanded=False)
+
+            def token_stream():
+                for event in st.session_state.detective.answer_stream(
+                    final_prompt, default_asin=selected_asin, user_id=current_user_id
+                ):
+                    if event["type"] == "tool":
+                        status.update(label=f"🔧 Đang chạy `{event['name']}`...")
+                        status.write(f"🔧 `{event['name']}` {event['args']}")
+                    elif event["type"] == "token":
+                        yield event["text"]
+
+            try:
+                # Run Agent
+                response = st.write_stream(token_stream())
+                status.update(label="✅ Detective đã trả lời", state="complete")
+
+                if cache and st.session_state.detective.last_answer_ok:
+                    cache.put(quick_template, selected_asin, db_version, response)
+
+                # 3. Append Assistant Msg to History
+                st.session_state.messages.append({"role": "assistant", "content": response})
+
+            except Exception as e:
+                status.update(label="❌ Agent Error", state="error")
+                st.error(f"Agent Error: {e}")
+                st.session_state.messages.append({"role": "assistant", "content": f"⚠️ Error: {e}"})
 
     # Note: No st.rerun() needed here. 
     # The new messages are drawn. Next time user interacts, history loop at top handles re-drawing.
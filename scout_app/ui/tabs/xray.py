@@ -2,8 +2,15 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 
+from scout_app.core.config import Settings
 from scout_app.ui.common import (
-    get_evidence_data,
+    EVIDENCE_PAGE_SIZE,
+    get_evidence_aspects,
+    get_evidence_page,
+    get_explorer_niches,
+    get_market_heatmap,
+    get_market_parents,
+    get_niche_members,
     get_precalc_stats,
     get_raw_sentiment_data,
     get_weighted_sentiment_data,
@@ -218,21 +225,69 @@ def render_xray_tab(selected_asin):
         )
 
     # --- Evidence (Quotes) ---
+    # Lazy: nothing is queried until the user opens the explorer.
     st.write("---")
-    with st.expander("🔍 View Evidence (Quotes)"):
-        df_ev = get_evidence_data(selected_asin)
-        if df_ev is not None and not df_ev.empty:
-            st.dataframe(
-                df_ev,
-                use_container_width=True,
-                column_config={
-                    "Aspect (Status)": st.column_config.TextColumn("Aspect (Status)"),
-                    "Evidence Quote": st.column_config.TextColumn("Quote", width="large"),
-                },
-                height=500,
-            )
-        else:
-            st.info("No detailed quotes available.")
+    if st.toggle("🔍 View Evidence (Quotes)", key=f"ev_open_{selected_asin}"):
+        render_evidence_explorer(selected_asin)
+
+
+@st.fragment
+def render_evidence_explorer(selected_asin):
+    """Paginated evidence explorer. Filters run server-side, only the visible page is fetched."""
+    f1, f2, f3 = st.columns([2, 1, 2])
+    with f1:
+        aspect = st.selectbox(
+            "Khía cạnh (Aspect):", ["Tất cả"] + get_evidence_aspects(selected_asin), key=f"ev_aspect_{selected_asin}"
+        )
+    with f2:
+        sentiment = st.selectbox(
+            "Cảm xúc:", ["Tất cả", "Positive", "Negative", "Neutral"], key=f"ev_sent_{selected_asin}"
+        )
+    with f3:
+        keyword = st.text_input("Từ khóa trong quote:", key=f"ev_kw_{selected_asin}").strip()
+
+    aspect = None if aspect == "Tất cả" else aspect
+    sentiment = None if sentiment == "Tất cả" else sentiment
+    keyword = keyword or None
+
+    # Cursor stack per filter combination: [None, cursor_page_2, cursor_page_3, ...]
+    filter_sig = (selected_asin, aspect, sentiment, keyword)
+    state_key = "ev_pager"
+    if st.session_state.get(state_key, {}).get("sig") != filter_sig:
+        st.session_state[state_key] = {"sig": filter_sig, "cursors": [None]}
+    pager = st.session_state[state_key]
+
+    page_no = len(pager["cursors"])
+    df_ev, next_cursor = get_evidence_page(
+        selected_asin, aspect=aspect, sentiment=sentiment, keyword=keyword, cursor=pager["cursors"][-1]
+    )
+
+    if df_ev.empty:
+        st.info("No detailed quotes available.")
+        return
+
+    st.dataframe(
+        df_ev,
+        use_container_width=True,
+        column_config={
+            "Aspect (Status)": st.column_config.TextColumn("Aspect (Status)"),
+            "Evidence Quote": st.column_config.TextColumn("Quote", width="large"),
+        },
+        hide_index=True,
+        height=500,
+    )
+
+    c_prev, c_info, c_next = st.columns([1, 2, 1])
+    with c_prev:
+        if st.button("⬅️ Trang trước", disabled=page_no == 1, key="ev_prev", use_container_width=True):
+            pager["cursors"].pop()
+            st.rerun(scope="fragment")
+    with c_info:
+        st.caption(f"Trang {page_no} · {EVIDENCE_PAGE_SIZE} quotes/trang")
+    with c_next:
+        if st.button("Trang sau ➡️", disabled=next_cursor is None, key="ev_next", use_container_width=True):
+            pager["cursors"].append(next_cursor)
+            st.rerun(scope="fragment")
 
 
 def render_mass_mode(selected_asin):
@@ -265,21 +320,10 @@ def render_mass_mode(selected_asin):
     my_cat = (
         base_info.iloc[0]["category"] if not base_info.empty and pd.notnull(base_info.iloc[0]["category"]) else None
     )
-    my_niche = base_info.iloc[0]["niche"] if not base_info.empty and pd.notnull(base_info.iloc[0]["niche"]) else None
-
-    # Get all potential candidates with ROBUST BRAND fetching
-    all_parents = query_df("""
-        SELECT 
-            p.parent_asin as asin, 
-            MAX(COALESCE(pp.brand, p.brand)) as brand, 
-            ANY_VALUE(COALESCE(pp.title, p.title)) as title,
-            ANY_VALUE(pp.category) as category,
-            ANY_VALUE(pp.niche) as niche
-        FROM products p 
-        LEFT JOIN product_parents pp ON p.parent_asin = pp.parent_asin
-        GROUP BY 1 
-        ORDER BY MAX(p.real_total_ratings) DESC
-    """)
+
+    # Get all potential candidates with ROBUST BRAND fetching (cached per DB version)
+    db_version = Settings.get_db_version()
+    all_parents = get_market_parents(db_version)
     parent_list = all_parents["asin"].tolist()
     parent_map = all_parents.set_index("asin")["brand"].to_dict()
 
@@ -294,22 +338,9 @@ def render_mass_mode(selected_asin):
         )
 
     with f_c2:
-        # Filter niches based on category
-        niche_df = all_parents if selected_cat == "Tất cả" else all_parents[all_parents["category"] == selected_cat]
-
-        # FIX: Unnest the aggregated niche strings to get a clean list of individual niches
-        raw_niches = niche_df["niche"].dropna().unique()
-        all_individual_niches = set()
-        for rn in raw_niches:
-            for n in str(rn).split(","):
-                n_clean = n.strip()
-                if n_clean:
-                    all_individual_niches.add(n_clean)
-
-        unique_niches = sorted(list(all_individual_niches))
-
-        # Check if current product's niche is in the list for index selection
-        # (Since my_niche might be a list, we just default to index 0 or match first)
+        # Niches of the selected category (normalized parent_niches table, no string splitting)
+        cache_key = st.session_state.get("last_db_update", 0)
+        unique_niches = get_explorer_niches(None if selected_cat == "Tất cả" else selected_cat, cache_key=cache_key)
         selected_niche = st.selectbox("Lọc theo Niche:", ["Tất cả"] + unique_niches)
 
     # Filter candidates based on selection
@@ -318,10 +349,9 @@ def render_mass_mode(selected_asin):
         filtered_parents = filtered_parents[filtered_parents["category"] == selected_cat]
 
     if selected_niche != "Tất cả":
-        # Match if the selected_niche exists anywhere in the parent's aggregated niche string
-        filtered_parents = filtered_parents[
-            filtered_parents["niche"].str.contains(selected_niche, na=False, regex=False)
-        ]
+        # Exact niche membership
+        members = get_niche_members(selected_niche, cache_key=cache_key)
+        filtered_parents = filtered_parents[filtered_parents["asin"].isin(members)]
 
     # Update dynamic lists for Multiselect
     dynamic_parent_list = filtered_parents["asin"].tolist()
@@ -351,82 +381,19 @@ def render_mass_mode(selected_asin):
         st.info("Vui lòng chọn ít nhất 2 sản phẩm để so sánh.")
         return
 
-    # --- 2. FETCH DATA IN BATCH ---
-    sql = """
-        SELECT p.asin, COALESCE(pp.brand, p.brand, 'Unknown') as brand, COALESCE(pp.title, p.title) as title, ps.metrics_json, p.real_total_ratings 
-        FROM products p 
-        JOIN product_stats ps ON p.asin = ps.asin 
-        LEFT JOIN product_parents pp ON p.asin = pp.parent_asin
-        WHERE p.asin IN ({})
-    """.format(",".join(["?"] * len(selected_list)))
-    df_batch = query_df(sql, selected_list)
-
-    # --- 3. PROCESS HEATMAP DATA ---
-    import json
-
-    heatmap_data = []
-
-    for _, row in df_batch.iterrows():
-        try:
-            m = json.loads(row["metrics_json"]) if isinstance(row["metrics_json"], str) else row["metrics_json"]
-            brand_clean = row["brand"] if row["brand"] and row["brand"] != "None" else "Unknown"
-            label = f"{brand_clean[:10]} ({row['asin']})"
-            real_total = row["real_total_ratings"] or 0
-
-            for item in m.get("sentiment_weighted", []):
-                # Aggressive Penalized Net Score: Negative feedback has 3x visual weight
-                pos = item.get("est_positive", 0)
-                neg = item.get("est_negative", 0)
-                score = pos - (neg * 3.0)
-
-                heatmap_data.append(
-                    {
-                        "Sản phẩm": label,
-                        "ASIN": row["asin"],
-                        "Khía cạnh": item["aspect"],
-                        "Visual Score": score,
-                        "Khen (Est)": pos,
-                        "Chê (Est)": neg,
-                        "Tổng Rating": real_total,
-                    }
-                )
-        except:
-            continue
+    # --- 2. FETCH READY-TO-PLOT PIVOT (one query, cached by ASIN set + DB version) ---
+    hm = get_market_heatmap(tuple(sorted(selected_list)), db_version)
 
-    if not heatmap_data:
+    if not hm:
         st.warning("Dữ liệu cảm xúc chưa đủ.")
         return
 
-    df_hm = pd.DataFrame(heatmap_data)
-    df_pivot = df_hm.pivot(index="Khía cạnh", columns="Sản phẩm", values="Visual Score")
-
-    # FIX: Fill NaN with 0 for missing aspects (Clean Heatmap)
-    df_pivot = df_pivot.fillna(0)
-
-    # Sort aspects by absolute total volume of impact (Importance)
-    df_pivot = df_pivot.reindex(df_pivot.abs().sum(axis=1).sort_values(ascending=False).index)
-
-    # FIX: Remove rows (aspects) where ALL selected products have 0 impact
-    # This keeps the heatmap compact and relevant.
-    df_pivot = df_pivot[df_pivot.abs().sum(axis=1) > 0]
-
-    # NEW: Limit to Top 10 Positive and Top 10 Negative Market Drivers
-    market_scores = df_pivot.sum(axis=1)
-    top_pos = market_scores[market_scores > 0].nlargest(10).index.tolist()
-    top_neg = market_scores[market_scores < 0].nsmallest(10).index.tolist()
-
-    # Sort them: Positives on top (descending), Negatives on bottom (ascending/worst first)
-    final_aspects = top_pos + top_neg
-    if final_aspects:
-        df_pivot = df_pivot.loc[final_aspects]
-    else:
+    df_pivot = hm["pivot"]
+    if df_pivot.empty:
         st.info("No significant positive or negative drivers found for the selected products.")
         return
 
-    # Create mappings for hover data
-    rating_map = df_hm.set_index("Sản phẩm")["Tổng Rating"].to_dict()
-    pos_map = df_hm.groupby(["Khía cạnh", "Sản phẩm"])["Khen (Est)"].first().to_dict()
-    neg_map = df_hm.groupby(["Khía cạnh", "Sản phẩm"])["Chê (Est)"].first().to_dict()
+    pos_df, neg_df = hm["pos"], hm["neg"]
 
     # Custom "Deep Red/Black" to "Deep Blue" scale
     # 0.0 is max negative, 0.5 is neutral, 1.0 is max positive
@@ -463,8 +430,7 @@ def render_mass_mode(selected_asin):
         ygap=1,
         hovertemplate="<b>%{x}</b><br>Khía cạnh: %{y}<br>Visual Score: %{z:,.0f}<br>👍 Khen: %{customdata[0]:,.0f}<br>👎 Chê: %{customdata[1]:,.0f}<extra></extra>",
         customdata=[
-            [[pos_map.get((asp, prod), 0), neg_map.get((asp, prod), 0)] for prod in df_pivot.columns]
-            for asp in df_pivot.index
+            [[pos_df.at[asp, prod], neg_df.at[asp, prod]] for prod in df_pivot.columns] for asp in df_pivot.index
         ],
     )
     fig.update_layout(height=max(500, len(df_pivot) * 25))
@@ -474,9 +440,7 @@ def render_mass_mode(selected_asin):
     st.markdown("##### 🚀 Quick Drill-down")
     st.caption("Click vào một dòng để chuyển sang xem chi tiết sản phẩm đó.")
 
-    df_summary = df_batch[["brand", "asin", "real_total_ratings"]].copy()
-    df_summary.columns = ["Brand", "ASIN", "Reviews"]
-    df_summary["Brand"] = df_summary["Brand"].fillna("Unknown")
+    df_summary = hm["summary"]
 
     event = st.dataframe(
         df_summary,
@@ -3,7 +3,7 @@ import plotly.express as px
 import streamlit as st
 
 from scout_app.ui.common import (
-    get_evidence_data,
+    get_evidence_page,
     get_precalc_stats,
     get_raw_sentiment_data,
     get_weighted_sentiment_data,
@@ -210,7 +210,7 @@ def render_xray_tab(selected_asin):
     # --- Evidence (Quotes) ---
     st.write("---")
     with st.expander("🔍 View Evidence (Quotes)"):
-        df_ev = get_evidence_data(selected_asin)
+        df_ev, _ = get_evidence_page(selected_asin)
         if df_ev is not None and not df_ev.empty:
             st.dataframe(
                 df_ev,
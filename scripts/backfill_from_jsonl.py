@@ -3,10 +3,40 @@ import duckdb
 import os
 from pathlib import Path
 import sys
+import polars as pl
 
 # Add root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scout_app.core.config import Settings
+from scout_app.core.dna import extract_dna
+
+DNA_COLUMNS = ["material", "design_type", "target_audience", "gender", "size_capacity", "num_pieces", "pack"]
+DETAILS_TYPE = pl.List(pl.Struct({"name": pl.Utf8, "value": pl.Utf8}))
+
+
+def load_dna(file_path):
+    """{asin: {dna column: value}} for one Axesso export (shared vectorized extractor)."""
+    rows = []
+    with open(file_path, "r") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except Exception:
+                continue
+            if data.get("statusCode") != 200 or not data.get("asin"):
+                continue
+            details = [
+                {"name": str(d.get("name", "")), "value": None if d.get("value") is None else str(d["value"])}
+                for d in data.get("productDetails") or []
+                if isinstance(d, dict)
+            ]
+            rows.append({"asin": data["asin"], "title": data.get("title"), "productDetails": details})
+    if not rows:
+        return {}
+    df = pl.DataFrame(rows, schema={"asin": pl.Utf8, "title": pl.Utf8, "productDetails": DETAILS_TYPE})
+    df = extract_dna(df, breadcrumbs_col=None).select(["asin"] + DNA_COLUMNS)
+    return {r["asin"]: r for r in df.to_dicts()}
+
 
 FILES_TO_IMPORT = [
     "staging_data_local/20260129_data/new_product_metadata/39_asin.jsonl",
@@ -28,6 +58,7 @@ def backfill():
             continue
             
         print(f"📦 Processing {file_path}...")
+        dna_by_asin = load_dna(file_path)
         with open(file_path, "r") as f:
             for line in f:
                 try:
@@ -78,20 +109,30 @@ def backfill():
 
                     # 2. Update Product Metadata (The Missing Link)
                     # We treat these as Parents, so parent_asin = asin
+                    dna = dna_by_asin.get(asin, {})
                     conn.execute("""
                         INSERT INTO products (
                             asin, parent_asin, title, brand, image_url, 
-                            real_average_rating, real_total_ratings, category, last_updated
+                            real_average_rating, real_total_ratings, category,
+                            material, design_type, target_audience, gender, size_capacity, num_pieces, pack, last_updated
                         )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, now())
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, now())
                         ON CONFLICT (asin) DO UPDATE SET
                             real_average_rating = excluded.real_average_rating,
                             real_total_ratings = excluded.real_total_ratings,
                             title = COALESCE(excluded.title, products.title),
                             brand = COALESCE(excluded.brand, products.brand),
                             image_url = COALESCE(excluded.image_url, products.image_url),
+                            material = COALESCE(excluded.material, products.material),
+                            design_type = COALESCE(excluded.design_type, products.design_type),
+                            target_audience = COALESCE(excluded.target_audience, products.target_audience),
+                            gender = COALESCE(excluded.gender, products.gender),
+                            size_capacity = COALESCE(excluded.size_capacity, products.size_capacity),
+                            num_pieces = COALESCE(excluded.num_pieces, products.num_pieces),
+                            pack = COALESCE(excluded.pack, products.pack),
                             last_updated = now()
-                    """, [asin, asin, title, brand, image, avg_rating, total_ratings, category])
+                    """, [asin, asin, title, brand, image, avg_rating, total_ratings, category]
+                        + [dna.get(c) for c in DNA_COLUMNS])
                     
                     total_inserted += 1
                 except Exception as e:
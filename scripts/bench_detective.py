@@ -0,0 +1,328 @@
+"""
+Offline Detective benchmark: replays recorded chat_history conversations against a
+fixture DuckDB with a fake Gemini client (no network, no API key).
+
+The fake model re-emits the recorded function calls round by round, then the recorded
+answer, so only the Detective's own work (tool code + DuckDB) is measured.
+
+By default the DB is built from scripts/fixtures/detective_fixture.json (real schema,
+stats, payloads and indexes; reviews multiplied by --scale) and the recorded turns come
+from scripts/fixtures/detective_chat_history.jsonl, so it runs anywhere (CI included).
+
+Usage:
+    python scripts/bench_detective.py --scale 50 --max-p95-ms 200 --max-queries-per-turn 20
+    python scripts/bench_detective.py --db copy_of_prod.duckdb \\
+        --logs "staging_data/logs_buffer/chat_history_*.jsonl" --asin B0XXXXXXX --max-p95-ms 500
+Exit code 1 when a tool's p95 exceeds --max-p95-ms (or a turn exceeds --max-queries-per-turn).
+"""
+
+import argparse
+import glob
+import json
+import math
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+import duckdb
+
+# Add root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from scout_app.core.competitors import rebuild_competitor_candidates
+from scout_app.core.config import Settings
+from scout_app.core.detective import DetectiveAgent
+from scout_app.core.ingest import DataIngester
+from scout_app.core.niches import sync_parent_niches
+from scout_app.core.stats_engine import StatsEngine
+from scout_app.core.text_index import index_review_text, index_tag_quotes
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+DEFAULT_FIXTURE = FIXTURE_DIR / "detective_fixture.json"
+DEFAULT_RECORDING = FIXTURE_DIR / "detective_chat_history.jsonl"
+
+
+# --- Fixture DB ---
+def build_fixture_db(fixture_path, db_path, scale=1):
+    """
+    Fresh DuckDB from the JSON fixture: ingest schema + catalog + mined reviews (each copied
+    `scale` times), then the derived tables the tools read (stats, payloads, indexes).
+    """
+    with open(fixture_path, encoding="utf-8") as f:
+        fixture = json.load(f)
+    DataIngester()._init_schema(db_path)
+
+    reviews, tags = [], []
+    for k in range(scale):
+        for r in fixture["reviews"]:
+            rid = f"{r['review_id']}-{k}"
+            reviews.append(
+                (rid, r["parent_asin"], r["child_asin"], r["rating_score"], r["title"], r["text"],
+                 r["review_date"], r["is_verified"], r["helpful_count"])
+            )
+            tags += [(rid, r["parent_asin"], *tag) for tag in r["tags"]]
+
+    with duckdb.connect(str(db_path)) as conn:
+        conn.executemany(
+            "INSERT INTO product_parents (parent_asin, category, niche, title, brand) VALUES (?, ?, ?, ?, ?)",
+            [(p["parent_asin"], p["category"], p["niche"], p["title"], p["brand"]) for p in fixture["parents"]],
+        )
+        product_cols = list(fixture["products"][0])
+        conn.executemany(
+            f"INSERT INTO products ({', '.join(product_cols)}) VALUES ({', '.join('?' for _ in product_cols)})",
+            [[p[c] for c in product_cols] for p in fixture["products"]],
+        )
+        conn.executemany("INSERT INTO aspect_mapping VALUES (?, ?, ?)", fixture["aspect_mapping"])
+        conn.executemany(
+            """
+            INSERT INTO reviews (review_id, parent_asin, child_asin, rating_score, title, text,
+                                 review_date, is_verified, helpful_count, mining_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'COMPLETED')
+        """,
+            reviews,
+        )
+        conn.executemany(
+            "INSERT INTO review_tags (review_id, parent_asin, category, aspect, sentiment, quote) VALUES (?, ?, ?, ?, ?, ?)",
+            tags,
+        )
+        sync_parent_niches(conn)
+        rebuild_competitor_candidates(conn)
+        index_review_text(conn)
+        index_tag_quotes(conn)
+        engine = StatsEngine(db_path=str(db_path))
+        for p in fixture["parents"]:
+            engine.calculate_and_save(p["parent_asin"], conn=conn)
+    print(f"🧪 Fixture DB: {len(fixture['parents'])} parents, {len(reviews)} reviews, {len(tags)} tags -> {db_path}")
+
+
+# --- Fake Gemini client (replay) ---
+def _chunk(text=None, function_calls=None):
+    parts = [SimpleNamespace(text=text)] if text else []
+    return SimpleNamespace(
+        function_calls=function_calls or None,
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))],
+    )
+
+
+class ReplayChat:
+    def __init__(self, client):
+        self.client = client
+        self._round = 0
+
+    def send_message_stream(self, message):
+        record = self.client.current
+        if isinstance(message, str):
+            self._round = 0  # New user turn
+        rounds = record.get("tool_calls") or []
+        if self._round < len(rounds):
+            calls = [SimpleNamespace(name=c["name"], args=c.get("args") or {}) for c in rounds[self._round]]
+            self._round += 1
+            yield _chunk(function_calls=calls)
+            return
+        response = record.get("response") or "(recorded answer)"
+        step = max(1, len(response) // 4)
+        for i in range(0, len(response), step):
+            yield _chunk(text=response[i : i + step])
+
+    def get_history(self, curated=False):
+        return []
+
+
+class ReplayClient:
+    """Stands in for genai.Client: chats.create / models.generate_content."""
+
+    def __init__(self):
+        self.current = {}
+        self.chats = SimpleNamespace(create=lambda **kwargs: ReplayChat(self))
+        self.models = SimpleNamespace(generate_content=lambda **kwargs: SimpleNamespace(text="(summary)"))
+
+
+# --- Instrumented agent ---
+class BenchDetective(DetectiveAgent):
+    """Counts DB queries / connections and times every tool call."""
+
+    def __init__(self, client, db_path):
+        super().__init__(client=client, db_path=db_path)
+        self._lock = threading.Lock()
+        self.tool_times = defaultdict(list)
+        self.tool_queries = defaultdict(int)
+        self.queries = 0
+        self.connections = 0
+
+    def _count(self, attr, n=1):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def _open_read_conn(self):
+        self._count("connections")
+        super()._open_read_conn()
+
+    def _run_tool_job(self, fname, func, fargs, db_version):
+        self._count("connections")  # Worker cursor
+        return super()._run_tool_job(fname, func, fargs, db_version)
+
+    def _run_query(self, query, params=None, fetch_df=True):
+        self._count("queries")
+        if self._conn is None and getattr(self._local, "cursor", None) is None:
+            self._count("connections")
+        tool = getattr(self._local, "tool", None)
+        if tool:
+            with self._lock:
+                self.tool_queries[tool] += 1
+        return super()._run_query(query, params, fetch_df)
+
+    def _call_tool_cached(self, fname, func, fargs, db_version):
+        self._local.tool = fname
+        start = time.perf_counter()
+        try:
+            return super()._call_tool_cached(fname, func, fargs, db_version)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._local.tool = None
+            with self._lock:
+                self.tool_times[fname].append(elapsed)
+
+
+# --- Helpers ---
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def load_records(patterns, limit=None):
+    records = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # Only conversations logged with their tool calls can be replayed
+                    if rec.get("query") and "tool_calls" in rec:
+                        records.append(rec)
+    return records[:limit] if limit else records
+
+
+def run_bench(records, db_path, asin=None, iterations=1, keep_cache=False):
+    client = ReplayClient()
+    agent = BenchDetective(client, db_path)
+    turns = []
+
+    for _ in range(iterations):
+        for rec in records:
+            if not keep_cache:
+                agent._tool_cache.clear()  # Measure real tool cost, not memo hits
+            client.current = rec
+            q_before, c_before = agent.queries, agent.connections
+            start = time.perf_counter()
+            for _event in agent.answer_stream(rec["query"], default_asin=asin or rec.get("asin"), user_id="bench"):
+                pass
+            turns.append(
+                {
+                    "ms": (time.perf_counter() - start) * 1000,
+                    "queries": agent.queries - q_before,
+                    "connections": agent.connections - c_before,
+                }
+            )
+
+    tools = {
+        name: {
+            "calls": len(times),
+            "p50_ms": round(percentile(times, 50), 2),
+            "p95_ms": round(percentile(times, 95), 2),
+            "queries_per_call": round(agent.tool_queries[name] / len(times), 2),
+        }
+        for name, times in sorted(agent.tool_times.items())
+    }
+    turn_ms = [t["ms"] for t in turns]
+    return {
+        "turns": len(turns),
+        "turn_p50_ms": round(percentile(turn_ms, 50), 2),
+        "turn_p95_ms": round(percentile(turn_ms, 95), 2),
+        "max_queries_per_turn": max((t["queries"] for t in turns), default=0),
+        "max_connections_per_turn": max((t["connections"] for t in turns), default=0),
+        "total_queries": agent.queries,
+        "total_connections": agent.connections,
+        "tools": tools,
+    }
+
+
+def print_report(report):
+    print(f"\n🕵️ Detective replay: {report['turns']} turns")
+    print(f"   Turn latency p50={report['turn_p50_ms']}ms p95={report['turn_p95_ms']}ms")
+    print(
+        f"   DB: {report['total_queries']} queries, {report['total_connections']} connections "
+        f"(max/turn: {report['max_queries_per_turn']} q, {report['max_connections_per_turn']} conn)"
+    )
+    print(f"\n   {'TOOL':<28}{'CALLS':>7}{'P50 ms':>10}{'P95 ms':>10}{'Q/CALL':>9}")
+    for name, t in report["tools"].items():
+        print(f"   {name:<28}{t['calls']:>7}{t['p50_ms']:>10}{t['p95_ms']:>10}{t['queries_per_call']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Detective replay benchmark")
+    parser.add_argument("--db", help="Existing DuckDB to replay against (read-only); default: build the fixture")
+    parser.add_argument("--fixture", default=str(DEFAULT_FIXTURE), help="JSON fixture used when --db is not given")
+    parser.add_argument("--scale", type=int, default=20, help="Copies of each fixture review")
+    parser.add_argument(
+        "--logs",
+        nargs="+",
+        default=[str(DEFAULT_RECORDING)],
+        help="chat_history JSONL file(s) / glob(s)",
+    )
+    parser.add_argument("--asin", help="Replay every conversation on this ASIN (fixture DB)")
+    parser.add_argument("--limit", type=int, help="Max conversations")
+    parser.add_argument("--iterations", type=int, default=1)
+    parser.add_argument("--keep-cache", action="store_true", help="Keep the Detective tool memo between turns")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any tool p95 exceeds this")
+    parser.add_argument("--max-queries-per-turn", type=int, help="Fail if a turn runs more DB queries")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    records = load_records(args.logs, args.limit)
+    if not records:
+        print("❌ No replayable conversations (chat_history lines with tool_calls) found.")
+        sys.exit(2)
+
+    # Keep replayed turns out of the real chat_history buffer
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_detective_"))
+    Settings.LOGS_BUFFER_DIR = work_dir
+    db_path = args.db
+    if not db_path:
+        db_path = str(work_dir / "detective_fixture.duckdb")
+        build_fixture_db(args.fixture, db_path, scale=max(1, args.scale))
+
+    report = run_bench(records, db_path, asin=args.asin, iterations=args.iterations, keep_cache=args.keep_cache)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_p95_ms is not None:
+        failures += [
+            f"{name} p95 {t['p95_ms']}ms > {args.max_p95_ms}ms"
+            for name, t in report["tools"].items()
+            if t["p95_ms"] > args.max_p95_ms
+        ]
+    if args.max_queries_per_turn is not None and report["max_queries_per_turn"] > args.max_queries_per_turn:
+        failures.append(f"{report['max_queries_per_turn']} queries in one turn > {args.max_queries_per_turn}")
+
+    if failures:
+        print("\n❌ Regression:\n   " + "\n   ".join(failures))
+        sys.exit(1)
+    print("\n✅ Within thresholds.")
+
+
+if __name__ == "__main__":
+    main()
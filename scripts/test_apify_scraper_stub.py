@@ -0,0 +1,214 @@
+"""
+Smoke test for the async AmazonScraper against a local Apify-compatible stub
+(no Apify credits, no DB writes). Files land in a temp dir, not staging_data/.
+
+The stub implements the endpoints the client uses: start actor run, get run
+(with waitForFinish long-poll), get dataset, JSONL dataset items (offset/limit).
+Like Apify, the dataset's itemCount lags behind (half the real count) and a column
+(translatedText) only appears after the first task's items, so with a small --page
+it is first seen on a later page. Every saved Parquet file must hold every item and
+that column, and is read back through DataIngester._clean_dataframe.
+
+Usage:
+    python scripts/test_apify_scraper_stub.py --asins 12 --shard 3 --runs 1 4 --run-secs 1 --fail-every 4 --reviews 40 --page 25
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+os.environ.setdefault("APIFY_TOKEN", "stub-token")
+# Add root to sys.path to find core
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import polars as pl
+import pyarrow.parquet as pq
+from scout_app.core import scraper as scraper_mod
+from scout_app.core.config import Settings
+from scout_app.core.ingest import DataIngester
+from scout_app.core.scraper import AmazonScraper
+
+STUB = {"runs": {}, "run_secs": 1.0, "fail_every": 0, "reviews": 40, "started": 0, "running": 0, "max_running": 0}
+STUB_LOCK = threading.Lock()
+
+
+def _review_item(run_id, n, task):
+    """
+    Axesso-like review item; every 7th has no variation and every 5th no helpful count.
+    Items past the first task carry translatedText (column missing from the first page).
+    """
+    item = {
+        "reviewId": f"R{run_id}{n:06d}",
+        "asin": task["asin"],
+        "variationId": f"{task['asin'][:-1]}V",
+        "userName": f"user{n}",
+        "rating": f"{task['filterByStar'].split('_')[0] == 'five' and 5 or 3}.0 out of 5 stars",
+        "title": f"Review {n}",
+        "text": "Soft and warm, kids love it " * 5,
+        "date": "Reviewed in the United States on January 5, 2026",
+        "verified": n % 2 == 0,
+        "vine": False,
+        "numberOfHelpful": None if n % 5 == 0 else n % 9,
+        "variationList": [] if n % 7 == 0 else ["Color: Blue", "Size: Twin"],
+        "reviewImages": [],
+        "profile": {"name": f"user{n}", "url": None},
+    }
+    if n >= STUB["reviews"]:
+        item["translatedText"] = f"Translated review {n}"
+    return item
+
+
+def _run_view(run):
+    done = time.monotonic() >= run["finish_at"]
+    status = run["final_status"] if done else "RUNNING"
+    return {"id": run["id"], "status": status, "defaultDatasetId": run["dataset_id"]}
+
+
+class ApifyStubHandler(BaseHTTPRequestHandler):
+    def _send(self, code, payload=None, body=None, ctype="application/json"):
+        body = body if body is not None else json.dumps({"data": payload}).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["v2", "acts"] and parts[3] == "runs":
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":  # The client gzips request bodies
+                raw = gzip.decompress(raw)
+            run_input = json.loads(raw or b"{}")
+            with STUB_LOCK:
+                STUB["started"] += 1
+                failed = STUB["fail_every"] and STUB["started"] % STUB["fail_every"] == 0
+                run = {
+                    "id": uuid.uuid4().hex[:12],
+                    "dataset_id": uuid.uuid4().hex[:12],
+                    "tasks": run_input.get("input", []),
+                    "finish_at": time.monotonic() + STUB["run_secs"],
+                    "final_status": "FAILED" if failed else "SUCCEEDED",
+                    "counted": False,
+                }
+                STUB["runs"][run["id"]] = run
+                STUB["running"] += 1
+                STUB["max_running"] = max(STUB["max_running"], STUB["running"])
+            return self._send(201, _run_view(run))
+        self._send(404, {"error": "not found"})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        if len(parts) == 3 and parts[:2] == ["v2", "actor-runs"]:
+            run = STUB["runs"].get(parts[2])
+            if not run:
+                return self._send(404, {"error": "run not found"})
+            wait = float(query.get("waitForFinish", ["0"])[0])
+            time.sleep(max(0.0, min(wait, run["finish_at"] - time.monotonic())))
+            view = _run_view(run)
+            if view["status"] != "RUNNING":
+                with STUB_LOCK:
+                    if not run["counted"]:
+                        run["counted"] = True
+                        STUB["running"] -= 1
+            return self._send(200, view)
+        if len(parts) >= 3 and parts[:2] == ["v2", "datasets"]:
+            run = next((r for r in STUB["runs"].values() if r["dataset_id"] == parts[2]), None)
+            if not run:
+                return self._send(404, {"error": "dataset not found"})
+            total = len(run["tasks"]) * STUB["reviews"]
+            if len(parts) == 3:
+                return self._send(200, {"id": parts[2], "itemCount": total // 2})  # Lazy, like Apify
+            if parts[3] == "items" and query.get("format", ["json"])[0] == "jsonl":
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", [str(total)])[0])
+                lines = [
+                    json.dumps(_review_item(run["id"], n, run["tasks"][n // STUB["reviews"]]))
+                    for n in range(offset, min(total, offset + limit))
+                ]
+                return self._send(200, body="\n".join(lines).encode(), ctype="application/jsonl")
+        self._send(404, {"error": "not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+def run_case(api_url, asins, shard, runs):
+    with STUB_LOCK:
+        STUB.update(runs={}, started=0, running=0, max_running=0)
+    handed = []
+    scraper = AmazonScraper(api_url=api_url, max_runs=runs, shard_size=shard)
+    start = time.perf_counter()
+    files = scraper.run_deep_scrape(asins, on_file=lambda p: handed.append((time.perf_counter() - start, p.name)))
+    elapsed = time.perf_counter() - start
+
+    expected_runs = -(-len(asins) // shard)
+    expected_failed = expected_runs // STUB["fail_every"] if STUB["fail_every"] else 0
+    # Parquet files must parse like the old XLSX exports (flattened variationList/0 etc.)
+    expected_rows = sum(
+        len(r["tasks"]) * STUB["reviews"] for r in STUB["runs"].values() if r["final_status"] == "SUCCEEDED"
+    )
+    ingester, rows, clean_rows, groups, late_ok = DataIngester(), 0, 0, 0, True
+    for f in files:
+        df = pl.read_parquet(f)
+        rows += len(df)
+        # The late column is kept, with a value for every item past the first task
+        late_ok &= "translatedText" in df.columns and df["translatedText"].null_count() == STUB["reviews"]
+        clean_rows += len(ingester._clean_dataframe(df, f.name))
+        groups += pq.ParquetFile(f).num_row_groups
+    ok = (
+        STUB["started"] == expected_runs
+        and len(files) == expected_runs - expected_failed
+        and STUB["max_running"] <= runs
+        and all(f.suffix == ".parquet" for f in files)
+        and len(handed) == len(files)
+        and rows == clean_rows == expected_rows > 0
+        and late_ok
+    )
+    print(
+        f"{'✅' if ok else '❌'} max_runs={runs}: {len(asins)} ASINs -> {STUB['started']} runs in {elapsed:.2f}s | "
+        f"files={len(files)} rows={rows}/{expected_rows} (clean {clean_rows}) late column={late_ok} row groups={groups} max in flight={STUB['max_running']}"
+    )
+    print(f"   handed to ingest at: {', '.join(f'{t:.2f}s' for t, _ in handed)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async Apify scraper smoke test (local stub)")
+    parser.add_argument("--asins", type=int, default=12)
+    parser.add_argument("--shard", type=int, default=3, help="ASINs per actor run")
+    parser.add_argument("--runs", type=int, nargs="+", default=[1, 4], help="Max concurrent runs per case")
+    parser.add_argument("--run-secs", type=float, default=1.0, help="Simulated actor run time")
+    parser.add_argument("--fail-every", type=int, default=4, help="Every Nth run FAILS (0 = never)")
+    parser.add_argument("--reviews", type=int, default=40, help="Dataset items per ASIN x star task")
+    parser.add_argument("--page", type=int, default=None, help="Items per JSONL page (default APIFY_PAGE_ITEMS)")
+    args = parser.parse_args()
+    STUB.update(run_secs=args.run_secs, fail_every=args.fail_every, reviews=args.reviews)
+    if args.page:
+        scraper_mod.PAGE_ITEMS = args.page
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ApifyStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"🧪 Apify stub at {api_url}")
+
+    asins = [f"B0TEST{i:04d}" for i in range(args.asins)]
+    with tempfile.TemporaryDirectory() as tmp:
+        Settings.INGEST_STAGING_DIR = Path(tmp)
+        results = [run_case(api_url, asins, args.shard, n) for n in args.runs]
+    server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Smoke test for ParentFinder (HTTP fast path + browser pool fallback) against a local
+HTML fixture server (no Amazon traffic, no DB writes). Needs Playwright + Chromium installed.
+
+Every --bot-wall-every'th ASIN answers its first request with a captcha page, so the
+HTTP path must fall back to the browser for it.
+
+Usage:
+    python scripts/test_parent_finder_pool.py --asins 12 --contexts 1 3 --bot-wall-every 4
+"""
+
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add root to sys.path to find core
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from scout_app.core.browser_pool import BrowserPool, DomainRateLimiter
+from scout_app.core.parent_finder import ParentFinder
+
+FIXTURE_PAGE = """<html><head><link rel="stylesheet" href="/static/site.css"></head>
+<body><img src="/static/hero-{asin}.jpg"><script>var data = {{"asin": "{asin}", "parentAsin": "{parent}"}};</script>
+</body></html>"""
+CAPTCHA_PAGE = b"<html><body><form action='/errors/validateCaptcha'>Type the characters you see</form></body></html>"
+HITS = {"dp": 0, "assets": 0}
+BOT_WALL = {"every": 0, "served": set()}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/dp/"):
+            HITS["dp"] += 1
+            asin = self.path.rsplit("/", 1)[-1]
+            walled = BOT_WALL["every"] and int(asin[-4:]) % BOT_WALL["every"] == 0
+            if walled and asin not in BOT_WALL["served"]:
+                BOT_WALL["served"].add(asin)
+                body = CAPTCHA_PAGE
+            else:
+                body = FIXTURE_PAGE.format(asin=asin, parent=f"BP{asin[-8:]}").encode()
+            ctype = "text/html"
+        else:
+            HITS["assets"] += 1
+            body, ctype = b"", "text/css" if self.path.endswith(".css") else "image/jpeg"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_case(base_url, asins, contexts, cooldown, interval, use_http):
+    HITS.update(dp=0, assets=0)
+    BOT_WALL["served"].clear()
+    pool = BrowserPool(size=contexts, cooldown=cooldown, limiter=DomainRateLimiter(interval))
+    finder = ParentFinder(base_url=base_url, pool=pool, use_http=use_http)
+    try:
+        start = time.perf_counter()
+        results = finder.find_parents(asins)
+        elapsed = time.perf_counter() - start
+    finally:
+        finder.close()
+
+    expected = {a: f"BP{a[-8:]}" for a in asins}
+    ok = results == expected
+    print(
+        f"{'✅' if ok else '❌'} contexts={contexts}: {len(asins)} ASINs in {elapsed:.2f}s "
+        f"({len(asins) / elapsed:.2f}/s) | pages={pool.stats['pages']} blocked={pool.stats['blocked_requests']} "
+        f"asset hits={HITS['assets']}"
+    )
+    report = finder.report()
+    print(f"   fast path {report['fast_path_ratio']:.0%} | fallback {report['fallback_ratio']:.0%} ({report})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ParentFinder pool smoke test (local fixtures)")
+    parser.add_argument("--asins", type=int, default=12)
+    parser.add_argument("--contexts", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Per-context rest between pages (s)")
+    parser.add_argument("--interval", type=float, default=0.1, help="Min gap between requests to the host (s)")
+    parser.add_argument("--bot-wall-every", type=int, default=4, help="Captcha on first hit of every Nth ASIN (0 = off)")
+    parser.add_argument("--no-http", action="store_true", help="Browser only (baseline)")
+    args = parser.parse_args()
+    BOT_WALL["every"] = args.bot_wall_every
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"🧪 Fixture server at {base_url}")
+
+    asins = [f"B0TEST{i:04d}" for i in range(args.asins)]
+    cooldown = (args.cooldown, args.cooldown * 1.2)
+    interval = (args.interval, args.interval * 1.5)
+    results = [run_case(base_url, asins, n, cooldown, interval, not args.no_http) for n in args.contexts]
+    server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()